@@ -0,0 +1,299 @@
+# Iván Ontiveros - RetroVortex
+
+
+# This script grows a round dataset with the historical UFC fights, walking the index of completed events and every fight in it
+# The progress is saved in a checkpoint journal (one line per change) after every fight, so the crawler resumes exactly where it stopped
+# if it's interrupted
+# The fights are downloaded at the same time by a few workers, but never faster than the maximum request rate
+# Failed requests are retried, waiting longer before every new attempt
+#
+# Run it with the directory where the rounds will be stored ('judgion-backfill' by default):
+#   python backfill.py [DIRECTORY] [--max-events N] [--base-url http://127.0.0.1:8000] [--offline]
+# The JSON files are generated with a null 'winner' (the training scripts refuse them until they're labeled) and the 'cuts' set to 0
+
+
+# Libraries
+from concurrent.futures import ThreadPoolExecutor
+from bs4 import BeautifulSoup
+import threading
+import requests
+import json
+import time
+import sys
+import os
+
+from json_generator import UFC_WEB_SCRAPER, REQUEST_HEADER, find_links, make_session
+from judgionLib.fight_index import fight_index
+from judgionLib.fight_page import fight_method
+from judgionLib.dataset_cache import cache_path
+from judgionLib.http_cache import fetch_page
+from judgionLib.constants import BACKFILL_DIRECTORY, UFC_STATS_URL, BACKFILL_RATE, BACKFILL_WORKERS, BACKFILL_RETRIES, BACKFILL_BACKOFF, OFFLINE_MODE
+
+
+# Version of the checkpoint content. Changing it makes the crawler start from scratch
+# Format 1 was a single JSON file rewritten on every change; format 2 is a journal with one line per change (see 'record')
+CHECKPOINT_FORMAT = 2
+
+# Changes appended to the checkpoint journal before it's compacted (rewritten with one line per event and fight)
+CHECKPOINT_COMPACT_INTERVAL = 1000
+
+# Status codes that are worth retrying (the server is busy or temporarily failing)
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Status of the fights that don't have to be processed again: rounds written, page not valid, or fight without complete rounds
+FINISHED_STATUSES = ('done', 'failed', 'skipped')
+
+
+class RATE_LIMITER:
+
+    def __init__(self, rate):
+
+        # Minimum time (in seconds) between two requests
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+
+        # Time when the next request can be made
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+
+
+    # This function waits until a new request can be made
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+class BACKFILL_CRAWLER:
+
+    def __init__(self, directory=BACKFILL_DIRECTORY, base_url=UFC_STATS_URL, rate=BACKFILL_RATE, workers=BACKFILL_WORKERS,
+                 retries=BACKFILL_RETRIES, backoff=BACKFILL_BACKOFF, offline=OFFLINE_MODE):
+
+        # Directory where the rounds are stored, and index of its fights (used for numbering the rounds of rematches)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.index = fight_index(directory)
+
+        # Page with the list of all the completed events
+        self.events_url = f"{base_url.rstrip('/')}/statistics/events/completed?page=all"
+
+        # Request settings
+        self.limiter = RATE_LIMITER(rate)
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.session = make_session(workers)
+
+        # Flag; if True, the pages are only read from the HTTP cache (no requests are made)
+        self.offline = offline
+
+        # Checkpoint with the events and fights already processed
+        # events: event URL -> 'done' ; fights: fight URL -> {'status': 'writing', 'done', 'failed' or 'skipped', ...}
+        self.checkpoint_path = cache_path(directory, '_backfill.jsonl')
+        self.legacy_checkpoint_path = cache_path(directory, '_backfill.json')
+        self.events = {}
+        self.fights = {}
+        self.changes = 0
+        self.load_checkpoint()
+
+        # Lock used so only one worker updates the checkpoint and writes files at a time
+        self.lock = threading.Lock()
+
+
+    # This function loads the checkpoint journal (or the checkpoint of format 1), if there's one, and compacts it
+    # The first line is the format; every other line is a change: ["events" or "fights", URL, new state]
+    # A line left half-written by a crash is ignored (its change is done again when the crawler resumes)
+    def load_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, 'r') as file:
+                lines = file.read().splitlines()
+            if lines and json.loads(lines[0]).get('format') == CHECKPOINT_FORMAT:
+                for line in lines[1:]:
+                    try:
+                        kind, url, state = json.loads(line)
+                    except ValueError:
+                        break
+                    getattr(self, kind)[url] = state
+
+        elif os.path.exists(self.legacy_checkpoint_path):
+            with open(self.legacy_checkpoint_path, 'r') as file:
+                checkpoint = json.load(file)
+            if checkpoint.get('format') == 1:
+                self.events = checkpoint['events']
+                self.fights = checkpoint['fights']
+
+        else:
+            return
+
+        self.compact_checkpoint()
+        if os.path.exists(self.legacy_checkpoint_path):
+            os.remove(self.legacy_checkpoint_path)
+
+
+    # This function rewrites the checkpoint journal with one line per event and fight, with a temporary name first so it's never left half-written
+    def compact_checkpoint(self):
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        with open(self.checkpoint_path + '.tmp', 'w') as file:
+            file.write(json.dumps({'format': CHECKPOINT_FORMAT}) + '\n')
+            for kind in ('events', 'fights'):
+                for url, state in getattr(self, kind).items():
+                    file.write(json.dumps([kind, url, state]) + '\n')
+        os.replace(self.checkpoint_path + '.tmp', self.checkpoint_path)
+        self.changes = 0
+
+
+    # This function records the new state of an event or a fight ('kind': 'events' or 'fights'), appending a line to the checkpoint journal
+    # Only the change is written, so saving the progress takes the same time at the first fight and after thousands of them
+    # It must be called while holding 'self.lock'
+    def record(self, kind, url, state):
+        getattr(self, kind)[url] = state
+
+        if self.changes >= CHECKPOINT_COMPACT_INTERVAL or not os.path.exists(self.checkpoint_path):
+            self.compact_checkpoint()
+            return
+
+        with open(self.checkpoint_path, 'a') as file:
+            file.write(json.dumps([kind, url, state]) + '\n')
+        self.changes += 1
+
+
+    # This function downloads a page, retrying it if the request fails
+    # It returns the HTML code, or None if the page doesn't exist (a permanent error). It raises an exception if all the attempts fail
+    def fetch(self, url):
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            try:
+                page = fetch_page(url, self.session, REQUEST_HEADER, self.offline)
+                if page.status_code == 200:
+                    return page.text
+                # In offline mode, a page missing from the HTTP cache (504) won't appear by trying again
+                if page.status_code not in RETRY_STATUS_CODES or self.offline:
+                    return None
+                error = f"status code {page.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+
+        raise RuntimeError(f"{url} failed after {self.retries + 1} attempts ({error})")
+
+
+    # This function records a fight that won't be processed again, with the reason
+    def finish_fight(self, url, status, reason):
+        with self.lock:
+            self.record('fights', url, {'status': status, 'reason': reason})
+
+
+    # This function processes a fight: downloads its page, and stores its rounds
+    # The checkpoint is updated before and after writing the files, so a crash in the middle is repeated with the same file names
+    def process_fight(self, url):
+        html = self.fetch(url)
+        if html is None:
+            self.finish_fight(url, 'failed', 'page not found')
+            return
+
+        # The last round of fights that didn't go to decision is ignored (it wasn't complete)
+        method = fight_method(html)
+        remove_last_round = method is not None and not method.startswith('Decision')
+        scraper = UFC_WEB_SCRAPER(url, flag_rm=remove_last_round, policy='append')
+        if not scraper.load_page(html):
+            self.finish_fight(url, 'failed', 'the page could not be parsed')
+            return
+
+        # Fights finished in the first round don't have any complete round
+        if remove_last_round and scraper.rounds_num == 1:
+            self.finish_fight(url, 'skipped', 'finished in the first round')
+            return
+
+        # The rounds aren't labeled yet: a null winner keeps them out of the training until they are
+        rounds = scraper.extract_rounds()
+        for data in rounds:
+            data['winner'] = None
+
+        # The directory lock is held from choosing the round numbers until the files are written, so other scrapers don't take them
+        with self.lock, self.index.locked():
+            # If the fight was interrupted while writing its files, the same round numbers are used again
+            fight = self.fights.get(url)
+            if fight is None or fight['status'] != 'writing':
+                fight_id = f"{scraper.red_last_name}_{scraper.blue_last_name}"
+                fight = {'status': 'writing', 'fight_id': fight_id, 'offset': self.index.round_offset(fight_id, 'append')}
+                self.record('fights', url, fight)
+
+            self.index.write_fight(fight['fight_id'], rounds, offset=fight['offset'])
+
+            self.record('fights', url, dict(fight, status='done', rounds=len(rounds)))
+
+
+    # This function processes an event: all its fights that weren't processed yet are downloaded at the same time
+    # It returns True if all the fights of the event are done
+    def process_event(self, url):
+        html = self.fetch(url)
+        if html is None:
+            return True
+
+        links = [link for link in find_links(BeautifulSoup(html, 'html.parser'), 'fight-details', url)
+                 if self.fights.get(link, {}).get('status') not in FINISHED_STATUSES]
+
+        completed = True
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for link, future in [(link, executor.submit(self.process_fight, link)) for link in links]:
+                try:
+                    future.result()
+                except Exception as e:
+                    # The fight isn't marked as failed, so it's tried again the next time the crawler runs
+                    print(f"ERROR processing {link}: {e}")
+                    completed = False
+
+        return completed
+
+
+    # This function walks the completed events, processing the ones that weren't done yet
+    # 'max_events' limits the number of events processed in this run
+    def start(self, max_events=None):
+        html = self.fetch(self.events_url)
+        if html is None:
+            print(f"ERROR. The list of events ({self.events_url}) wasn't found.")
+            return
+
+        events = [link for link in find_links(BeautifulSoup(html, 'html.parser'), 'event-details', self.events_url) if link not in self.events]
+        if max_events is not None:
+            events = events[:max_events]
+
+        print(f"{len(self.events)} events already processed, {len(events)} to go.")
+        for i, url in enumerate(events):
+            ini_t = time.perf_counter()
+            if self.process_event(url):
+                with self.lock:
+                    self.record('events', url, 'done')
+                print(f"[{i + 1}/{len(events)}] {url} processed in {time.perf_counter() - ini_t:.2f} s.")
+            else:
+                print(f"[{i + 1}/{len(events)}] {url} is incomplete; it will be resumed the next time.")
+
+
+# Main
+if __name__ == '__main__':
+    args = sys.argv[1:]
+
+    max_events = None
+    if '--max-events' in args:
+        i = args.index('--max-events')
+        max_events = int(args[i + 1])
+        del args[i:i + 2]
+
+    base_url = UFC_STATS_URL
+    if '--base-url' in args:
+        i = args.index('--base-url')
+        base_url = args[i + 1]
+        del args[i:i + 2]
+
+    # If we use the '--offline' flag, the pages are only read from the HTTP cache
+    offline = OFFLINE_MODE or '--offline' in args
+    if '--offline' in args:
+        args.remove('--offline')
+
+    crawler = BACKFILL_CRAWLER(args[0] if args else BACKFILL_DIRECTORY, base_url, offline=offline)
+    crawler.start(max_events)
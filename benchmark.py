@@ -0,0 +1,145 @@
+# Iván Ontiveros - RetroVortex
+
+
+# This script measures the performance of different parts of Judgion, so regressions can be spotted between versions
+# Run it with the name of the benchmark to execute:
+#   python benchmark.py imports     --> Import time of the data-only modules (they must not load TensorFlow)
+#   python benchmark.py latency [N] --> Median and 95th percentile of every stage of the judging process (over the last N runs)
+#   python benchmark.py parser [DIR] --> Fight pages parsed per second by every parser backend (the fixture pages, the pages saved in DIR,
+#                                        or the pages in the HTTP cache if DIR is 'cache')
+# The script ends with exit code 1 if any measurement goes over its budget, so it can be used in automated checks
+
+
+# Libraries
+import subprocess
+import json
+import sys
+import os
+
+from judgionLib.constants import IMPORT_TIME_BUDGET
+
+
+# Directory with the fight pages committed with the tests, used by default in the parser benchmark
+FIGHT_PAGE_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'fixtures', 'fight_pages')
+
+
+# Modules that must be importable without TensorFlow
+LIGHT_MODULES = [
+    'judgionLib.constants',
+    'judgionLib.utils',
+    'judgionLib.ingestion',
+    'judgionLib.dataset_cache',
+    'judgionLib.shards',
+    'judgionLib.fight_page',
+    'judgionLib.fight_index',
+    'judgionLib.numpy_runtime',
+    'judgionLib.model_registry',
+    'judgionLib.prediction_cache',
+    'judgionLib.profiling',
+    'judgionLib.tflite_runtime',
+    'round_judge',
+]
+
+# Code executed in a fresh interpreter to measure the import time of a module
+IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'tensorflow': 'tensorflow' in sys.modules}}))
+"""
+
+
+# This function measures the import time of a module in a new process, so no module is already cached
+# It returns the time in seconds, and whether TensorFlow was loaded by the import
+def measure_import(module):
+    # The probe runs from the repository, so the modules are found wherever the benchmark is run from
+    output = subprocess.run([sys.executable, '-c', IMPORT_PROBE.format(module=module)], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    result = json.loads(output.stdout.strip().splitlines()[-1])
+    return result['seconds'], result['tensorflow']
+
+
+# This function checks the import time of all the data-only modules, returning True if all of them are within the budget
+def imports_benchmark():
+    passed = True
+
+    print(f"Import time budget: {IMPORT_TIME_BUDGET:.2f} s\n")
+    for module in LIGHT_MODULES:
+        seconds, tensorflow = measure_import(module)
+
+        # A module fails if it takes too long, or if it loads TensorFlow
+        ok = seconds <= IMPORT_TIME_BUDGET and not tensorflow
+        passed = passed and ok
+
+        status = "OK" if ok else "FAIL"
+        note = " (imports TensorFlow!)" if tensorflow else ""
+        print(f"{status:4} | {module:28} | {seconds * 1000:8.1f} ms{note}")
+
+    return passed
+
+
+# This function prints the median and 95th percentile of every stage of the judging process, from the spans of previous runs
+# If a number is given, only that number of the most recent runs is included
+def latency_benchmark(last_runs=None):
+    from judgionLib.profiling import read_spans, summarize, print_summary, LATENCY_LOG_PATH
+
+    spans = read_spans()
+    if not spans:
+        print(f"There are no spans in {LATENCY_LOG_PATH} yet. Run the judging process first.")
+        return False
+
+    print_summary(summarize(spans, int(last_runs) if last_runs is not None else None))
+    return True
+
+
+# This function measures how many fight pages per second every parser backend processes, using saved pages
+# The pages are read from a directory with '.html' files (the fixture pages by default), or from the HTTP cache of the scraper
+def parser_benchmark(directory=FIGHT_PAGE_FIXTURES, repetitions=5):
+    import time
+    from judgionLib.http_cache import HTTP_CACHE
+    from judgionLib.fight_page import parse_fight_page, PARSER_BACKENDS
+
+    if directory == 'cache':
+        cache = HTTP_CACHE()
+        paths = [cache.page_path(url) + '.html' for url in cache.urls() if 'fight-details' in url]
+    else:
+        paths = [os.path.join(directory, filename) for filename in sorted(os.listdir(directory)) if filename.endswith('.html')]
+
+    pages = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as file:
+            pages.append(file.read())
+
+    if not pages:
+        print("There are no saved fight pages. Give a directory with '.html' files, or scrape some fights first to use the HTTP cache.")
+        return False
+
+    print(f"{len(pages)} fight pages, {int(repetitions)} repetitions\n")
+    for backend in PARSER_BACKENDS:
+        ini_t = time.perf_counter()
+        for _ in range(int(repetitions)):
+            for html in pages:
+                parse_fight_page(html, backend)
+        elapsed = time.perf_counter() - ini_t
+        print(f"{backend:12} | {len(pages) * int(repetitions) / elapsed:10.1f} pages/s")
+
+    return True
+
+
+# Available benchmarks
+BENCHMARKS = {
+    'imports': imports_benchmark,
+    'latency': latency_benchmark,
+    'parser': parser_benchmark,
+}
+
+
+# Main
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: python benchmark.py [{'|'.join(BENCHMARKS)}]")
+        sys.exit(1)
+
+    if not BENCHMARKS[sys.argv[1]](*sys.argv[2:]):
+        sys.exit(1)
@@ -12,7 +12,7 @@ import os
 import json
 import numpy as np
 
-from judgionLib.utils import stats_getter
+from judgionLib.dataset_cache import load_dataset
 from judgionLib.constants import TRAINING_DIRECTORY, STAT_MAP
 
 
@@ -525,7 +525,7 @@ class DATA_VISUALIZER:
         self.init_maps()
 
         # Stat matrices initialization
-        (self.stats, self.winners) = stats_getter(TRAINING_DIRECTORY)
+        (self.stats, self.winners) = load_dataset(TRAINING_DIRECTORY)
         #print("Stats size: ", len(prueba.stats), ", ", len(self.stats[0]))
 
         while self.keep_going:
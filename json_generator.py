@@ -4,25 +4,65 @@
 # This script generates JSON files with the stats of an UFC fight
 # It generates one file per round, and includes the stats for both fighters, and their names
 # The parameters 'cuts' and 'winner' are 0 by default, and they are supposed to be set manually
+#
+# It can also scrape all the fights of an event at the same time, given the link to the event page:
+#   python json_generator.py --event http://www.ufcstats.com/event-details/... [--policy overwrite|append|skip]
+# Downloaded pages are kept in an HTTP cache. With '--offline' they're only read from it, and with '--replay' the files of every
+# fight in the cache are generated again (unlabeled, in the backfill directory, or in the testing one with '-t')
 
 
 # Libraries
 import requests
 from bs4 import BeautifulSoup
-import json
-import os
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 import sys
+import os
+from urllib.parse import urljoin
 
-from judgionLib.constants import TRAINING_DIRECTORY, TEST_DIRECTORY
+from judgionLib.fight_index import fight_index
+from judgionLib.profiling import span
+from judgionLib.http_cache import HTTP_CACHE, fetch_page
+from judgionLib.fight_page import parse_fight_page, round_data, fight_method
+from judgionLib.constants import TRAINING_DIRECTORY, TEST_DIRECTORY, BACKFILL_DIRECTORY, SCRAPER_WORKERS, OFFLINE_MODE
 
 
 # Link to the UFC stats website
 LINK_UFC_WEBSITE = '' # TODO: Set this value
 
+# Header for the web scraping
+REQUEST_HEADER = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36 OPR/109.0.0.0'
+}   # Change it depending on your device and OS
+
+# What to do when there are files for the same fighters already: ask the user, overwrite them, create new files (rematches) or skip the fight
+EXISTING_FILES_POLICIES = ('ask', 'overwrite', 'append', 'skip')
+
+
+# This function returns the links of a page that point to a kind of page (f.e. 'fight-details'), in order and without duplicates
+# Relative links are completed with the URL of the page
+def find_links(soup, kind, page_url):
+    links = []
+    for element in soup.select('[data-link], a[href]'):
+        link = urljoin(page_url, element.get('data-link') or element.get('href'))
+        if kind in link and link not in links:
+            links.append(link)
+    return links
+
+
+# This function returns an HTTP session with a connection pool large enough for several workers
+def make_session(workers):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
 
 class UFC_WEB_SCRAPER:
 
-    def __init__(self, link, flag_rm=False, flag_t=False):
+    def __init__(self, link, flag_rm=False, flag_t=False, policy='ask', session=None, offline=OFFLINE_MODE):
         # Link to the UFC stats website
         self.url = link
         
@@ -30,12 +70,10 @@ class UFC_WEB_SCRAPER:
         self.rounds_num = 0     # Default value
 
         # Header for the web scraping
-        self.header = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36 OPR/109.0.0.0'
-        }   # Change it depending on your device and OS
+        self.header = REQUEST_HEADER
 
-        # BeautifulSoup variable where the web info will be stored
-        self.soup = None
+        # Stats parsed from the fight page (see 'judgionLib/fight_page.py')
+        self.page = None
 
         # This strings will store the fighters' last names
         self.red_last_name = ""
@@ -47,47 +85,65 @@ class UFC_WEB_SCRAPER:
         # Flag; if True, it will ignore the last round, useful for fights with finishes
         self.remove_last_round = flag_rm
 
+        # Thread that writes the JSON files when the rounds are judged directly from memory
+        self.writer = None
 
-    # This function gets the total of rounds the fight had
-    def get_total_rounds(self):
-        rounds = self.soup.select('i.b-fight-details__text-item')
-        self.rounds_num = int(rounds[0].text.strip()[-1])
+        # What to do if there are files for the same fighters already (see 'EXISTING_FILES_POLICIES')
+        # Any policy other than 'ask' lets the scraper run without the user, f.e. when scraping a whole event
+        if policy not in EXISTING_FILES_POLICIES:
+            raise ValueError(f"Unknown policy '{policy}'. Use one of: {', '.join(EXISTING_FILES_POLICIES)}")
+        self.policy = policy
+
+        # HTTP session used for the requests. Scrapers that share a session reuse its connections
+        self.session = session
+
+        # Flag; if True, the page is only read from the HTTP cache (no requests are made)
+        self.offline = offline
 
 
-    # This function receives the total control time in 'XX:YY' format, and outputs the total equivalent in seconds
-    def time_conversion(self, control_time):
-        m, s = map(int, control_time.split(":"))
-        total_s = 60 * m + s
-        return total_s
+    # This function parses the HTML code of the fight page, returning False if it doesn't have the stats of the rounds
+    def load_page(self, html):
+        try:
+            with span('parse_html'):
+                self.page = parse_fight_page(html)
+        except ValueError as e:
+            print(f"ERROR. The fight page couldn't be parsed: {e}.")
+            return False
+
+        # Getting the total number of rounds
+        self.get_total_rounds()
+        return True
+
+
+    # This function gets the total of rounds the fight had
+    def get_total_rounds(self):
+        self.rounds_num = len(self.page.stats)
 
 
     # This function checks if there are any pre-existing files in the directory with the same ID as the chosen fight
+    # It returns the policy used when the files are written ('overwrite', 'append' or 'skip'), or None if no files must be generated
+    # The round numbers aren't decided here: they're taken when the files are written, while holding the lock of the directory
     def file_checker(self):
 
         # Set which directory will be checked
         directory = TEST_DIRECTORY if self.testing else TRAINING_DIRECTORY
 
-        # Look for any JSON files matching the ID
-        prefix = f"{self.red_last_name}_{self.blue_last_name}"
-        existing_files = os.listdir(directory)
-        max_round_found = 0
-        for filename in existing_files:
-            if filename.startswith(prefix) and filename.endswith(".json"):
-                
-                # Extract the round number from the filename
-                filename = filename[:-5]
-                round_num = int(filename.rsplit('_R', 1)[1])     # Splitting from the right in case a fighter last name starts with R 
-                # We store the higher round in 'max_round_found'
-                if round_num > max_round_found:
-                    max_round_found = round_num
-
-        # If there are no files matching the ID, just end the execution
+        # Look for the highest round stored with the same ID in the fight index of the directory
+        max_round_found = fight_index(directory).max_round(f"{self.red_last_name}_{self.blue_last_name}")
+
+        # If there are no files matching the ID, the files are generated (unless another scraper writes the same fight first)
         if max_round_found == 0:
-            return 0
+            return 'skip' if self.policy == 'ask' else self.policy
 
-        # If there are files matching the ID, ask the user what to do
+        # If there are files matching the ID, follow the policy chosen, or ask the user what to do
         print(f"\nWARNING: Files for {self.red_last_name} vs {self.blue_last_name} already exist.")
 
+        if self.policy == 'skip':
+            print("No new files generated (the fight is skipped).\n")
+            return None
+        if self.policy != 'ask':
+            return self.policy
+
         while True:
             print("You can choose to:")
             print("1) Overwrite existing files.")
@@ -100,261 +156,262 @@ class UFC_WEB_SCRAPER:
             if choice == '1':
                 # Act as if there were no files
                 print("")
-                return 0
+                return 'overwrite'
 
             # Create new files
             elif choice == '2':
                 # Create new files continuing from the highest round number
                 print("")
-                return max_round_found
+                return 'append'
 
             # Cancel the operation
             elif choice == '3':
                 print("No new files generated by user choice.\n")
-                return -1
+                return None
 
             else:
                 print("ERROR: You must choose a valid option.\n")
 
     
 
-    # This function uses the HTML web code to generate the JSON files
-    def generate_json(self):
-
-        # Extracting the fight stats
-        stats = self.soup.select('p.b-fight-details__table-text')
+    # This function extracts the stats of every round from the parsed page, returning them in the JSON schema of the round files
+    def extract_rounds(self):
 
         # Getting the fighters' names
-        red_corner = stats[0].text.strip()
-        blue_corner = stats[1].text.strip()
+        red_corner = self.page.red_fighter
+        blue_corner = self.page.blue_fighter
         # Isolate the last names (they will be used for the file name)
         self.red_last_name = red_corner.split()[-1]
         self.blue_last_name = blue_corner.split()[-1]
 
-        # If there are files involving the same fighters already, it might be the same fight.
-        # Or it could be a rematch. The call to 'files_checker' lets the user handle it.
-        rounds_offset = self.file_checker()
-
-        if rounds_offset < 0:
-            return
-
         # # If the fight only has 1 round and it is to be ignored, let the user know
         if self.remove_last_round == True and self.rounds_num == 1:
             print("\nERROR: The fight only contains 1 round and it is to be ignored.\nIf you want to generate the JSON file, run the script without the --remove-last flag.")
-            return
+            return []
 
-        # Initializing the 'starting_points' array
-        # Its size will be 2*N, where N is the number of rounds (so, two values per round)
-        # The first value points out the 'starting point' for global stats ; The second value, for the significant strikes
-        starting_points = [22]      # First value is always 22
-
-        # Second value (starting point for round 1 significant strikes) is a variable that depends on N
-        # Its value equals --> Last value for global stats + an offset (21)
-        # Last value for global stats equals --> [ (starting_point[1] + 17) + (N - 1) * 20 ]
-        last_value = (starting_points[0] + 17) + (self.rounds_num - 1)*20
-        # Adding the offset and storing the value
-        starting_points.append(last_value + 21)
-
-        # We have stored the values for round 1
-        # Now, we need to complete the array with the values for the rounds remaining
-        for i in range(2,self.rounds_num*2,2):
-            # Next value for global stats --> Last value + Offset (20)
-            starting_points.append(starting_points[i-2] + 20)
-            # Next value for significant strikes stats --> Last value + Offset (18)
-            starting_points.append(starting_points[i-1] + 18)
-
-        json_iterator = self.rounds_num * 2
         # If we are ignoring the last round, we won't generate the last JSON file
-        if self.remove_last_round == True:
-            json_iterator -= 2
-
-        # One JSON file will be created for every different round
-        for j in range(1, json_iterator, 2):
-
-            global_sp = starting_points[j - 1]
-            sigstrikes_sp = starting_points[j]
-
-            # Knockdowns
-            knockdowns_red = int(stats[global_sp].text.strip())  # Convertir a entero después de limpiar
-            knockdowns_blue = int(stats[global_sp + 1].text.strip())
-
-            # Strikes
-            strikes_red = stats[global_sp + 6].text.strip()
-            strikes_hit_red, strikes_att_red = map(int, strikes_red.split(' of '))
-            strikes_blue = stats[global_sp + 7].text.strip()
-            strikes_hit_blue, strikes_att_blue = map(int, strikes_blue.split(' of '))
-
-            # Takedowns
-            takedowns_red = stats[global_sp + 8].text.strip()
-            takedowns_hit_red, takedowns_att_red = map(int, takedowns_red.split(' of '))
-            takedowns_blue = stats[global_sp + 9].text.strip()
-            takedowns_hit_blue, takedowns_att_blue = map(int, takedowns_blue.split(' of '))
-
-            # Submission attempts
-            subattempts_red = int(stats[global_sp + 12].text.strip())
-            subattempts_blue = int(stats[global_sp + 13].text.strip())
-
-            # Reversals
-            reversals_red = int(stats[global_sp + 14].text.strip())
-            reversals_blue = int(stats[global_sp + 15].text.strip())
-
-            # Control time
-            control_red = self.time_conversion(stats[global_sp + 16].text.strip())
-            control_blue = self.time_conversion(stats[global_sp + 17].text.strip())
-
-            # Sigstrikes total
-            total_sigstrikes_red = stats[sigstrikes_sp].text.strip()
-            total_sigstrikes_hit_red, total_sigstrikes_att_red = map(int, total_sigstrikes_red.split(' of '))
-            total_sigstrikes_blue = stats[sigstrikes_sp + 1].text.strip()
-            total_sigstrikes_hit_blue, total_sigstrikes_att_blue = map(int, total_sigstrikes_blue.split(' of '))
-
-            # Sigstrikes head
-            head_sigstrikes_red = stats[sigstrikes_sp + 4].text.strip()
-            head_sigstrikes_hit_red, head_sigstrikes_att_red = map(int, head_sigstrikes_red.split(' of '))
-            head_sigstrikes_blue = stats[sigstrikes_sp + 5].text.strip()
-            head_sigstrikes_hit_blue, head_sigstrikes_att_blue = map(int, head_sigstrikes_blue.split(' of '))
-
-            # Sigstrikes body
-            body_sigstrikes_red = stats[sigstrikes_sp + 6].text.strip()
-            body_sigstrikes_hit_red, body_sigstrikes_att_red = map(int, body_sigstrikes_red.split(' of '))
-            body_sigstrikes_blue = stats[sigstrikes_sp + 7].text.strip()
-            body_sigstrikes_hit_blue, body_sigstrikes_att_blue = map(int, body_sigstrikes_blue.split(' of '))
-
-            # Sigstrikes legs
-            legs_sigstrikes_red = stats[sigstrikes_sp + 8].text.strip()
-            legs_sigstrikes_hit_red, legs_sigstrikes_att_red = map(int, legs_sigstrikes_red.split(' of '))
-            legs_sigstrikes_blue = stats[sigstrikes_sp + 9].text.strip()
-            legs_sigstrikes_hit_blue, legs_sigstrikes_att_blue = map(int, legs_sigstrikes_blue.split(' of '))
-
-            # Sigstrikes distance
-            dist_sigstrikes_red = stats[sigstrikes_sp + 10].text.strip()
-            dist_sigstrikes_hit_red, dist_sigstrikes_att_red = map(int, dist_sigstrikes_red.split(' of '))
-            dist_sigstrikes_blue = stats[sigstrikes_sp + 11].text.strip()
-            dist_sigstrikes_hit_blue, dist_sigstrikes_att_blue = map(int, dist_sigstrikes_blue.split(' of '))
-
-            # Sigstrikes clinch
-            clinch_sigstrikes_red = stats[sigstrikes_sp + 12].text.strip()
-            clinch_sigstrikes_hit_red, clinch_sigstrikes_att_red = map(int, clinch_sigstrikes_red.split(' of '))
-            clinch_sigstrikes_blue = stats[sigstrikes_sp + 13].text.strip()
-            clinch_sigstrikes_hit_blue, clinch_sigstrikes_att_blue = map(int, clinch_sigstrikes_blue.split(' of '))
-
-            # Sigstrikes ground
-            gnp_sigstrikes_red = stats[sigstrikes_sp + 14].text.strip()
-            gnp_sigstrikes_hit_red, gnp_sigstrikes_att_red = map(int, gnp_sigstrikes_red.split(' of '))
-            gnp_sigstrikes_blue = stats[sigstrikes_sp + 15].text.strip()
-            gnp_sigstrikes_hit_blue, gnp_sigstrikes_att_blue = map(int, gnp_sigstrikes_blue.split(' of '))
-
-            # JSON file estructure
-            data = {
-                "red_fighter": {
-                    "name": red_corner,
-                    "knockdowns": knockdowns_red,
-                    "cuts": 0,
-                    "sigstrikes": {
-                        "head_attempted": head_sigstrikes_att_red,
-                        "head_landed": head_sigstrikes_hit_red,
-                        "body_attempted": body_sigstrikes_att_red,
-                        "body_landed": body_sigstrikes_hit_red,
-                        "leg_attempted": legs_sigstrikes_att_red,
-                        "leg_landed": legs_sigstrikes_hit_red,
-                        "total_attempted": total_sigstrikes_att_red,
-                        "total_landed": total_sigstrikes_hit_red,
-                        "distance_attempted": dist_sigstrikes_att_red,
-                        "distance_landed": dist_sigstrikes_hit_red,
-                        "clinch_attempted": clinch_sigstrikes_att_red,
-                        "clinch_landed": clinch_sigstrikes_hit_red,
-                        "ground_attempted": gnp_sigstrikes_att_red,
-                        "ground_landed": gnp_sigstrikes_hit_red
-                    },
-                    "strikes": {
-                        "attempted": strikes_att_red,
-                        "landed": strikes_hit_red
-                    },
-                    "takedowns": {
-                        "attempted": takedowns_att_red,
-                        "landed": takedowns_hit_red
-                    },
-                    "sub_attempts": subattempts_red,
-                    "reversals": reversals_red,
-                    "control_seconds": control_red
-                },
-
-                "blue_fighter": {
-                    "name": blue_corner,
-                    "knockdowns": knockdowns_blue,
-                    "cuts": 0,
-                    "sigstrikes": {
-                        "head_attempted": head_sigstrikes_att_blue,
-                        "head_landed": head_sigstrikes_hit_blue,
-                        "body_attempted": body_sigstrikes_att_blue,
-                        "body_landed": body_sigstrikes_hit_blue,
-                        "leg_attempted": legs_sigstrikes_att_blue,
-                        "leg_landed": legs_sigstrikes_hit_blue,
-                        "total_attempted": total_sigstrikes_att_blue,
-                        "total_landed": total_sigstrikes_hit_blue,
-                        "distance_attempted": dist_sigstrikes_att_blue,
-                        "distance_landed": dist_sigstrikes_hit_blue,
-                        "clinch_attempted": clinch_sigstrikes_att_blue,
-                        "clinch_landed": clinch_sigstrikes_hit_blue,
-                        "ground_attempted": gnp_sigstrikes_att_blue,
-                        "ground_landed": gnp_sigstrikes_hit_blue
-                    },
-                    "strikes": {
-                        "attempted": strikes_att_blue,
-                        "landed": strikes_hit_blue
-                    },
-                    "takedowns": {
-                        "attempted": takedowns_att_blue,
-                        "landed": takedowns_hit_blue
-                    },
-                    "sub_attempts": subattempts_blue,
-                    "reversals": reversals_blue,
-                    "control_seconds": control_blue
-                },
-
-                "winner": 0
-            }
-
-            # Generating the actual file in the corresponding directory
-            round_number = (j // 2 + 1) + rounds_offset
-            if self.testing:
-                json_filename = f'{TEST_DIRECTORY}/{self.red_last_name}_{self.blue_last_name}_R{round_number}.json'
-            else:
-                json_filename = f'{TRAINING_DIRECTORY}/{self.red_last_name}_{self.blue_last_name}_R{round_number}.json'
-            
-            with open(json_filename, 'w') as json_file:
-                json.dump(data, json_file, indent=4, separators=(',', ': '))
+        round_stats = self.page.stats[:-1] if self.remove_last_round == True else self.page.stats
+
+        # One dictionary per round, in the JSON file structure
+        return [round_data(red_corner, blue_corner, stats) for stats in round_stats]
 
+
+    # This function generates one JSON file per round in the corresponding directory (appended to the shards if the directory stores a packed dataset)
+    # The files are added to the fight index of the directory as they are written
+    # The round numbers are given by the policy ('overwrite', 'append' or 'skip', see 'FIGHT_INDEX.round_offset') while holding the directory lock,
+    # so scrapers running at the same time (even in other processes) never write the same files
+    def write_rounds(self, rounds, policy):
+        directory = TEST_DIRECTORY if self.testing else TRAINING_DIRECTORY
+
+        with span('write_files', rounds=len(rounds)):
+            json_filenames = fight_index(directory).write_fight(f'{self.red_last_name}_{self.blue_last_name}', rounds, policy)
+
+        if not json_filenames:
+            print(f"No new files generated for {self.red_last_name} vs {self.blue_last_name} (they were stored by another scraper).")
+        for json_filename in json_filenames:
             print(f"File named {json_filename} was generated successfully.")
 
 
+    # This function uses the HTML web code to generate the JSON files
+    def generate_json(self):
+        with span('extract_rounds'):
+            rounds = self.extract_rounds()
+        if not rounds:
+            return
+
+        # If there are files involving the same fighters already, it might be the same fight.
+        # Or it could be a rematch. The call to 'files_checker' lets the user handle it.
+        policy = self.file_checker()
+
+        if policy is None:
+            return
+
+        self.write_rounds(rounds, policy)
+
+
+    # This function returns the rounds of the fight directly, so they can be judged without reading them back from the disk
+    # If 'save_files' is True, the JSON files are still generated, but in a background thread that doesn't delay the judging
+    def generate_rounds(self, save_files=True):
+        with span('extract_rounds'):
+            rounds = self.extract_rounds()
+        if not rounds or not save_files:
+            return rounds
+
+        # The user is asked about existing files before anything is scored, so the background thread never needs an answer
+        policy = self.file_checker()
+        if policy is not None:
+            self.writer = threading.Thread(target=self.write_rounds, args=(rounds, policy))
+            self.writer.start()
+
+        return rounds
+
+
+    # This function waits until the JSON files generated in the background are written
+    def wait_for_files(self):
+        if self.writer is not None:
+            self.writer.join()
+
+
     # This function starts the web scraping
-    def start_scraping(self):
+    # If 'in_memory' is True, the rounds are returned instead of only being saved as JSON files (see 'generate_rounds')
+    def start_scraping(self, in_memory=False, save_files=True):
 
-        # HTTP request to the URL
-        content = requests.get(self.url, headers=self.header)
+        # HTTP request to the URL (the page is only downloaded if it changed since it was stored in the HTTP cache)
+        with span('http_request'):
+            content = fetch_page(self.url, self.session, self.header, self.offline)
 
         # Checking the output status code
-        if content.status_code != 200:
+        if content.status_code != 200 and self.offline:
+            print(f"ERROR. The page {self.url} isn't stored in the HTTP cache (offline mode).")
+
+        elif content.status_code != 200:
             # Any status code other than 200 means an error occurred
             print(f"ERROR in the HTTP request. Code {content.status_code}.")
 
         else:
-            # Formatting the web content
-            self.soup = BeautifulSoup(content.text, 'html.parser')
-            # Getting the total number of rounds
-            self.get_total_rounds()
+            # Parsing the stats tables of the page (a single pass over the HTML)
+            if not self.load_page(content.text):
+                return []
             # Checking that the number was correctly scraped
             if self.rounds_num > 0:
                 # Calling the JSON generator method
+                if in_memory:
+                    return self.generate_rounds(save_files)
                 self.generate_json()
             else:
                 print("ERROR. The number of rounds scraped is not correct.")
 
+        return []
+
+
+
+class UFC_EVENT_SCRAPER:
+
+    def __init__(self, link, flag_rm=False, flag_t=False, policy='skip', workers=SCRAPER_WORKERS, offline=OFFLINE_MODE):
+        # Link to the event page of the UFC stats website
+        self.url = link
+
+        # Flags and policy passed to the scraper of every fight (see 'UFC_WEB_SCRAPER')
+        # The fights are scraped at the same time, so the user can't be asked about existing files
+        if policy == 'ask':
+            raise ValueError("The fights of an event are scraped at the same time, so the policy can't be 'ask'")
+        self.remove_last_round = flag_rm
+        self.testing = flag_t
+        self.policy = policy
+
+        # Maximum number of fights scraped at the same time
+        self.workers = workers
+
+        # Flag; if True, the pages are only read from the HTTP cache (no requests are made)
+        self.offline = offline
+
+        # HTTP session shared by all the scrapers, with a connection pool large enough for all the workers
+        self.session = make_session(workers)
+
+        # Links to the fight pages of the event, and the scraper used for each fight
+        self.fight_links = []
+        self.scrapers = []
+
+
+    # This function gets the links to the fight pages from the event page (in the order they appear, without duplicates)
+    def get_fight_links(self, soup):
+        return find_links(soup, 'fight-details', self.url)
+
+
+    # This function scrapes a single fight of the event, returning its scraper
+    def scrape_fight(self, link):
+        scraper = UFC_WEB_SCRAPER(link, self.remove_last_round, self.testing, self.policy, self.session, self.offline)
+        try:
+            scraper.start_scraping()
+        except Exception as e:
+            print(f"ERROR scraping {link}: {e}")
+        return scraper
+
+
+    # This function starts the web scraping of the whole event
+    # All the fights are downloaded and parsed at the same time, so it takes about as long as the slowest fight
+    def start_scraping(self):
+
+        # HTTP request to the event page
+        with span('http_request'):
+            content = fetch_page(self.url, self.session, REQUEST_HEADER, self.offline)
+
+        if content.status_code != 200:
+            print(f"ERROR in the HTTP request. Code {content.status_code}.")
+            return []
+
+        self.fight_links = self.get_fight_links(BeautifulSoup(content.text, 'html.parser'))
+        if not self.fight_links:
+            print("ERROR. No fights were found in the event page.")
+            return []
+
+        ini_t = time.perf_counter()
+        with span('scrape_event', fights=len(self.fight_links)):
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(self.fight_links))) as executor:
+                self.scrapers = list(executor.map(self.scrape_fight, self.fight_links))
+
+        print(f"\n{len(self.fight_links)} fights scraped in {time.perf_counter() - ini_t:.2f} s.")
+        return self.scrapers
+
     
+# This function generates the JSON files of every fight page stored in the HTTP cache again, without any request
+# Useful after changing how the pages are parsed: thousands of fights are processed at parsing speed
+# The rounds aren't labeled (their 'winner' is null, as in 'backfill.py'), so they're stored in the backfill directory by default,
+# and fights that already have files are skipped. The last round is only ignored for the fights that didn't go to decision
+def replay_cache(directory=BACKFILL_DIRECTORY, policy='skip'):
+    if policy not in ('overwrite', 'append', 'skip'):
+        raise ValueError(f"Unknown policy '{policy}' for the replay. Use one of: overwrite, append, skip")
+
+    cache = HTTP_CACHE()
+    links = [url for url in cache.urls() if 'fight-details' in url]
+
+    os.makedirs(directory, exist_ok=True)
+    index = fight_index(directory)
+
+    generated = 0
+    for link in links:
+        _, html = cache.read(link)
+        if html is None:
+            continue
+
+        method = fight_method(html)
+        remove_last_round = method is not None and not method.startswith('Decision')
+        scraper = UFC_WEB_SCRAPER(link, remove_last_round, policy=policy, offline=True)
+
+        # Fights finished in the first round don't have any complete round
+        if not scraper.load_page(html) or (remove_last_round and scraper.rounds_num == 1):
+            continue
+
+        rounds = scraper.extract_rounds()
+        for data in rounds:
+            data['winner'] = None
+
+        if index.write_fight(f'{scraper.red_last_name}_{scraper.blue_last_name}', rounds, policy):
+            generated += 1
+
+    print(f"\n{generated} of {len(links)} fights generated from the HTTP cache in '{directory}'.")
+
+
 # Main
 if __name__ == '__main__':
     rm_flag = ('--remove-last' in sys.argv) or ('-r' in sys.argv)   # If we use the '-r' flag, the last round will be ignored
     test_flag = ('--testing' in sys.argv) or ('-t' in sys.argv)     # If we use the '-t' flag, the files will be generated in the testing directory
-    scraper = UFC_WEB_SCRAPER(LINK_UFC_WEBSITE, rm_flag, test_flag)
+
+    # Policy for existing files (asking the user by default, or skipping the fight when scraping a whole event)
+    policy = sys.argv[sys.argv.index('--policy') + 1] if '--policy' in sys.argv else None
+
+    # If we use the '--offline' flag, the pages are only read from the HTTP cache
+    offline = OFFLINE_MODE or '--offline' in sys.argv
+
+    # If we use the '--replay' flag, the files of all the fights in the HTTP cache will be generated again (the '-r' flag isn't used:
+    # the last round is ignored depending on the method of every fight)
+    if '--replay' in sys.argv:
+        replay_cache(TEST_DIRECTORY if test_flag else BACKFILL_DIRECTORY, policy or 'skip')
+        sys.exit(0)
+
+    # If we use the '--event' flag followed by the link to an event page, all the fights of the event will be scraped
+    if '--event' in sys.argv:
+        scraper = UFC_EVENT_SCRAPER(sys.argv[sys.argv.index('--event') + 1], rm_flag, test_flag, policy or 'skip', offline=offline)
+    else:
+        scraper = UFC_WEB_SCRAPER(LINK_UFC_WEBSITE, rm_flag, test_flag, policy or 'ask', offline=offline)
     scraper.start_scraping()
\ No newline at end of file
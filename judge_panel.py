@@ -0,0 +1,234 @@
+# Iván Ontiveros - RetroVortex
+
+
+# This script implements a panel of judges that score a fight together
+# The rounds of the fight are found and parsed only once, and the same input matrix is sent to every judge
+# Each judge keeps its own normalization factors, and all the models make their predictions at the same time
+
+
+# Libraries
+from concurrent.futures import ThreadPoolExecutor
+import os
+import numpy as np
+
+from round_judge import AI_JUDGE
+from judgionLib.ingestion import round_extractor, STATS_PER_FIGHTER
+from judgionLib.shards import read_round
+from judgionLib.fight_index import fight_index, split_round_name
+from judgionLib.profiling import span
+from judgionLib.decisions import scorecard, decision_type, decision_text, decision_probabilities
+from judgionLib.constants import MODELS_DIRECTORY, TEST_DIRECTORY
+
+
+class JUDGE_PANEL:
+
+    def __init__(self, judges=None):
+
+        # List of AI_JUDGE objects, each one with its judge model already set
+        self.judges = judges if judges is not None else []
+
+        # Predictions of every judge for the last fight scored
+        self.last_predictions = None
+
+
+    # This function asks the user for the model of each judge
+    def set_judges(self, num_judges):
+        for _ in range(num_judges):
+            judge = AI_JUDGE()
+            judge.set_judge()
+            self.judges.append(judge)
+
+
+    # This function loads the judges from the names of their models, without asking the user
+    def load_judges(self, names):
+        for name in names:
+            judge = AI_JUDGE()
+            judge.load_judge(os.path.join(MODELS_DIRECTORY, f"{name}.h5"))
+            self.judges.append(judge)
+
+
+    # This function groups the judges that use the same model (the model registry gives them the same object) and normalization factors
+    # It returns one judge of every group, and the group of each judge of the panel
+    def model_groups(self):
+        groups = {}
+        distinct_judges = []
+        judge_groups = []
+
+        for judge in self.judges:
+            key = (id(judge.judge_model), id(judge.norm_factors))
+            if key not in groups:
+                groups[key] = len(distinct_judges)
+                distinct_judges.append(judge)
+            judge_groups.append(groups[key])
+
+        return distinct_judges, judge_groups
+
+
+    # This function returns the predictions of every judge for the same input matrix
+    # The models run concurrently (TensorFlow releases the GIL while predicting), so the panel takes about as long as one judge
+    # A model shared by several judges only predicts once, as a Keras model can't be used by several threads at the same time
+    def predict_rounds(self, input_data):
+        distinct_judges, judge_groups = self.model_groups()
+
+        # Keras builds the prediction function the first time it's needed, so that's done before starting the threads
+        for judge in distinct_judges:
+            if hasattr(judge.judge_model, 'make_predict_function'):
+                judge.judge_model.make_predict_function()
+
+        with span('panel_predict', judges=len(self.judges), rounds=len(input_data)):
+            with ThreadPoolExecutor(max_workers=len(distinct_judges)) as executor:
+                predictions = list(executor.map(lambda judge: judge.predict_rounds(input_data), distinct_judges))
+
+        return [predictions[group] for group in judge_groups]
+
+
+    # This function executes the judging process of the whole panel, returning the result of every scorecard
+    # 0: Draw ; 1: Red fighter win ; 2: Blue fighter win (None if the fight wasn't found)
+    def give_scorecards(self, fight_id):
+
+        # The first judge finds and parses the rounds of the fight (only once for the whole panel)
+        loader = self.judges[0]
+        loader.fight_id = fight_id
+        fight_files = loader.rounds_extractor()
+
+        # If none are found, end the judging process
+        if not fight_files:
+            print(f"There are no fights that match the fight ID ({fight_id}).\n")
+            print("Enter a valid fight ID and restart the process.\n")
+            self.last_predictions = None
+            return [None] * len(self.judges)
+
+        # Extract the round numbers and load the input matrix
+        round_numbers = loader.get_round_numbers(fight_files)
+        input_data = loader.load_rounds(fight_files)
+
+        return self.score_rounds(input_data, fight_id, loader.red_fighter, loader.blue_fighter, round_numbers)
+
+
+    # This function executes the judging process of the whole panel for rounds already in memory (in the JSON schema of the round files)
+    # The rounds aren't read from the disk, so it can be used right after scraping a fight
+    def score_fight(self, rounds, fight_id=None):
+        input_data = np.empty((len(rounds), 2 * STATS_PER_FIGHTER), dtype=np.float32)
+        for i, data in enumerate(rounds):
+            round_extractor(data, input_data[i])
+
+        red_fighter = rounds[0]['red_fighter']['name']
+        blue_fighter = rounds[0]['blue_fighter']['name']
+        return self.score_rounds(input_data, fight_id, red_fighter, blue_fighter, list(range(1, len(rounds) + 1)))
+
+
+    # This function makes every judge score a matrix of rounds of the same fight, and prints their scorecards
+    def score_rounds(self, input_data, fight_id, red_fighter, blue_fighter, round_numbers):
+
+        # Share the fight information with all the judges
+        for judge in self.judges:
+            judge.fight_id = fight_id
+            judge.red_fighter = red_fighter
+            judge.blue_fighter = blue_fighter
+
+        # All the judges predict at the same time
+        # The predictions are kept, so the probability of every official decision can be computed afterwards
+        predictions = self.predict_rounds(input_data)
+        self.last_predictions = predictions
+
+        # Then, the scorecards are printed one after another
+        results = []
+        for judge, judge_predictions in zip(self.judges, predictions):
+            results.append(judge.print_scorecards(judge_predictions, round_numbers))
+
+        return results
+
+
+    # This function starts the live mode of every judge for a new fight
+    def start_live(self, red_fighter, blue_fighter, fight_id=None):
+        for judge in self.judges:
+            judge.start_live(red_fighter, blue_fighter, fight_id)
+        self.last_predictions = None
+
+
+    # This function scores the round that just finished in live mode (in the JSON schema of the round files), returning the current result of every judge
+    # Every judge makes a single-round prediction, whatever the number of rounds already scored
+    def score_live_round(self, data):
+        input_data = np.empty((1, 2 * STATS_PER_FIGHTER), dtype=np.float32)
+        round_extractor(data, input_data[0])
+
+        predictions = self.predict_rounds(input_data)
+        results = [judge.add_live_round(prediction) for judge, prediction in zip(self.judges, predictions)]
+
+        # Predictions of all the rounds scored so far, used for the probabilities of the projected decision
+        self.last_predictions = [np.concatenate(judge.live_predictions) for judge in self.judges]
+
+        return results
+
+
+    # This function builds the scorecards of every judge and the official decision for several fights
+    # 'predictions' has the output of every judge for the rounds of all the fights, stacked in the same order as 'fights'
+    # 'fights' is a list of (red fighter, blue fighter, round labels) tuples
+    def fight_results(self, predictions, fights):
+        results = []
+        start = 0
+
+        for red_name, blue_name, round_labels in fights:
+            end = start + len(round_labels)
+
+            judges = []
+            for judge, judge_predictions in zip(self.judges, predictions):
+                fight_predictions = judge_predictions[start:end]
+                round_scores, red_score, blue_score, result = scorecard(fight_predictions)
+                judges.append({
+                    'judge': judge.judge_name,
+                    'rounds': [{'round': label, 'probabilities': [float(p) for p in probabilities], 'score': list(score)}
+                               for label, probabilities, score in zip(round_labels, fight_predictions, round_scores)],
+                    'score': [red_score, blue_score],
+                    'result': result,
+                })
+
+            scorecard_results = [judge['result'] for judge in judges]
+            kind, winner = decision_type(scorecard_results.count(1), scorecard_results.count(2), scorecard_results.count(0))
+            outcomes = decision_probabilities([judge_predictions[start:end] for judge_predictions in predictions])
+            results.append({
+                'red_fighter': red_name,
+                'blue_fighter': blue_name,
+                'judges': judges,
+                'decision': {'type': kind, 'winner': winner, 'text': decision_text(scorecard_results, red_name, blue_name)},
+                'decision_probabilities': [{'type': outcome_kind, 'winner': outcome_winner, 'probability': float(probability)}
+                                           for (outcome_kind, outcome_winner), probability in sorted(outcomes.items(), key=lambda x: -x[1])],
+            })
+            start = end
+
+        return results
+
+
+    # This function finds every fight in the test directory, returning a dictionary: fight ID -> round files (sorted)
+    def find_fights(self):
+        index = fight_index(TEST_DIRECTORY)
+        return {fight_id: index.rounds(fight_id) for fight_id in index.fight_ids()}
+
+
+    # This function scores every fight in the test directory without asking the user anything
+    # The rounds of all the fights are stacked in a single matrix, so each judge makes a single prediction call
+    def score_test_directory(self):
+        fights = self.find_fights()
+
+        # Load all the rounds in a single matrix
+        total = sum(len(files) for files in fights.values())
+        input_data = np.empty((total, 2 * STATS_PER_FIGHTER), dtype=np.float32)
+        fight_info = []
+        row = 0
+        with span('parse_rounds', rounds=total):
+            for fight_id, files in fights.items():
+                for filename in files:
+                    data = read_round(TEST_DIRECTORY, filename)
+                    round_extractor(data, input_data[row])
+                    row += 1
+                round_labels = [split_round_name(filename)[1] for filename in files]
+                fight_info.append((data['red_fighter']['name'], data['blue_fighter']['name'], round_labels))
+
+        # One prediction call per judge, all of them at the same time
+        predictions = self.predict_rounds(input_data) if total > 0 else []
+
+        results = self.fight_results(predictions, fight_info)
+        for fight_id, result in zip(fights, results):
+            result['fight_id'] = fight_id
+
+        return results
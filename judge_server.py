@@ -0,0 +1,189 @@
+# Iván Ontiveros - RetroVortex
+
+
+# This script runs a local scoring service that keeps the chosen judges loaded between requests
+# Every 'main.py' run pays the model loading time; with the service, that's only done once, when it starts
+# Rounds are sent in the JSON schema of the round files, and the service returns the probabilities, scorecards and decision
+# Requests that arrive at the same time are micro-batched, so each judge scores all of them with a single prediction call
+#
+# Start it with the names of the judge models (or without them to choose the judges interactively):
+#   python judge_server.py "The Pyramid" "The Diagonal" "The Cross"
+#
+# Then, send a POST request to http://127.0.0.1:8085/score with the rounds of one fight or a whole card:
+#   {"rounds": [{"red_fighter": {...}, "blue_fighter": {...}}, ...]}
+#   {"fights": [{"rounds": [...]}, {"rounds": [...]}, ...]}
+
+
+# Libraries
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import Future
+import threading
+import queue
+import json
+import time
+import sys
+import numpy as np
+
+from judge_panel import JUDGE_PANEL
+from judgionLib.ingestion import round_extractor, STATS_PER_FIGHTER
+from judgionLib.constants import NUM_JUDGES, SERVER_HOST, SERVER_PORT, SERVER_BATCH_WINDOW, SERVER_MAX_BATCH_ROWS
+
+
+class MICRO_BATCHER:
+
+    def __init__(self, judge, window=SERVER_BATCH_WINDOW, max_rows=SERVER_MAX_BATCH_ROWS):
+
+        # Judge whose predictions are batched
+        self.judge = judge
+
+        # Time (in seconds) the batcher waits for more requests after receiving one, and maximum number of rounds per batch
+        self.window = window
+        self.max_rows = max_rows
+
+        # Pending requests, stored as (input matrix, future)
+        self.requests = queue.Queue()
+
+        # The batches are processed by a background thread
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+
+    # This function queues a matrix of rounds, returning a future that will receive the judge's predictions
+    def submit(self, input_data):
+        future = Future()
+        self.requests.put((input_data, future))
+        return future
+
+
+    # This function collects the requests that arrive together, and scores all of them with a single prediction call
+    def run(self):
+        while True:
+            batch = [self.requests.get()]
+            rows = len(batch[0][0])
+
+            # Keep collecting requests until the window ends or the batch is full
+            deadline = time.perf_counter() + self.window
+            while rows < self.max_rows:
+                try:
+                    batch.append(self.requests.get(timeout=max(0.0, deadline - time.perf_counter())))
+                except queue.Empty:
+                    break
+                rows += len(batch[-1][0])
+
+            try:
+                predictions = self.judge.predict_rounds(np.concatenate([input_data for input_data, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            # Give each request its own rows of the predictions
+            start = 0
+            for input_data, future in batch:
+                future.set_result(predictions[start:start + len(input_data)])
+                start += len(input_data)
+
+
+class SCORING_SERVICE:
+
+    def __init__(self, panel):
+
+        # Panel of judges, already loaded
+        self.panel = panel
+
+        # One micro-batcher per model, so all the models score each batch at the same time
+        # Judges that share a model share its batcher too, so the model is never used by two threads at once
+        distinct_judges, self.judge_groups = panel.model_groups()
+        self.batchers = [MICRO_BATCHER(judge) for judge in distinct_judges]
+
+
+    # This function scores a list of fights (each one a list of rounds in the JSON schema of the round files)
+    def score_fights(self, fights):
+
+        # All the rounds of all the fights are stacked in a single matrix
+        total = sum(len(rounds) for rounds in fights)
+        input_data = np.empty((total, 2 * STATS_PER_FIGHTER), dtype=np.float32)
+        row = 0
+        for rounds in fights:
+            for data in rounds:
+                round_extractor(data, input_data[row])
+                row += 1
+
+        # Every model scores the matrix (together with any other request that arrived at the same time)
+        futures = [batcher.submit(input_data) for batcher in self.batchers]
+        model_predictions = [future.result() for future in futures]
+        predictions = [model_predictions[group] for group in self.judge_groups]
+
+        # Build the scorecards and the official decision of every fight
+        fight_info = [(rounds[0]['red_fighter']['name'], rounds[0]['blue_fighter']['name'], list(range(1, len(rounds) + 1))) for rounds in fights]
+        return self.panel.fight_results(predictions, fight_info)
+
+
+# This function creates the HTTP request handler for a scoring service
+def make_handler(service):
+
+    class SCORING_HANDLER(BaseHTTPRequestHandler):
+
+        # This function sends a JSON response
+        def send_json(self, status, content):
+            body = json.dumps(content).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+        # GET /judges --> Names of the judges loaded by the service
+        def do_GET(self):
+            if self.path == '/judges':
+                self.send_json(200, {'judges': [judge.judge_name for judge in service.panel.judges]})
+            else:
+                self.send_json(404, {'error': 'Unknown path'})
+
+
+        # POST /score --> Scorecards and decision for the fights received
+        def do_POST(self):
+            if self.path != '/score':
+                self.send_json(404, {'error': 'Unknown path'})
+                return
+
+            try:
+                content = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                fights = [fight['rounds'] for fight in content['fights']] if 'fights' in content else [content['rounds']]
+                if not all(fights):
+                    raise ValueError("every fight must have at least one round")
+                response = {'fights': service.score_fights(fights)}
+            except (ValueError, KeyError, TypeError) as e:
+                self.send_json(400, {'error': f"Invalid request: {e}"})
+                return
+
+            self.send_json(200, response)
+
+
+        # Requests aren't logged in the terminal, as that slows down the responses
+        def log_message(self, format, *args):
+            pass
+
+    return SCORING_HANDLER
+
+
+# Main
+if __name__ == '__main__':
+
+    # Load the judges, by name if they were given when running the script, or asking the user otherwise
+    panel = JUDGE_PANEL()
+    if len(sys.argv) > 1:
+        panel.load_judges(sys.argv[1:])
+    else:
+        panel.set_judges(NUM_JUDGES)
+
+    service = SCORING_SERVICE(panel)
+
+    # Start the service
+    server = ThreadingHTTPServer((SERVER_HOST, SERVER_PORT), make_handler(service))
+    print(f"Scoring service running on http://{SERVER_HOST}:{SERVER_PORT} with the judges: {', '.join(judge.judge_name for judge in panel.judges)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nScoring service stopped.")
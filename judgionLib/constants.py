@@ -6,14 +6,110 @@ TRAINING_DIRECTORY = "judgion-dataset"
 TEST_DIRECTORY = 'test'
 MODELS_DIRECTORY = 'models'
 LOG_DIRECTORY = 'logs'
+CACHE_DIRECTORY = 'cache'
 
 # Number of judges for the main script judging process
 NUM_JUDGES = 3
 
+# Runtime used by the judges: 'keras' (the '.h5' model), 'numpy' (the NumPy export, see 'numpy_runtime.py'),
+# 'tflite' (the TFLite export, see 'tflite_runtime.py') or 'auto' (the NumPy export if it's up to date with the '.h5' model, the Keras model otherwise)
+JUDGE_BACKEND = 'auto'
+# Maximum difference allowed between the outputs of a Keras model and its NumPy export
+NUMPY_EXPORT_TOLERANCE = 1e-5
+
+# Maximum number of judge models kept loaded at the same time by the model registry
+MODEL_CACHE_SIZE = 8
+
+# Scraper: maximum number of fight pages downloaded at the same time when scraping a whole event, and timeout (in seconds) of every request
+SCRAPER_WORKERS = 16
+SCRAPER_TIMEOUT = 30
+
+# Backfill crawler (backfill.py): directory where the rounds are stored (they're unlabeled, so they aren't used for training until
+# they are labeled and moved to the training directory), base URL of the UFC stats website, maximum requests per second,
+# fights downloaded at the same time, and number of retries of a failed request (waiting BACKFILL_BACKOFF seconds before the first one,
+# and twice as long before each of the next ones)
+BACKFILL_DIRECTORY = 'judgion-backfill'
+UFC_STATS_URL = 'http://www.ufcstats.com'
+BACKFILL_RATE = 2.0
+BACKFILL_WORKERS = 4
+BACKFILL_RETRIES = 4
+BACKFILL_BACKOFF = 1.0
+
+# Lock of a round directory, used so several scrapers (even in different processes) can write rounds to the same directory
+# Seconds a scraper waits for the lock before giving up (the lock is only held while the files of a fight are written, which takes milliseconds,
+# and the operating system releases it if the process that holds it crashes)
+DIRECTORY_LOCK_TIMEOUT = 30
+
+# HTTP cache. If True, the fight and event pages downloaded by the scraper are stored in the cache directory, and only downloaded
+# again if they changed. In offline mode, pages are only read from the cache (no requests are made)
+USE_HTTP_CACHE = True
+OFFLINE_MODE = False
+
+# Prediction cache. If True, the judges that run a Keras model store their predictions on disk, so rounds that were already scored by the
+# same model aren't predicted again (the NumPy and TFLite runtimes are faster than the cache, so they never use it)
+USE_PREDICTION_CACHE = True
+# Maximum number of predictions stored in the cache (the least recently used ones are dropped)
+PREDICTION_CACHE_SIZE = 100000
+
+# Scoring service (judge_server.py): address, time (in seconds) each judge waits to batch requests together, and maximum rounds per batch
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8085
+SERVER_BATCH_WINDOW = 0.001
+SERVER_MAX_BATCH_ROWS = 1024
+
+# Streaming training. If True, the training dataset is read in chunks during the training process instead of being fully loaded in memory
+STREAM_TRAINING = False
+# Number of files read in each chunk, and size of the buffer used for shuffling the rounds while streaming
+STREAM_CHUNK_SIZE = 1024
+SHUFFLE_BUFFER = 8192
+
+# Latency spans. If True, the time taken by every stage of the judging process is appended to a JSONL file in the logs directory
+PROFILING = True
+LATENCY_LOG_FILENAME = 'latency.jsonl'
+
+# Maximum time (in seconds) that importing a data-only module can take. Checked by the 'imports' benchmark
+IMPORT_TIME_BUDGET = 0.5
+
 # Training seed. Useful for replicating the model training with the best hyperparamethers found with Grid Search
 USE_SEED = False
 TRAINING_SEED = 120
 
+# Maximum number of rounds stored in each shard of a packed dataset
+SHARD_SIZE = 4096
+
+# Stat layout of each fighter in the round JSON files. The order is the one used by the models' input (23 stats per fighter)
+# Each entry is the key path of a stat inside the fighter dictionary
+STAT_LAYOUT = [
+    ('knockdowns',),
+    ('cuts',),
+    ('sigstrikes', 'head_attempted'),
+    ('sigstrikes', 'head_landed'),
+    ('sigstrikes', 'body_attempted'),
+    ('sigstrikes', 'body_landed'),
+    ('sigstrikes', 'leg_attempted'),
+    ('sigstrikes', 'leg_landed'),
+    ('sigstrikes', 'total_attempted'),
+    ('sigstrikes', 'total_landed'),
+    ('sigstrikes', 'distance_attempted'),
+    ('sigstrikes', 'distance_landed'),
+    ('sigstrikes', 'clinch_attempted'),
+    ('sigstrikes', 'clinch_landed'),
+    ('sigstrikes', 'ground_attempted'),
+    ('sigstrikes', 'ground_landed'),
+    ('strikes', 'attempted'),
+    ('strikes', 'landed'),
+    ('takedowns', 'attempted'),
+    ('takedowns', 'landed'),
+    ('sub_attempts',),
+    ('reversals',),
+    ('control_seconds',),
+]
+
+# Dataset parsing is split between several processes when the dataset has at least this number of files
+PARALLEL_MIN_FILES = 512
+# Number of files parsed by each task of the process pool
+PARSING_CHUNK_SIZE = 256
+
 # General stat map used in data_visualizer
 STAT_MAP = [
     {'stat_index': 0, 'name': 'Knockdowns', 'bar_flag': 1, 'box_flag': 1},
@@ -0,0 +1,155 @@
+# judgionLib/dataset_cache.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script implements a persistent feature store for the training dataset
+# Parsing every JSON file of the dataset is slow, so the parsed rounds are stored in a '.npz' file together with a manifest
+# The manifest maps every round file to its content hash and its row in the store, so only new or changed files are parsed
+
+
+import os
+import json
+import hashlib
+import numpy as np
+
+from judgionLib.ingestion import parse_rounds, parse_shard_store, mirror_rounds, STATS_PER_FIGHTER
+from judgionLib.shards import is_shard_store
+from judgionLib.constants import CACHE_DIRECTORY
+
+
+# Version of the store content. Changing it invalidates the stores saved by previous versions
+CACHE_FORMAT = 3
+
+
+# This function returns the path of the store file associated with a dataset directory
+# Other files stored for the same directory use a different suffix
+def cache_path(directory, suffix='.npz'):
+
+    # Every dataset directory gets its own store file
+    directory_id = hashlib.sha1(os.path.abspath(directory).encode('utf-8')).hexdigest()[:12]
+    base_name = os.path.basename(os.path.normpath(directory))
+
+    return os.path.join(CACHE_DIRECTORY, f"{base_name}_{directory_id}{suffix}")
+
+
+# This function returns the content hash of a file
+def file_hash(path):
+    with open(path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+# This function returns the size and modification time of every round file in the directory, without opening them
+def scan_directory(directory):
+    files = {}
+
+    # scandir returns the file metadata without extra system calls on most platforms
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.endswith('.json') and entry.is_file():
+                info = entry.stat()
+                files[entry.name] = (info.st_size, info.st_mtime_ns)
+
+    return files
+
+
+# This function stores the feature store (original rounds, labels and manifest) in its file
+def save_cache(path, manifest, stats, winners):
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # The file is written with a temporary name and then renamed, so a crash never leaves a corrupted store
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.savez(file, stats=stats, winners=winners, manifest=np.array(json.dumps(manifest)))
+    os.replace(tmp_path, path)
+
+
+# This function reads the feature store, returning an empty one if it doesn't exist or it can't be read
+def load_cache(path):
+    empty = ({}, np.empty((0, 2 * STATS_PER_FIGHTER), dtype=np.float32), np.empty(0, dtype=np.int64))
+
+    if not os.path.exists(path):
+        return empty
+
+    try:
+        with np.load(path) as cache:
+            manifest = json.loads(str(cache['manifest']))
+            # A store saved by another version of the code is rebuilt from scratch
+            if manifest.get('format') != CACHE_FORMAT:
+                return empty
+            return manifest['files'], cache['stats'], cache['winners']
+
+    except (OSError, ValueError, KeyError):
+        return empty
+
+
+# This function brings the feature store up to date with the dataset directory
+# It returns the original rounds, their labels, and a report with the files that were added, modified and removed
+def update_store(directory):
+    path = cache_path(directory)
+    manifest, stats, winners = load_cache(path)
+    current = scan_directory(directory)
+
+    changes = {'added': [], 'modified': [], 'removed': []}
+    new_manifest = {}
+    kept_rows = []
+    new_files = []
+    touched = False
+
+    for filename, (size, mtime) in current.items():
+        entry = manifest.get(filename)
+
+        # Same size and modification time: the file hasn't changed, so we don't even open it
+        if entry is not None and entry['size'] == size and entry['mtime_ns'] == mtime:
+            new_manifest[filename] = dict(entry, row=len(kept_rows))
+            kept_rows.append(entry['row'])
+            continue
+
+        # Otherwise, the content hash decides if the round has to be parsed again
+        content_hash = file_hash(os.path.join(directory, filename))
+        if entry is not None and entry['hash'] == content_hash:
+            new_manifest[filename] = dict(entry, size=size, mtime_ns=mtime, row=len(kept_rows))
+            kept_rows.append(entry['row'])
+            touched = True
+            continue
+
+        changes['modified' if entry is not None else 'added'].append(filename)
+        new_files.append((filename, size, mtime, content_hash))
+
+    # Files in the manifest that aren't in the directory anymore are dropped
+    changes['removed'] = sorted(set(manifest) - set(current))
+
+    # If nothing changed, the store is returned as it is
+    if not (new_files or changes['removed'] or touched):
+        return stats, winners, changes
+
+    # Parse only the new and modified rounds, and append them after the rounds we keep
+    new_stats, new_winners = parse_rounds([os.path.join(directory, filename) for filename, _, _, _ in new_files])
+    for filename, size, mtime, content_hash in new_files:
+        new_manifest[filename] = {'size': size, 'mtime_ns': mtime, 'hash': content_hash, 'row': len(new_manifest)}
+
+    stats = np.concatenate((stats[kept_rows], new_stats))
+    winners = np.concatenate((winners[kept_rows], new_winners))
+    save_cache(path, {'format': CACHE_FORMAT, 'files': new_manifest}, stats, winners)
+
+    changes['added'].sort()
+    changes['modified'].sort()
+
+    return stats, winners, changes
+
+
+# This function works as 'stats_getter', but it only parses the files that changed since the last execution
+def load_dataset(directory):
+
+    # Packed datasets are read shard by shard, which is already fast, so they don't use the feature store
+    if is_shard_store(directory):
+        return mirror_rounds(*parse_shard_store(directory))
+
+    stats, winners, changes = update_store(directory)
+
+    # Report what changed in the dataset
+    if changes['added'] or changes['modified'] or changes['removed']:
+        print(f"Dataset store updated: {len(changes['added'])} rounds added, {len(changes['modified'])} modified, {len(changes['removed'])} removed.")
+
+    # Add the symmetric rounds, just as 'stats_getter' does
+    return mirror_rounds(stats, winners)
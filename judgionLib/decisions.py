@@ -0,0 +1,150 @@
+# judgionLib/decisions.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script includes the scoring rules shared by the judging scripts: round scores, scorecards and official decisions
+# It also computes the exact probability of every official decision from the judges' round probabilities
+# Results of a scorecard --> 0: Draw ; 1: Red fighter win ; 2: Blue fighter win
+
+
+import numpy as np
+
+
+# Points (red corner, blue corner) given for each model output: 10-8 red, 10-9 red, 9-10 blue, 8-10 blue
+ROUND_SCORES = ((10, 8), (10, 9), (9, 10), (8, 10))
+
+
+# This function returns the scorecard of a judge from the model's predictions (one row per round)
+# It returns the points of every round, the total points of each fighter and the result of the scorecard
+def scorecard(predictions):
+    rounds = [ROUND_SCORES[predicted_class] for predicted_class in np.argmax(predictions, axis=1)]
+    red_score = sum(red for red, _ in rounds)
+    blue_score = sum(blue for _, blue in rounds)
+
+    if red_score > blue_score:
+        result = 1
+    elif blue_score > red_score:
+        result = 2
+    else:
+        result = 0
+
+    return rounds, red_score, blue_score, result
+
+
+# This function returns the official decision for the number of scorecards won by each fighter and the number of draws
+# The decision is returned as (type of decision, winner) --> winner: 0 for draws, 1 for the red corner, 2 for the blue corner
+# It doesn't assume there are 3 scorecards
+def decision_type(red_wins, blue_wins, draw_votes):
+
+    if draw_votes == 0:
+        if blue_wins == 0:
+            return 'Unanimous Decision', 1
+        if red_wins == 0:
+            return 'Unanimous Decision', 2
+        if red_wins > blue_wins:
+            return 'Split Decision', 1
+        if blue_wins > red_wins:
+            return 'Split Decision', 2
+        return 'Split Draw', 0
+
+    if red_wins == 0 and blue_wins == 0:
+        return 'Unanimous Draw', 0
+
+    if red_wins > 0 and blue_wins > 0:
+        if draw_votes >= red_wins and draw_votes >= blue_wins:
+            return 'Split Draw', 0
+        if draw_votes >= red_wins:
+            return 'Split Decision', 2
+        if draw_votes >= blue_wins:
+            return 'Split Decision', 1
+        # Both fighters won more scorecards than the draws (only possible with 5 or more judges)
+        if red_wins > blue_wins:
+            return 'Split Decision', 1
+        if blue_wins > red_wins:
+            return 'Split Decision', 2
+        return 'Split Draw', 0
+
+    if red_wins == 0:
+        if draw_votes > blue_wins:
+            return 'Majority Draw', 0
+        return 'Majority Decision', 2
+
+    if draw_votes > red_wins:
+        return 'Majority Draw', 0
+    return 'Majority Decision', 1
+
+
+# Difference of points (red - blue) given for each model output
+ROUND_DIFFERENTIALS = np.array([red - blue for red, blue in ROUND_SCORES])
+
+
+# This function returns the probability of every final score differential (red - blue) of each judge's scorecard
+# 'predictions' has the model outputs of every judge for every round, with shape (judges, rounds, 4)
+# The distribution is built round by round (dynamic programming over the score totals), instead of going through the 4^rounds scorecards
+# It returns a (judges, 4 * rounds + 1) matrix; column i is the probability of a differential of i - 2 * rounds
+def differential_distribution(predictions):
+    predictions = np.asarray(predictions, dtype=np.float64)
+    predictions = predictions / predictions.sum(axis=2, keepdims=True)
+    num_judges, num_rounds, _ = predictions.shape
+
+    max_diff = ROUND_DIFFERENTIALS.max() * num_rounds
+    distribution = np.zeros((num_judges, 2 * max_diff + 1))
+    distribution[:, max_diff] = 1.0
+
+    # Every round moves the differential by the points of each possible score, weighted by its probability
+    for r in range(num_rounds):
+        new_distribution = np.zeros_like(distribution)
+        for k, diff in enumerate(ROUND_DIFFERENTIALS):
+            if diff > 0:
+                new_distribution[:, diff:] += distribution[:, :-diff] * predictions[:, r, k, None]
+            else:
+                new_distribution[:, :diff] += distribution[:, -diff:] * predictions[:, r, k, None]
+        distribution = new_distribution
+
+    return distribution
+
+
+# This function returns the probability of every result of each judge's scorecard, as a (judges, 3) matrix
+# Columns follow the scorecard results --> 0: Draw ; 1: Red fighter win ; 2: Blue fighter win
+def scorecard_probabilities(predictions):
+    distribution = differential_distribution(predictions)
+    center = distribution.shape[1] // 2
+
+    return np.stack([distribution[:, center], distribution[:, center + 1:].sum(axis=1), distribution[:, :center].sum(axis=1)], axis=1)
+
+
+# This function returns the exact probability of every official decision, given the predictions of all the judges
+# The judges are assumed to be independent. A second dynamic programming pass computes the probability of each
+# number of scorecards won by each fighter, which are then mapped to the official decisions
+# It returns a dictionary: (type of decision, winner) -> probability
+def decision_probabilities(predictions):
+    results = scorecard_probabilities(predictions)
+    num_judges = len(results)
+
+    # counts[r, b] --> Probability of the red fighter winning r scorecards and the blue one winning b (the rest are draws)
+    counts = np.zeros((num_judges + 1, num_judges + 1))
+    counts[0, 0] = 1.0
+    for draw, red, blue in results:
+        new_counts = counts * draw
+        new_counts[1:, :] += counts[:-1, :] * red
+        new_counts[:, 1:] += counts[:, :-1] * blue
+        counts = new_counts
+
+    probabilities = {}
+    for red_wins in range(num_judges + 1):
+        for blue_wins in range(num_judges + 1 - red_wins):
+            outcome = decision_type(red_wins, blue_wins, num_judges - red_wins - blue_wins)
+            probabilities[outcome] = probabilities.get(outcome, 0.0) + counts[red_wins, blue_wins]
+
+    return probabilities
+
+
+# This function returns the official decision for a list of scorecard results, as a readable text
+def decision_text(results, red_name, blue_name):
+    kind, winner = decision_type(results.count(1), results.count(2), results.count(0))
+
+    if winner == 1:
+        return f"Winner by {kind}: {red_name}"
+    if winner == 2:
+        return f"Winner by {kind}: {blue_name}"
+    return kind
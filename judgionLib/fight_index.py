@@ -0,0 +1,214 @@
+# judgionLib/fight_index.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script implements a persistent index of the fights stored in a round directory: fight ID -> sorted round files
+# Finding the rounds of a fight used to need a scan of the whole directory, which gets slow as the directory grows
+# The index is saved in the cache directory and only rebuilt when the directory was changed by something that didn't update it
+# Round files are named {RedFighterLastName}_{BlueFighterLastName}_R{round number}.json (rematches continue the round numbers)
+# Rounds are written under a lock shared by all the processes, so parallel scrapers never get the same round numbers
+
+
+import os
+import json
+import threading
+from contextlib import contextmanager
+
+from judgionLib.file_lock import FILE_LOCK
+from judgionLib.shards import is_shard_store, list_rounds, write_round, INDEX_FILENAME
+from judgionLib.dataset_cache import cache_path
+
+
+# Version of the index content. Changing it invalidates the indexes saved by previous versions
+INDEX_FORMAT = 1
+
+
+# This function splits a round filename into its fight ID and round number, returning (None, None) if it doesn't follow the format
+def split_round_name(filename):
+    if not filename.endswith('.json'):
+        return None, None
+
+    # Splitting from the right in case a fighter last name starts with R
+    fight_id, _, round_number = filename[:-len('.json')].rpartition('_R')
+    if not fight_id or not round_number.isdigit():
+        return None, None
+
+    return fight_id, int(round_number)
+
+
+# This function returns the modification time of a round directory (or of the index of a packed dataset)
+# Adding or removing a file changes it, so it tells if the fight index is still valid with a single system call
+def directory_signature(directory):
+    path = os.path.join(directory, INDEX_FILENAME) if is_shard_store(directory) else directory
+    return os.stat(path).st_mtime_ns
+
+
+class FIGHT_INDEX:
+
+    def __init__(self, directory):
+
+        # Directory indexed
+        self.directory = directory
+
+        # File where the index is saved
+        self.path = cache_path(directory, '_fights.json')
+
+        # Dictionary with the rounds of every fight: fight ID -> [[round number, filename], ...] (sorted by round)
+        self.fights = {}
+
+        # Signature of the directory when the index was last updated
+        self.signature = None
+
+        # Lock used so the index can be updated while other threads read it (f.e. when the JSON files are written in the background)
+        self.lock = threading.RLock()
+
+        # Lock shared with other processes that write to the same directory, and number of nested 'locked' blocks of this process
+        self.file_lock = FILE_LOCK(cache_path(directory, '_fights.lock'))
+        self.lock_depth = 0
+
+        self.load()
+
+
+    # This function loads the saved index, rebuilding it if it doesn't exist or the directory has changed since it was saved
+    def load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as file:
+                    index = json.load(file)
+                if index.get('format') == INDEX_FORMAT:
+                    self.fights = index['fights']
+                    self.signature = index['signature']
+            except (ValueError, KeyError):
+                pass
+
+        self.refresh()
+
+
+    # This function stores the index, writing it with a temporary name first so it's never left half-written
+    # The temporary name is unique, as other processes may be saving the index at the same time
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}_{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump({'format': INDEX_FORMAT, 'signature': self.signature, 'fights': self.fights}, file)
+        os.replace(tmp_path, self.path)
+
+
+    # This function scans the directory again if it was changed by something that didn't update the index
+    def refresh(self):
+        with self.lock:
+            signature = directory_signature(self.directory)
+            if signature == self.signature:
+                return
+
+            self.fights = {}
+            for filename in list_rounds(self.directory):
+                fight_id, round_number = split_round_name(filename)
+                if fight_id is not None:
+                    self.fights.setdefault(fight_id, []).append([round_number, filename])
+
+            for rounds in self.fights.values():
+                rounds.sort()
+
+            self.signature = signature
+            self.save()
+
+
+    # This function returns the sorted round files of a fight (an empty list if the fight isn't in the directory)
+    def rounds(self, fight_id):
+        with self.lock:
+            self.refresh()
+            return [filename for _, filename in self.fights.get(fight_id, [])]
+
+
+    # This function returns the highest round number stored for a fight (0 if there are none). New rounds of a rematch start after it
+    def max_round(self, fight_id):
+        with self.lock:
+            self.refresh()
+            rounds = self.fights.get(fight_id)
+            return rounds[-1][0] if rounds else 0
+
+
+    # This function returns the IDs of all the fights in the directory
+    def fight_ids(self):
+        with self.lock:
+            self.refresh()
+            return sorted(self.fights)
+
+
+    # This function holds the directory lock (for this process' threads and for other processes) while the block runs
+    # The index is loaded again when the lock is taken, so it includes the rounds written by other processes
+    # Blocks can be nested: only the outermost one takes and releases the lock
+    @contextmanager
+    def locked(self):
+        with self.lock:
+            if self.lock_depth == 0:
+                self.file_lock.acquire()
+            self.lock_depth += 1
+            try:
+                if self.lock_depth == 1:
+                    self.load()
+                yield self
+            finally:
+                self.lock_depth -= 1
+                if self.lock_depth == 0:
+                    self.file_lock.release()
+
+
+    # This function returns the offset of the round numbers for new rounds of a fight, following a policy for existing rounds:
+    # 'overwrite' --> 0 (the new rounds replace the old ones) ; 'append' --> highest round stored (rematch) ; 'skip' --> None if there are rounds
+    # It must be called inside a 'locked' block, so no other scraper takes the same round numbers before the rounds are written
+    def round_offset(self, fight_id, policy):
+        max_round = self.max_round(fight_id)
+        if policy == 'overwrite':
+            return 0
+        if policy == 'skip' and max_round > 0:
+            return None
+        return max_round
+
+
+    # This function stores all the rounds of a fight, returning their locations (an empty list if the fight is skipped)
+    # The round numbers start after 'offset', or after the offset given by the policy (see 'round_offset') if it's None
+    # The offset is decided and the rounds are written while holding the directory lock, so parallel scrapers are safe
+    def write_fight(self, fight_id, rounds, policy='append', offset=None):
+        with self.locked():
+            if offset is None:
+                offset = self.round_offset(fight_id, policy)
+                if offset is None:
+                    return []
+
+            return [self.write_round(f"{fight_id}_R{offset + i + 1}.json", data) for i, data in enumerate(rounds)]
+
+
+    # This function stores a round in the directory (see 'shards.write_round') and adds it to the index, returning its location
+    def write_round(self, name, data):
+        with self.locked():
+            # The index is brought up to date first, so the only change after the write is the new round
+            self.refresh()
+            location = write_round(self.directory, name, data)
+
+            fight_id, round_number = split_round_name(name)
+            if fight_id is not None:
+                rounds = self.fights.setdefault(fight_id, [])
+                if [round_number, name] not in rounds:
+                    rounds.append([round_number, name])
+                    rounds.sort()
+
+            self.signature = directory_signature(self.directory)
+            self.save()
+
+        return location
+
+
+# Indexes already loaded by this process: absolute directory path -> index
+INDEXES = {}
+INDEXES_LOCK = threading.Lock()
+
+
+# This function returns the fight index of a directory, shared by every part of the process that uses it
+def fight_index(directory):
+    key = os.path.abspath(directory)
+    with INDEXES_LOCK:
+        if key not in INDEXES:
+            INDEXES[key] = FIGHT_INDEX(directory)
+        return INDEXES[key]
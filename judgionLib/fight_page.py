@@ -0,0 +1,199 @@
+# judgionLib/fight_page.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script parses the fight pages of the UFC stats website into the stats of every round
+# The page has two tables with one row per round: the totals (10 columns) and the significant strikes (9 columns)
+# The first row with each number of columns is the total of the whole fight, so it's skipped
+# Both tables are read in a single pass, and every column is mapped to the stats of the layout with the 'PAGE_COLUMNS' table
+# The lxml library is used if it's installed (it's much faster); otherwise, the standard library HTML parser is used
+
+
+import re
+from collections import namedtuple
+from html.parser import HTMLParser
+import numpy as np
+
+from judgionLib.ingestion import STAT_FIELDS, STATS_PER_FIGHTER
+
+
+# Number of columns of each table of the page
+TOTALS_COLUMNS = 10
+SIGSTRIKES_COLUMNS = 9
+
+# Location of every stat in the page: stat -> (number of columns of its table, column, part of the cell)
+# Cells with 'X of Y' values are split into 'landed' (X) and 'attempted' (Y); control times ('M:SS') are converted to seconds
+# Stats that aren't in the page (the cuts) are always 0
+PAGE_COLUMNS = {
+    ('knockdowns', None): (TOTALS_COLUMNS, 1, 'value'),
+    ('sigstrikes', 'total_landed'): (SIGSTRIKES_COLUMNS, 1, 'landed'),
+    ('sigstrikes', 'total_attempted'): (SIGSTRIKES_COLUMNS, 1, 'attempted'),
+    ('sigstrikes', 'head_landed'): (SIGSTRIKES_COLUMNS, 3, 'landed'),
+    ('sigstrikes', 'head_attempted'): (SIGSTRIKES_COLUMNS, 3, 'attempted'),
+    ('sigstrikes', 'body_landed'): (SIGSTRIKES_COLUMNS, 4, 'landed'),
+    ('sigstrikes', 'body_attempted'): (SIGSTRIKES_COLUMNS, 4, 'attempted'),
+    ('sigstrikes', 'leg_landed'): (SIGSTRIKES_COLUMNS, 5, 'landed'),
+    ('sigstrikes', 'leg_attempted'): (SIGSTRIKES_COLUMNS, 5, 'attempted'),
+    ('sigstrikes', 'distance_landed'): (SIGSTRIKES_COLUMNS, 6, 'landed'),
+    ('sigstrikes', 'distance_attempted'): (SIGSTRIKES_COLUMNS, 6, 'attempted'),
+    ('sigstrikes', 'clinch_landed'): (SIGSTRIKES_COLUMNS, 7, 'landed'),
+    ('sigstrikes', 'clinch_attempted'): (SIGSTRIKES_COLUMNS, 7, 'attempted'),
+    ('sigstrikes', 'ground_landed'): (SIGSTRIKES_COLUMNS, 8, 'landed'),
+    ('sigstrikes', 'ground_attempted'): (SIGSTRIKES_COLUMNS, 8, 'attempted'),
+    ('strikes', 'landed'): (TOTALS_COLUMNS, 4, 'landed'),
+    ('strikes', 'attempted'): (TOTALS_COLUMNS, 4, 'attempted'),
+    ('takedowns', 'landed'): (TOTALS_COLUMNS, 5, 'landed'),
+    ('takedowns', 'attempted'): (TOTALS_COLUMNS, 5, 'attempted'),
+    ('sub_attempts', None): (TOTALS_COLUMNS, 7, 'value'),
+    ('reversals', None): (TOTALS_COLUMNS, 8, 'value'),
+    ('control_seconds', None): (TOTALS_COLUMNS, 9, 'time'),
+}
+
+# Pattern of the method of the fight result in the page
+METHOD_PATTERN = re.compile(r'Method:\s*</i>\s*<i[^>]*>\s*([^<]+)')
+
+# Stats parsed from a fight page: fighters' full names, and a (rounds x 2 x 23) matrix with the stats of both fighters (red, then blue)
+FIGHT_PAGE = namedtuple('FIGHT_PAGE', ['red_fighter', 'blue_fighter', 'stats'])
+
+
+# This function compiles the 'PAGE_COLUMNS' table, returning for each table the stats it fills: (stat index, column, part)
+def compile_columns():
+    columns = {TOTALS_COLUMNS: [], SIGSTRIKES_COLUMNS: []}
+    for i, field in enumerate(STAT_FIELDS):
+        if field in PAGE_COLUMNS:
+            num_columns, column, part = PAGE_COLUMNS[field]
+            columns[num_columns].append((i, column, part))
+    return columns
+
+
+# Compiled table, shared by all the pages
+TABLE_COLUMNS = compile_columns()
+
+
+# This function converts the text of a cell into the requested number
+def cell_value(text, part):
+    if part == 'value':
+        return int(text)
+    if part == 'time':
+        minutes, seconds = text.split(':')
+        return 60 * int(minutes) + int(seconds)
+
+    landed, attempted = text.split(' of ')
+    return int(landed) if part == 'landed' else int(attempted)
+
+
+class TABLE_ROWS_PARSER(HTMLParser):
+
+    def __init__(self):
+        super().__init__()
+
+        # Rows of the page that have stats: every row is a list of cells, and every cell a list of texts (one per fighter)
+        self.rows = []
+
+        # Row, cell and text being read (None when the parser is outside of them)
+        self.row = None
+        self.cell = None
+        self.text = None
+
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            self.row = []
+        elif tag == 'td' and self.row is not None:
+            self.cell = []
+        elif tag == 'p' and self.cell is not None:
+            self.text = []
+
+
+    def handle_endtag(self, tag):
+        if tag == 'p' and self.text is not None:
+            self.cell.append(''.join(self.text).strip())
+            self.text = None
+        elif tag == 'td' and self.cell is not None:
+            self.row.append(self.cell)
+            self.cell = None
+        elif tag == 'tr' and self.row is not None:
+            if self.row:
+                self.rows.append(self.row)
+            self.row = None
+
+
+    def handle_data(self, data):
+        if self.text is not None:
+            self.text.append(data)
+
+
+# This function returns the rows of the stats tables using the standard library HTML parser
+def html_parser_rows(html):
+    parser = TABLE_ROWS_PARSER()
+    parser.feed(html)
+    parser.close()
+    return parser.rows
+
+
+# This function returns the rows of the stats tables using lxml
+def lxml_rows(html):
+    document = lxml.html.fromstring(html)
+    rows = []
+    for tr in document.iter('tr'):
+        row = [[p.text_content().strip() for p in td.iter('p')] for td in tr.iter('td')]
+        if row:
+            rows.append(row)
+    return rows
+
+
+# Parser backends: the fastest one available is used by default
+try:
+    import lxml.html
+    PARSER_BACKENDS = {'lxml': lxml_rows, 'html.parser': html_parser_rows}
+except ImportError:
+    PARSER_BACKENDS = {'html.parser': html_parser_rows}
+
+DEFAULT_BACKEND = next(iter(PARSER_BACKENDS))
+
+
+# This function parses a fight page, returning a FIGHT_PAGE. It raises a ValueError if the page doesn't have the stats of every round
+def parse_fight_page(html, backend=DEFAULT_BACKEND):
+    rows = PARSER_BACKENDS[backend](html)
+
+    # Rows of each table; the first one of each table is the total of the fight
+    totals = [row for row in rows if len(row) == TOTALS_COLUMNS][1:]
+    sigstrikes = [row for row in rows if len(row) == SIGSTRIKES_COLUMNS][1:]
+    if not totals or len(totals) != len(sigstrikes):
+        raise ValueError("the page doesn't include the stats of every round")
+
+    stats = np.zeros((len(totals), 2, STATS_PER_FIGHTER), dtype=np.int32)
+    try:
+        for r, (totals_row, sigstrikes_row) in enumerate(zip(totals, sigstrikes)):
+            for row, columns in ((totals_row, TABLE_COLUMNS[TOTALS_COLUMNS]), (sigstrikes_row, TABLE_COLUMNS[SIGSTRIKES_COLUMNS])):
+                for i, column, part in columns:
+                    red_text, blue_text = row[column]
+                    stats[r, 0, i] = cell_value(red_text, part)
+                    stats[r, 1, i] = cell_value(blue_text, part)
+        red_fighter, blue_fighter = totals[0][0]
+    except ValueError as e:
+        raise ValueError(f"unexpected value in the stats tables ({e})")
+
+    return FIGHT_PAGE(red_fighter, blue_fighter, stats)
+
+
+# This function returns the method of the fight result (f.e. 'Decision - Unanimous' or 'KO/TKO'), or None if it isn't in the page
+def fight_method(html):
+    match = METHOD_PATTERN.search(html)
+    return match.group(1).strip() if match else None
+
+
+# This function converts the stats of a round into the JSON schema of the round files ('cuts' and 'winner' are 0, to be set manually)
+def round_data(red_fighter, blue_fighter, round_stats):
+    data = {}
+    for corner, name, stats in (('red_fighter', red_fighter, round_stats[0]), ('blue_fighter', blue_fighter, round_stats[1])):
+        fighter = {'name': name}
+        for (key, sub_key), value in zip(STAT_FIELDS, stats):
+            if sub_key is None:
+                fighter[key] = int(value)
+            else:
+                fighter.setdefault(key, {})[sub_key] = int(value)
+        data[corner] = fighter
+
+    data['winner'] = 0
+    return data
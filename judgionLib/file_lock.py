@@ -0,0 +1,100 @@
+# judgionLib/file_lock.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script implements a lock shared by all the processes of the machine, so they don't write the same files at the same time
+# The lock is taken on an open lock file with the locking calls of the operating system (flock on POSIX systems, msvcrt.locking on Windows)
+# The kernel releases it when the file is closed, even if the process that holds it crashes, so there's no need to guess if a lock
+# was abandoned. The lock file itself is never deleted: deleting it while another process waits on it would let two processes hold the lock
+
+
+import os
+import time
+
+from judgionLib.constants import DIRECTORY_LOCK_TIMEOUT
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+# Time (in seconds) between two attempts to take a busy lock
+POLL_INTERVAL = 0.01
+
+
+# This function tries to take the lock of an open file without waiting. It returns True if it was taken
+def try_lock(fd):
+    try:
+        if os.name == 'nt':
+            # The first byte of the file is locked (the file doesn't need to have any content)
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except (BlockingIOError, PermissionError):
+        # The lock is held by another open file (flock fails with EWOULDBLOCK, msvcrt.locking with EACCES)
+        return False
+    return True
+
+
+# This function releases the lock of an open file
+def unlock(fd):
+    if os.name == 'nt':
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class FILE_LOCK:
+
+    def __init__(self, path, timeout=DIRECTORY_LOCK_TIMEOUT):
+
+        # Lock file
+        self.path = path
+
+        # Seconds to wait for the lock before raising a TimeoutError
+        self.timeout = timeout
+
+        # Descriptor of the lock file while the lock is held (None otherwise)
+        self.fd = None
+
+
+    # This function takes the lock, waiting until it's released by its holder
+    def acquire(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        deadline = time.monotonic() + self.timeout
+
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            while not try_lock(fd):
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"the lock {self.path} wasn't released after {self.timeout} s")
+                time.sleep(POLL_INTERVAL)
+        except BaseException:
+            os.close(fd)
+            raise
+
+        self.fd = fd
+
+
+    # This function releases the lock (only this instance can release it: the lock belongs to its open file)
+    def release(self):
+        if self.fd is None:
+            return
+
+        fd, self.fd = self.fd, None
+        try:
+            unlock(fd)
+        finally:
+            os.close(fd)
+
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,116 @@
+# judgionLib/http_cache.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script implements an on-disk cache of the pages downloaded by the scraper
+# Every page is stored with its ETag and Last-Modified headers, so the next request only downloads it again if it changed
+# In offline mode the pages are only read from the cache, so the scraper can be re-run (or tested) without network access
+
+
+import os
+import json
+import hashlib
+import threading
+from collections import namedtuple
+
+import requests
+
+from judgionLib.constants import CACHE_DIRECTORY, USE_HTTP_CACHE, OFFLINE_MODE, SCRAPER_TIMEOUT
+
+
+# Directory where the pages are stored
+HTTP_CACHE_DIRECTORY = os.path.join(CACHE_DIRECTORY, 'http')
+
+# Page returned by the cache: status code, HTML content and whether it was read from the cache (without downloading it again)
+PAGE = namedtuple('PAGE', ['status_code', 'text', 'from_cache'])
+
+
+class HTTP_CACHE:
+
+    def __init__(self, directory=HTTP_CACHE_DIRECTORY, offline=OFFLINE_MODE):
+
+        # Directory where the pages are stored. Every page has two files: the HTML content and its metadata (URL and headers)
+        self.directory = directory
+
+        # If True, no requests are made; pages that aren't in the cache are returned with a 504 status code
+        self.offline = offline
+
+
+    # This function returns the base path of the files of a URL in the cache
+    def page_path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+
+    # This function reads a page from the cache, returning its metadata and content (None if it isn't stored)
+    def read(self, url):
+        path = self.page_path(url)
+        try:
+            with open(path + '.json', 'r') as file:
+                metadata = json.load(file)
+            with open(path + '.html', 'r', encoding='utf-8') as file:
+                return metadata, file.read()
+        except (OSError, ValueError):
+            return None, None
+
+
+    # This function stores a page in the cache. Both files are written with a temporary name first, so they're never left half-written
+    # The content is written before the metadata, so a page is never found without its content
+    def write(self, url, text, headers):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.page_path(url)
+        metadata = {'url': url, 'etag': headers.get('ETag'), 'last_modified': headers.get('Last-Modified')}
+
+        for extension, content in (('.html', text), ('.json', json.dumps(metadata))):
+            tmp_path = f"{path}{extension}.{os.getpid()}_{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                file.write(content)
+            os.replace(tmp_path, path + extension)
+
+
+    # This function returns a page, downloading it only if it isn't in the cache or it changed since it was stored
+    # 'session' is the HTTP session used for the request (f.e. one shared by several scrapers), and 'headers' the request headers
+    def get(self, url, session=None, headers=None):
+        metadata, text = self.read(url)
+
+        if self.offline:
+            return PAGE(200, text, True) if text is not None else PAGE(504, '', False)
+
+        # Conditional request: the server answers with a 304 status code (and no content) if the page didn't change
+        request_headers = dict(headers or {})
+        if metadata is not None:
+            if metadata.get('etag'):
+                request_headers['If-None-Match'] = metadata['etag']
+            if metadata.get('last_modified'):
+                request_headers['If-Modified-Since'] = metadata['last_modified']
+
+        response = (session or requests).get(url, headers=request_headers, timeout=SCRAPER_TIMEOUT)
+
+        if response.status_code == 304 and text is not None:
+            return PAGE(200, text, True)
+
+        if response.status_code == 200:
+            self.write(url, response.text, response.headers)
+
+        return PAGE(response.status_code, response.text, False)
+
+
+    # This function returns the URLs of all the pages in the cache
+    def urls(self):
+        if not os.path.isdir(self.directory):
+            return []
+
+        urls = []
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith('.json'):
+                with open(os.path.join(self.directory, filename), 'r') as file:
+                    urls.append(json.load(file)['url'])
+        return urls
+
+
+# This function downloads a page (through the HTTP cache, unless it's disabled), returning a PAGE
+def fetch_page(url, session=None, headers=None, offline=OFFLINE_MODE):
+    if USE_HTTP_CACHE or offline:
+        return HTTP_CACHE(offline=offline).get(url, session, headers)
+
+    response = (session or requests).get(url, headers=headers, timeout=SCRAPER_TIMEOUT)
+    return PAGE(response.status_code, response.text, False)
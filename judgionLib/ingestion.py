@@ -0,0 +1,226 @@
+# judgionLib/ingestion.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script implements the parsing of the round JSON files into Numpy matrices
+# The stat layout is compiled only once, and every round is written directly into a preallocated float32 matrix
+# Both dataset formats are supported: one JSON file per round, and packed datasets (see 'shards.py')
+# Big datasets are parsed in parallel using a process pool. The workers only need this module, but where processes are spawned instead of
+# forked (Windows, macOS) each worker imports the main script again, so the workers of 'training.py' import TensorFlow too and take seconds
+# to start. That only happens when the dataset cache is rebuilt (see 'dataset_cache.py'), and 'PARALLEL_MIN_FILES' keeps small datasets serial
+
+
+import os
+import json
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from judgionLib.shards import ROUND_SHARDS, is_shard_store
+from judgionLib.constants import STAT_LAYOUT, PARALLEL_MIN_FILES, PARSING_CHUNK_SIZE
+
+
+# This function compiles the stat layout, returning the key pairs used for extracting the stats and the expected structure of a fighter
+def compile_layout(layout):
+    fields = []
+    structure = {}
+
+    for path in layout:
+        # Only one level of nested dictionaries is allowed
+        if len(path) not in (1, 2):
+            raise ValueError(f"Invalid stat path in the layout: {path}")
+
+        if len(path) == 1:
+            fields.append((path[0], None))
+            structure[path[0]] = None
+        else:
+            fields.append((path[0], path[1]))
+            structure.setdefault(path[0], set()).add(path[1])
+
+    # The 'name' key is not a stat, but every fighter must include it
+    top_keys = frozenset(structure) | {'name'}
+    nested = tuple((key, frozenset(sub_keys)) for key, sub_keys in structure.items() if sub_keys is not None)
+
+    return tuple(fields), top_keys, nested
+
+
+# Compiled layout, shared by all the parsing functions
+STAT_FIELDS, FIGHTER_KEYS, NESTED_KEYS = compile_layout(STAT_LAYOUT)
+STATS_PER_FIGHTER = len(STAT_FIELDS)    # 23
+
+# Valid labels of a round --> 0: 10-8 red ; 1: 10-9 red ; 2: 9-10 blue ; 3: 8-10 blue
+# Rounds that aren't labeled yet (f.e. the ones downloaded by 'backfill.py') have a 'winner' of null, so they can't be used for training
+ROUND_LABELS = (0, 1, 2, 3)
+
+
+# This function checks that a fighter dictionary matches the stat layout, raising a ValueError if it doesn't
+def validate_fighter(fighter):
+
+    if fighter.keys() != FIGHTER_KEYS:
+        missing = sorted(FIGHTER_KEYS - fighter.keys())
+        unknown = sorted(fighter.keys() - FIGHTER_KEYS)
+        raise ValueError(f"unexpected fighter keys (missing: {missing}, unknown: {unknown})")
+
+    for key, sub_keys in NESTED_KEYS:
+        if not isinstance(fighter[key], dict) or fighter[key].keys() != sub_keys:
+            raise ValueError(f"unexpected keys in '{key}'")
+
+
+# This function returns the stats of a fighter as a list, in the order defined by the stat layout
+def fighter_extractor(fighter):
+    validate_fighter(fighter)
+
+    values = [fighter[key] if sub_key is None else fighter[key][sub_key] for key, sub_key in STAT_FIELDS]
+
+    # Every stat must be a number
+    for value in values:
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            raise ValueError(f"non-numeric stat value: {value!r}")
+
+    return values
+
+
+# This function writes the stats of a round (red fighter, then blue fighter) in a row of a matrix
+def round_extractor(data, out):
+    out[:STATS_PER_FIGHTER] = fighter_extractor(data['red_fighter'])
+    out[STATS_PER_FIGHTER:] = fighter_extractor(data['blue_fighter'])
+
+
+# This function parses a list of round files, returning their stats and labels
+# It's the task executed by the workers of the process pool
+def parse_files(paths):
+    stats = np.empty((len(paths), 2 * STATS_PER_FIGHTER), dtype=np.float32)
+    winners = np.empty(len(paths), dtype=np.int64)
+
+    for i, path in enumerate(paths):
+        with open(path, 'r') as file:
+            data = json.load(file)
+        parse_round(data, stats, winners, i, path)
+
+    return stats, winners
+
+
+# This function writes the stats and label of a round in the row 'i' of the matrices
+def parse_round(data, stats, winners, i, name):
+    try:
+        round_extractor(data, stats[i])
+        winner = data['winner']
+        if winner is None:
+            raise ValueError("the round isn't labeled ('winner' is null)")
+        if isinstance(winner, bool) or winner not in ROUND_LABELS:
+            raise ValueError(f"invalid winner: {winner!r}")
+        winners[i] = winner
+    except KeyError as e:
+        raise ValueError(f"{name}: missing key {e}") from None
+    except ValueError as e:
+        raise ValueError(f"{name}: {e}") from None
+
+
+# This function parses the rounds of a shard, given their offsets and lengths inside the shard file
+# It's the task executed by the workers of the process pool for packed datasets
+def parse_shard(shard_path, entries):
+    stats = np.empty((len(entries), 2 * STATS_PER_FIGHTER), dtype=np.float32)
+    winners = np.empty(len(entries), dtype=np.int64)
+
+    # The whole shard is read at once, and each round is decoded from its slice
+    with open(shard_path, 'rb') as file:
+        content = file.read()
+
+    for i, (offset, length) in enumerate(entries):
+        line = json.loads(content[offset:offset + length])
+        parse_round(line['data'], stats, winners, i, f"{shard_path}:{line['name']}")
+
+    return stats, winners
+
+
+# This function parses all the given round files, using a process pool if there are enough of them
+# It returns the stats (float32 matrix) and labels of the original rounds, in the same order as the paths
+def parse_rounds(paths):
+    stats = np.empty((len(paths), 2 * STATS_PER_FIGHTER), dtype=np.float32)
+    winners = np.empty(len(paths), dtype=np.int64)
+
+    # For small datasets, starting the process pool takes longer than the parsing itself
+    if len(paths) < PARALLEL_MIN_FILES:
+        if paths:
+            stats[:], winners[:] = parse_files(paths)
+        return stats, winners
+
+    # Splitting the files in chunks, and sending each chunk to a worker
+    chunks = [paths[i:i + PARSING_CHUNK_SIZE] for i in range(0, len(paths), PARSING_CHUNK_SIZE)]
+    with ProcessPoolExecutor() as executor:
+        # 'map' returns the results in order, so every chunk is copied to its own rows of the preallocated matrices
+        for i, (chunk_stats, chunk_winners) in enumerate(executor.map(parse_files, chunks)):
+            start = i * PARSING_CHUNK_SIZE
+            stats[start:start + len(chunk_stats)] = chunk_stats
+            winners[start:start + len(chunk_winners)] = chunk_winners
+
+    return stats, winners
+
+
+# This function returns the parsing tasks of a packed dataset: one (shard path, [(offset, length), ...]) pair per shard
+def shard_tasks(directory):
+    shards = ROUND_SHARDS(directory)
+
+    # Group the rounds by shard, in the order they were written
+    by_shard = {}
+    for shard_num, offset, length in shards.rounds.values():
+        by_shard.setdefault(shard_num, []).append((offset, length))
+
+    return [(os.path.join(directory, shards.shards[num][0]), sorted(by_shard[num])) for num in sorted(by_shard)]
+
+
+# This function parses all the rounds of a packed dataset (see 'shards.py'), using a process pool if there are enough of them
+def parse_shard_store(directory):
+    tasks = shard_tasks(directory)
+    total = sum(len(entries) for _, entries in tasks)
+
+    stats = np.empty((total, 2 * STATS_PER_FIGHTER), dtype=np.float32)
+    winners = np.empty(total, dtype=np.int64)
+
+    # Every shard is a task; they are only split between processes if the dataset is big enough
+    if total < PARALLEL_MIN_FILES or len(tasks) < 2:
+        copy_shards(stats, winners, (parse_shard(path, entries) for path, entries in tasks))
+    else:
+        # The pool is shut down even if a shard can't be parsed, so its workers never outlive the call
+        with ProcessPoolExecutor() as executor:
+            copy_shards(stats, winners, executor.map(parse_shard, *zip(*tasks)))
+
+    return stats, winners
+
+
+# This function copies the results of every shard (in order) to its own rows of the preallocated matrices
+def copy_shards(stats, winners, results):
+    start = 0
+    for shard_stats, shard_winners in results:
+        stats[start:start + len(shard_stats)] = shard_stats
+        winners[start:start + len(shard_winners)] = shard_winners
+        start += len(shard_stats)
+
+
+# This function parses all the rounds of a dataset directory, whatever its format is
+# It returns the stats (float32 matrix) and labels of the original rounds
+def parse_directory(directory):
+    if is_shard_store(directory):
+        return parse_shard_store(directory)
+    return parse_rounds(list_round_files(directory))
+
+
+# This function adds the symmetric version of every round to the matrices (blue and red stats swapped)
+# Row 2*i is the original round and row 2*i+1 its symmetric one, just as 'stats_getter' always did
+def mirror_rounds(stats, winners):
+    full_stats = np.empty((2 * len(stats), stats.shape[1]), dtype=stats.dtype)
+    full_winners = np.empty(2 * len(winners), dtype=winners.dtype)
+
+    full_stats[0::2] = stats
+    full_stats[1::2, :STATS_PER_FIGHTER] = stats[:, STATS_PER_FIGHTER:]
+    full_stats[1::2, STATS_PER_FIGHTER:] = stats[:, :STATS_PER_FIGHTER]
+
+    # Inverting the labels: 0 <-> 3 and 1 <-> 2 (same as 'parallel_winner')
+    full_winners[0::2] = winners
+    full_winners[1::2] = 3 - winners
+
+    return full_stats, full_winners
+
+
+# This function returns the paths of all the round files stored in a directory
+def list_round_files(directory):
+    return [os.path.join(directory, filename) for filename in os.listdir(directory) if filename.endswith('.json')]
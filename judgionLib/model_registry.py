@@ -0,0 +1,107 @@
+# judgionLib/model_registry.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script implements a registry of loaded judge models, shared by every judge of the process
+# Each model is loaded only once (together with its '.npy' normalization factors) and reused by all the judges that pick it
+# Models are identified by their path and modification time, so a retrained model is loaded again automatically
+# The registry has a size limit; when it's full, the least recently used model is dropped
+
+
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from judgionLib.constants import MODEL_CACHE_SIZE
+
+
+# This function returns the path of the normalization factors file associated with a model
+def norm_factors_path(model_path):
+    return os.path.splitext(model_path)[0] + '.npy'
+
+
+class MODEL_REGISTRY:
+
+    def __init__(self, max_size=MODEL_CACHE_SIZE):
+
+        # Maximum number of models kept in memory at the same time
+        self.max_size = max_size
+
+        # Loaded models, from the least to the most recently used: key -> (model, normalization factors)
+        self.models = OrderedDict()
+
+        # Models being loaded: key -> future that receives (model, normalization factors)
+        # Threads that need a model another thread is loading wait for its future, so every model is loaded only once
+        self.loading = {}
+
+        # Lock that protects both dictionaries. It's never held while a model is loaded, so loading a model doesn't block the others
+        self.lock = threading.Lock()
+
+
+    # This function returns the key of a model: its path and the modification times of the model and its factors
+    def model_key(self, path):
+        npy_path = norm_factors_path(path)
+        npy_mtime = os.stat(npy_path).st_mtime_ns if os.path.exists(npy_path) else None
+        return (os.path.abspath(path), os.stat(path).st_mtime_ns, npy_mtime)
+
+
+    # This function returns the model stored in 'path' and its normalization factors (None if the model has no '.npy' file)
+    # 'loader' is the function used to load the model when it isn't in the registry yet
+    def get(self, path, loader):
+        key = self.model_key(path)
+
+        with self.lock:
+            # If the model is already loaded, mark it as the most recently used one and return it
+            if key in self.models:
+                self.models.move_to_end(key)
+                return self.models[key]
+
+            # If another thread is loading it, wait for that thread instead of loading it again
+            future = self.loading.get(key)
+            if future is not None:
+                waiting = True
+            else:
+                future = self.loading[key] = Future()
+                waiting = False
+
+        if waiting:
+            return future.result()
+
+        # Load the model and, if there is one, its normalization factors (without holding the lock)
+        # Exported models (see 'numpy_runtime.py') can include their factors, which are used if there's no '.npy' file
+        try:
+            model = loader(path)
+            norm_factors = np.load(norm_factors_path(path)) if key[2] is not None else getattr(model, 'norm_factors', None)
+        except BaseException as e:
+            # The threads waiting for the model get the error too; the next call tries to load it again
+            with self.lock:
+                del self.loading[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            # Older versions of the same model won't be used anymore
+            for old_key in [k for k in self.models if k[0] == key[0]]:
+                del self.models[old_key]
+
+            self.models[key] = (model, norm_factors)
+            del self.loading[key]
+
+            # Drop the least recently used models if the registry is full
+            while len(self.models) > self.max_size:
+                self.models.popitem(last=False)
+
+        future.set_result((model, norm_factors))
+        return model, norm_factors
+
+
+    # This function removes all the models from the registry
+    def clear(self):
+        with self.lock:
+            self.models.clear()
+
+
+# Registry shared by the whole process
+JUDGE_REGISTRY = MODEL_REGISTRY()
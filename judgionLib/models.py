@@ -0,0 +1,105 @@
+# judgionLib/models.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script includes the model code shared by the training and judging scripts
+# Importing it loads TensorFlow, so it's kept apart from the data utilities in 'utils.py'
+
+
+from keras.layers import Layer, Dense, AlphaDropout
+from keras.models import Sequential, load_model
+from keras.utils import custom_object_scope
+from keras import backend as K
+
+
+# This method returns a kernel initializer depending on the activation function received as paramether
+def get_kernel(activation):
+    
+    a = activation.lower()
+
+    # If you use an activation function not present here, "glorot_uniform" will be used; add more if needed
+    if a == "selu":
+        return "lecun_normal"
+    if a in ("relu", "elu"):
+        return "he_normal"
+    if a in ("sigmoid", "tanh", "gelu", "silu"):
+        return "glorot_uniform"
+    
+    return "glorot_uniform"
+
+
+# This method is the neural network builder, returning a compiled model using the paramethers specified in its call
+def model_builder(hidden_layers, optimizer):
+
+    K.clear_session()
+
+    # Initialize the Sequential model
+    model = Sequential()
+
+    # Iterate through each layer defined in the structure and add to the model.
+    for i, layer in enumerate(hidden_layers):
+        neurons = layer['neurons']
+        activation = layer['activation']
+        kwargs = {}
+        # For the first layer, we also include the input layer
+        if i == 0 and "input_shape" in layer:
+            kwargs["input_shape"] = layer['input_shape']
+
+        # Extract the Kernel initializer specified by the user. If None, we default it depending on the activation function using the "get_kernel" method.
+        kernel_func = layer.get("kernel_initializer", get_kernel(activation))
+
+        model.add(Dense(units=neurons, activation=activation, kernel_initializer=kernel_func, **kwargs))
+
+        # Alpha Dropout paramether, must be > 0.0 to activate it
+        if "alpha_dropout" in layer:
+            dropout_rate = layer['alpha_dropout']
+            if dropout_rate > 0.0:
+                model.add(AlphaDropout(dropout_rate))
+
+
+    # The last layer will always have 4 neurons and the 'softmax' activation function
+    model.add(Dense(4, activation='softmax'))
+
+    # Instantiate the optimizer with the given learning rate
+    opt = optimizer() if callable(optimizer) else optimizer
+
+    # Compile the model specifying categorical crossentropy as the loss and accuracy as the metric
+    model.compile(loss='categorical_crossentropy', optimizer=opt, metrics=['accuracy'])
+    
+    return model
+
+
+# Class for the Diagonal Layer, a layer which only has one weight per stat, therefore making a "linear transformation" to the data
+class DiagonalLayer(Layer):
+
+    def __init__(self, **kwargs):
+        super(DiagonalLayer, self).__init__(**kwargs)
+
+    # This method builds the layer structure, initializing the weights and biases
+    def build(self, input_shape):
+
+        # Weight vector, initialized as 1s. This vector is trainable, so its values will change during the training process
+        self.diag = self.add_weight(name='diag',
+                                    shape=(input_shape[-1],),
+                                    initializer='ones',
+                                    trainable=True)
+
+        # Bias vector, initialized as 1s. This vector is not trainable, so its values won't change during the training process
+        self.bias = self.add_weight(name='bias',
+                                    shape=(input_shape[-1],),
+                                    initializer='zeros',
+                                    trainable=False)  # Set to True if you want to make the bias trainable
+                                    
+        super(DiagonalLayer, self).build(input_shape)
+
+    # This method implements the layer's operation
+    def call(self, inputs):
+
+        # Stat * Weight + Bias
+        return inputs * self.diag + self.bias   # Since 'bias' will be 0, this equals "stat * weight". If you decide to make the bias trainable, you won't need to change this.
+
+
+# This function loads a judge model from its '.h5' file
+def load_keras_judge(path):
+    with custom_object_scope({'DiagonalLayer': DiagonalLayer}):     # This line is only used for compatibility with a personalised layer
+        return load_model(path)
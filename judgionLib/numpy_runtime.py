@@ -0,0 +1,180 @@
+# judgionLib/numpy_runtime.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script implements a NumPy-only runtime for the judge models
+# A trained judge (weights, activations and normalization factors) can be exported to a compact '.npz' file
+# That file is then loaded and run by 'NUMPY_JUDGE' without importing TensorFlow, so scoring a fight starts in milliseconds
+# It can be run as a script to export a judge and check that its outputs match the Keras model:
+#   python -m judgionLib.numpy_runtime "models/The Diagonal.h5"
+
+
+import os
+import sys
+import json
+import time
+import numpy as np
+
+from judgionLib.constants import TRAINING_DIRECTORY, NUMPY_EXPORT_TOLERANCE
+
+
+# Layers that don't do anything when the model is making predictions (they are only active during the training)
+INFERENCE_IDENTITY_LAYERS = ('InputLayer', 'Dropout', 'AlphaDropout', 'GaussianDropout', 'GaussianNoise')
+
+
+# This function computes the error function with the Abramowitz-Stegun approximation (maximum error: 1.5e-7)
+# NumPy doesn't include it, and it's needed for the 'gelu' activation function
+def erf(x):
+    sign = np.sign(x)
+    x = np.abs(x)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    y = 1.0 - (((((1.061405429 * t - 1.453152027) * t) + 1.421413741) * t - 0.284496736) * t + 0.254829592) * t * np.exp(-x * x)
+    return sign * y
+
+
+# This function implements the softmax activation function, row by row
+def softmax(x):
+    e = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return e / np.sum(e, axis=-1, keepdims=True)
+
+
+# Activation functions supported by the runtime, with the same definitions Keras uses
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'sigmoid': lambda x: 1.0 / (1.0 + np.exp(-x)),
+    'tanh': np.tanh,
+    'softmax': softmax,
+    'gelu': lambda x: 0.5 * x * (1.0 + erf(x / np.sqrt(2.0))),
+    'elu': lambda x: np.where(x > 0, x, np.expm1(np.minimum(x, 0))),
+    'selu': lambda x: 1.0507009873554805 * np.where(x > 0, x, 1.6732632423543772 * np.expm1(np.minimum(x, 0))),
+    'silu': lambda x: x / (1.0 + np.exp(-x)),
+    'swish': lambda x: x / (1.0 + np.exp(-x)),
+    'softplus': lambda x: np.logaddexp(x, 0),
+}
+
+
+class NUMPY_JUDGE:
+
+    def __init__(self, layers, norm_factors=None):
+
+        # List of layers, stored as (kind, weights, activation). Kinds: 'dense' (kernel, bias) and 'diagonal' (diag, bias)
+        self.layers = layers
+
+        # Normalization factors of the judge's training data (None if the judge was trained with raw data)
+        self.norm_factors = norm_factors
+
+
+    # This function loads an exported judge from its '.npz' file
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as file:
+            spec = json.loads(str(file['layers']))
+            layers = []
+            for i, layer in enumerate(spec):
+                weights = [file[f'layer{i}_w{j}'] for j in range(layer['weights'])]
+                layers.append((layer['kind'], weights, layer['activation']))
+            norm_factors = file['norm_factors'] if 'norm_factors' in file else None
+
+        return cls(layers, norm_factors)
+
+
+    # This function stores the judge in a '.npz' file
+    def save(self, path):
+        arrays = {}
+        spec = []
+        for i, (kind, weights, activation) in enumerate(self.layers):
+            spec.append({'kind': kind, 'activation': activation, 'weights': len(weights)})
+            for j, weight in enumerate(weights):
+                arrays[f'layer{i}_w{j}'] = weight
+        if self.norm_factors is not None:
+            arrays['norm_factors'] = self.norm_factors
+
+        np.savez(path, layers=np.array(json.dumps(spec)), **arrays)
+
+
+    # This function runs the forward pass of the judge. It works as the Keras 'predict' method (extra arguments are ignored)
+    def predict(self, input_data, **kwargs):
+        x = np.asarray(input_data, dtype=np.float32)
+
+        for kind, weights, activation in self.layers:
+            if kind == 'dense':
+                x = x @ weights[0] + weights[1]
+            else:   # 'diagonal': stat * weight + bias
+                x = x * weights[0] + weights[1]
+            x = ACTIVATIONS[activation](x)
+
+        return x.astype(np.float32)
+
+
+# This function converts a Keras judge model into a NUMPY_JUDGE, raising a ValueError if a layer isn't supported
+def from_keras(model, norm_factors=None):
+    layers = []
+
+    for layer in model.layers:
+        kind = type(layer).__name__
+
+        if kind in INFERENCE_IDENTITY_LAYERS:
+            continue
+        elif kind == 'Dense':
+            kernel, bias = layer.get_weights() if layer.use_bias else (layer.get_weights()[0], np.zeros(layer.units, dtype=np.float32))
+            layers.append(('dense', [kernel, bias], layer.activation.__name__))
+        elif kind == 'DiagonalLayer':
+            diag, bias = layer.get_weights()
+            layers.append(('diagonal', [diag, bias], 'linear'))
+        else:
+            raise ValueError(f"Layer '{layer.name}' ({kind}) is not supported by the NumPy runtime.")
+
+        if layers[-1][2] not in ACTIVATIONS:
+            raise ValueError(f"Activation '{layers[-1][2]}' of layer '{layer.name}' is not supported by the NumPy runtime.")
+
+    return NUMPY_JUDGE(layers, norm_factors)
+
+
+# This function returns the path of the NumPy export of a judge model
+def export_path(model_path):
+    return os.path.splitext(model_path)[0] + '.npz'
+
+
+# This function exports a judge model ('.h5') to the NumPy runtime format ('.npz'), next to the original file
+# Before saving it, the outputs of both versions are compared on the training rounds
+# It returns the path of the export and the maximum difference found between the outputs
+def export_judge(model_path):
+    from judgionLib.models import load_keras_judge
+    from judgionLib.dataset_cache import load_dataset
+
+    model = load_keras_judge(model_path)
+    npy_path = os.path.splitext(model_path)[0] + '.npy'
+    norm_factors = np.load(npy_path) if os.path.exists(npy_path) else None
+    judge = from_keras(model, norm_factors)
+
+    # Compare both runtimes using the training rounds as the input
+    stats, _ = load_dataset(TRAINING_DIRECTORY)
+    if norm_factors is not None:
+        stats = stats / norm_factors
+    difference = float(np.max(np.abs(model.predict(stats, verbose=0) - judge.predict(stats))))
+
+    if difference > NUMPY_EXPORT_TOLERANCE:
+        raise ValueError(f"The NumPy runtime doesn't match the Keras model (max. difference: {difference:.2e}).")
+
+    path = export_path(model_path)
+    judge.save(path)
+
+    return path, difference
+
+
+# Main
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python -m judgionLib.numpy_runtime MODEL_PATH [MODEL_PATH ...]")
+        sys.exit(1)
+
+    for model_path in sys.argv[1:]:
+        path, difference = export_judge(model_path)
+
+        # Measure how long it takes to load and run the exported judge (cold start)
+        ini_t = time.perf_counter()
+        NUMPY_JUDGE.load(path).predict(np.zeros((1, 46), dtype=np.float32))
+        end_t = time.perf_counter()
+
+        print(f"{model_path} exported to {path}. Max. difference with Keras: {difference:.2e}. Load + prediction: {(end_t - ini_t) * 1000:.2f} ms")
@@ -0,0 +1,97 @@
+# judgionLib/pipeline.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script implements a streaming input pipeline for the training process
+# The dataset is read in chunks of files, and the symmetric version of every round is generated on the fly
+# This way, the training data never has to be fully loaded in memory (useful for datasets bigger than the RAM)
+
+
+import random
+import numpy as np
+import tensorflow as tf
+
+from judgionLib.ingestion import parse_files, parse_shard, shard_tasks, list_round_files, STATS_PER_FIGHTER
+from judgionLib.shards import is_shard_store
+from judgionLib.utils import highest_values_finder
+from judgionLib.constants import STREAM_CHUNK_SIZE, SHUFFLE_BUFFER
+
+
+# This generator reads a dataset in chunks, yielding the stats and labels of the original rounds of each chunk
+# Packed datasets are read one shard at a time; otherwise, each chunk has 'chunk_size' files
+# If 'shuffle' is True, the order of the chunks (and of the files between chunks) is random
+def round_chunks(directory, chunk_size=STREAM_CHUNK_SIZE, shuffle=False):
+    if is_shard_store(directory):
+        tasks = shard_tasks(directory)
+        if shuffle:
+            random.shuffle(tasks)
+        for shard_path, entries in tasks:
+            yield parse_shard(shard_path, entries)
+        return
+
+    paths = list_round_files(directory)
+    if shuffle:
+        random.shuffle(paths)
+    for i in range(0, len(paths), chunk_size):
+        yield parse_files(paths[i:i + chunk_size])
+
+
+# This function finds the normalization factors of a dataset reading it in chunks
+# The result is the same as the one 'normalize_stats' returns for the full (mirrored) matrix
+def stream_highest_values(directory, chunk_size=STREAM_CHUNK_SIZE):
+    maxima = np.zeros(2 * STATS_PER_FIGHTER, dtype=np.float32)
+
+    for stats, _ in round_chunks(directory, chunk_size):
+        if len(stats) > 0:
+            np.maximum(maxima, stats.max(axis=0), out=maxima)
+
+    # As the mirrored rounds are never stored, the highest value of a stat is the highest between both fighters
+    folded = np.maximum(maxima[:STATS_PER_FIGHTER], maxima[STATS_PER_FIGHTER:])
+    highest_values = highest_values_finder(np.concatenate((folded, folded)).reshape(1, -1))
+
+    return np.concatenate((highest_values, highest_values))
+
+
+# This function adds the symmetric rounds to a chunk (blue and red stats swapped, and the label inverted)
+def mirror_chunk(stats, winners):
+    mirrored_stats = tf.concat([stats[:, STATS_PER_FIGHTER:], stats[:, :STATS_PER_FIGHTER]], axis=1)
+
+    # Inverting the labels: 0 <-> 3 and 1 <-> 2 (same as 'parallel_winner')
+    mirrored_winners = 3 - winners
+
+    return tf.concat([stats, mirrored_stats], axis=0), tf.concat([winners, mirrored_winners], axis=0)
+
+
+# This function builds a 'tf.data' dataset that streams the training rounds from a directory
+# The dataset yields batches of (stats, one-hot labels), normalized with 'norm_factors' if they are given
+def streaming_dataset(directory, batch_size, norm_factors=None, chunk_size=STREAM_CHUNK_SIZE, shuffle_buffer=SHUFFLE_BUFFER):
+    # The order of the files is shuffled on every epoch, so the chunks are different each time
+    def generator():
+        yield from round_chunks(directory, chunk_size, shuffle=True)
+
+    dataset = tf.data.Dataset.from_generator(
+        generator,
+        output_signature=(
+            tf.TensorSpec(shape=(None, 2 * STATS_PER_FIGHTER), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.int64),
+        ),
+    )
+
+    # Generating the symmetric rounds, and splitting the chunks in single rounds
+    dataset = dataset.map(mirror_chunk, num_parallel_calls=tf.data.AUTOTUNE).unbatch()
+
+    # Mixing the rounds of different chunks
+    dataset = dataset.shuffle(shuffle_buffer)
+
+    # Normalizing the stats (if needed) and transforming the labels into one-hot encoded arrays
+    factors = None if norm_factors is None else tf.constant(np.asarray(norm_factors, dtype=np.float32))
+
+    def prepare(stats, winners):
+        if factors is not None:
+            stats = stats / factors
+        return stats, tf.one_hot(winners, depth=4)
+
+    dataset = dataset.batch(batch_size).map(prepare, num_parallel_calls=tf.data.AUTOTUNE)
+
+    # The next batches are prepared while the model trains with the current one
+    return dataset.prefetch(tf.data.AUTOTUNE)
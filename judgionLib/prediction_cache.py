@@ -0,0 +1,151 @@
+# judgionLib/prediction_cache.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script implements an on-disk cache of the judges' predictions, so re-scoring past fights doesn't run the models again
+# Every prediction is identified by the content hash of the model file and the hash of the (normalized) round given to the model
+# A retrained model has a different content hash, so its old predictions are never used; they're dropped as the least recently used ones
+# The cache is a SQLite database in the cache directory, shared by every judge and every script
+
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+from judgionLib.dataset_cache import file_hash
+from judgionLib.decisions import ROUND_SCORES
+from judgionLib.constants import CACHE_DIRECTORY, PREDICTION_CACHE_SIZE
+
+
+# Path of the database
+PREDICTION_CACHE_PATH = os.path.join(CACHE_DIRECTORY, 'predictions.sqlite')
+
+# Fraction of the cache freed when it's full, so the predictions aren't counted again on every store
+EVICTION_FRACTION = 0.1
+
+# Content hashes of the model files already hashed by this process: path -> (size, modification time, hash)
+MODEL_HASHES = {}
+
+
+# This function returns the content hash of a model file. It's only computed again if the file changes
+def model_hash(path):
+    info = os.stat(path)
+    known = MODEL_HASHES.get(path)
+    if known is None or known[:2] != (info.st_size, info.st_mtime_ns):
+        known = (info.st_size, info.st_mtime_ns, file_hash(path))
+        MODEL_HASHES[path] = known
+    return known[2]
+
+
+# This function returns the hash of every row of a matrix of rounds (the data type is included, as it changes the bytes)
+def row_hashes(input_data):
+    input_data = np.ascontiguousarray(input_data)
+    dtype = input_data.dtype.str.encode('utf-8')
+    return [hashlib.sha1(dtype + row.tobytes()).hexdigest() for row in input_data]
+
+
+class PREDICTION_CACHE:
+
+    def __init__(self, path=PREDICTION_CACHE_PATH, max_size=PREDICTION_CACHE_SIZE):
+
+        # Maximum number of predictions stored, and predictions freed when the cache is full (see 'EVICTION_FRACTION')
+        self.max_size = max_size
+        self.eviction_size = int(max_size * EVICTION_FRACTION)
+
+        # Connection to the database. It's shared by the threads of the process (f.e. the judges of a panel), so it's protected by a lock
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+        with self.lock, self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS predictions (model TEXT, input TEXT, output BLOB, last_used INTEGER, PRIMARY KEY (model, input))')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used)')
+
+            # Running count of the predictions stored. It's an upper bound (replaced predictions are counted as new ones), so the table is only
+            # counted again when it seems to be full. Other processes can add predictions too, so the count is corrected every time it's done
+            self.size = self.connection.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+
+
+    # This function returns the cached predictions of a model for a matrix of rounds
+    # It returns a list with one entry per round: the prediction (a NumPy array), or None if it isn't cached
+    def lookup(self, model, keys):
+        with self.lock, self.connection:
+            found = {}
+            # SQLite limits the number of parameters of a query, so the rounds are looked up in groups
+            for i in range(0, len(keys), 500):
+                group = keys[i:i + 500]
+                query = f"SELECT input, output FROM predictions WHERE model = ? AND input IN ({','.join('?' * len(group))})"
+                found.update(self.connection.execute(query, [model, *group]).fetchall())
+
+            # The predictions found become the most recently used ones
+            if found:
+                now = time.time_ns()
+                self.connection.executemany('UPDATE predictions SET last_used = ? WHERE model = ? AND input = ?', [(now, model, key) for key in found])
+
+        return [np.frombuffer(found[key], dtype=np.float32) if key in found else None for key in keys]
+
+
+    # This function stores the predictions of a model for some rounds, dropping the least recently used ones if the cache is full
+    # When it's full, the excess and a part of the cache are dropped at once (see 'EVICTION_FRACTION')
+    def store(self, model, keys, predictions):
+        predictions = np.asarray(predictions, dtype=np.float32)
+        now = time.time_ns()
+
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)',
+                                        [(model, key, prediction.tobytes(), now) for key, prediction in zip(keys, predictions)])
+            self.size += len(keys)
+            if self.size <= self.max_size:
+                return
+
+            self.size = self.connection.execute('SELECT COUNT(*) FROM predictions').fetchone()[0]
+            excess = self.size - self.max_size
+            if excess > 0:
+                excess += self.eviction_size
+                self.connection.execute('DELETE FROM predictions WHERE rowid IN (SELECT rowid FROM predictions ORDER BY last_used LIMIT ?)', (excess,))
+                self.size -= excess
+
+
+    # This function returns the predictions of a model for a matrix of rounds, only running the model for the rounds that aren't cached
+    # 'model' is the content hash of the model file, and 'predict' the function that runs the model
+    def predict(self, model, input_data, predict):
+
+        # Without rounds there's nothing to look up: the output is an empty matrix, as the model would return
+        if len(input_data) == 0:
+            return np.empty((0, len(ROUND_SCORES)), dtype=np.float32)
+
+        keys = row_hashes(input_data)
+        cached = self.lookup(model, keys)
+
+        missing = [i for i, prediction in enumerate(cached) if prediction is None]
+        if missing:
+            predictions = np.asarray(predict(input_data[missing]), dtype=np.float32)
+            self.store(model, [keys[i] for i in missing], predictions)
+            for i, prediction in zip(missing, predictions):
+                cached[i] = prediction
+
+        return np.stack(cached)
+
+
+    # This function removes all the predictions from the cache
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM predictions')
+            self.size = 0
+
+
+# Cache shared by the whole process. It's opened the first time it's needed, so importing this script doesn't create the database
+SHARED_CACHE = None
+SHARED_CACHE_LOCK = threading.Lock()
+
+
+# This function returns the prediction cache shared by the whole process
+def prediction_cache():
+    global SHARED_CACHE
+    with SHARED_CACHE_LOCK:
+        if SHARED_CACHE is None:
+            SHARED_CACHE = PREDICTION_CACHE()
+        return SHARED_CACHE
@@ -0,0 +1,115 @@
+# judgionLib/profiling.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script measures how long every stage of the judging process takes (loading the models, parsing the rounds, predicting...)
+# Each measurement (span) is stored as a JSON line in the logs directory, together with an ID of the run it belongs to
+# The spans of all the runs can be summarized (median and 95th percentile of every stage) to spot regressions between versions:
+#   python -m judgionLib.profiling
+
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+from judgionLib.constants import LOG_DIRECTORY, LATENCY_LOG_FILENAME, PROFILING
+
+
+# Path of the file where the spans are stored
+LATENCY_LOG_PATH = os.path.join(LOG_DIRECTORY, LATENCY_LOG_FILENAME)
+
+# Spans are written in groups, so measuring doesn't add file operations to the judging process
+FLUSH_SIZE = 1000
+
+# ID of the current run: start time and process ID
+RUN_ID = f"{int(time.time())}_{os.getpid()}"
+
+# Spans measured by this process that haven't been written yet
+SPANS = []
+SPANS_LOCK = threading.Lock()
+
+
+# This function measures the time taken by the code inside a 'with' block, storing it as a span of the given stage
+# Extra information about the span (f.e. the number of rounds) can be given as keyword arguments
+@contextmanager
+def span(stage, **info):
+    if not PROFILING:
+        yield
+        return
+
+    ini_t = time.perf_counter()
+    try:
+        yield
+    finally:
+        record = {'run': RUN_ID, 'stage': stage, 'seconds': time.perf_counter() - ini_t, 'time': time.time(), **info}
+        with SPANS_LOCK:
+            SPANS.append(record)
+            full = len(SPANS) >= FLUSH_SIZE
+        if full:
+            flush()
+
+
+# This function appends the pending spans to the log file
+def flush(path=LATENCY_LOG_PATH):
+    with SPANS_LOCK:
+        if not SPANS:
+            return
+        records = SPANS[:]
+        SPANS.clear()
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as file:
+        file.writelines(json.dumps(record) + '\n' for record in records)
+
+
+# The pending spans are written when the process ends
+atexit.register(flush)
+
+
+# This function reads the spans stored in the log file
+def read_spans(path=LATENCY_LOG_PATH):
+    if not os.path.exists(path):
+        return []
+
+    with open(path, 'r') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+# This function returns the summary of every stage: number of spans, median (p50) and 95th percentile (p95), in seconds
+# If 'last_runs' is given, only the spans of the most recent runs are included
+def summarize(spans, last_runs=None):
+    import numpy as np
+
+    if last_runs is not None:
+        runs = sorted({record['run'] for record in spans}, key=lambda run: int(run.split('_')[0]))[-last_runs:]
+        spans = [record for record in spans if record['run'] in runs]
+
+    stages = {}
+    for record in spans:
+        stages.setdefault(record['stage'], []).append(record['seconds'])
+
+    return {stage: {'count': len(seconds), 'p50': float(np.percentile(seconds, 50)), 'p95': float(np.percentile(seconds, 95))}
+            for stage, seconds in stages.items()}
+
+
+# This function prints the summary of every stage
+def print_summary(summary):
+    print(f"{'Stage':24} | {'Spans':>6} | {'p50 (ms)':>10} | {'p95 (ms)':>10}")
+    print('-' * 60)
+    for stage, values in sorted(summary.items()):
+        print(f"{stage:24} | {values['count']:6} | {values['p50'] * 1000:10.2f} | {values['p95'] * 1000:10.2f}")
+
+
+# Main
+if __name__ == '__main__':
+    last_runs = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    spans = read_spans()
+    if not spans:
+        print(f"There are no spans in {LATENCY_LOG_PATH} yet.")
+        sys.exit(0)
+
+    print_summary(summarize(spans, last_runs))
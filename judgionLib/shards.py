@@ -0,0 +1,217 @@
+# judgionLib/shards.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script implements a packed format for round datasets, as an alternative to one JSON file per round
+# A packed dataset is a directory with a few JSONL shards (one round per line) and an index file
+# The index stores the shard, byte offset and length of every round, so any single round can still be read directly
+# It can be run as a script to convert a dataset between both formats:
+#   python -m judgionLib.shards pack judgion-dataset judgion-packed
+#   python -m judgionLib.shards unpack judgion-packed judgion-dataset
+
+
+import os
+import sys
+import json
+import threading
+
+from judgionLib.constants import SHARD_SIZE
+
+
+# Name of the index file of a packed dataset
+INDEX_FILENAME = 'index.json'
+
+# Packed datasets already read by this process, so the index isn't parsed again for every round: directory -> (index signature, ROUND_SHARDS)
+OPEN_SHARDS = {}
+OPEN_SHARDS_LOCK = threading.Lock()
+
+
+# This function checks if a directory stores a packed dataset
+def is_shard_store(directory):
+    return os.path.isfile(os.path.join(directory, INDEX_FILENAME))
+
+
+class ROUND_SHARDS:
+
+    def __init__(self, directory):
+
+        # Directory where the shards and the index are stored
+        self.directory = directory
+
+        # List of shards, stored as [filename, number of rounds]
+        self.shards = []
+
+        # Dictionary with the location of every round: round filename -> [shard number, offset, length]
+        self.rounds = {}
+
+        # Load the index if the packed dataset already exists
+        index_path = os.path.join(directory, INDEX_FILENAME)
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as file:
+                index = json.load(file)
+            self.shards = index['shards']
+            self.rounds = index['rounds']
+
+
+    # This function stores the index, writing it with a temporary name first so it's never left half-written
+    def save_index(self):
+        os.makedirs(self.directory, exist_ok=True)
+        index_path = os.path.join(self.directory, INDEX_FILENAME)
+        with open(index_path + '.tmp', 'w') as file:
+            json.dump({'format': 1, 'shards': self.shards, 'rounds': self.rounds}, file)
+        os.replace(index_path + '.tmp', index_path)
+
+
+    # This function returns the names of all the rounds in the packed dataset
+    def round_names(self):
+        return list(self.rounds)
+
+
+    # This function returns the data of a single round, reading only its line of the shard
+    def read_round(self, name):
+        shard_num, offset, length = self.rounds[name]
+        with open(os.path.join(self.directory, self.shards[shard_num][0]), 'rb') as file:
+            file.seek(offset)
+            line = file.read(length)
+        return json.loads(line)['data']
+
+
+    # This generator returns (name, data) for every round, reading each shard only once
+    def iter_rounds(self):
+
+        # Group the rounds by shard, in the order they were written
+        by_shard = {}
+        for name, (shard_num, offset, length) in self.rounds.items():
+            by_shard.setdefault(shard_num, []).append((offset, length, name))
+
+        for shard_num in sorted(by_shard):
+            with open(os.path.join(self.directory, self.shards[shard_num][0]), 'rb') as file:
+                content = file.read()
+            for offset, length, name in sorted(by_shard[shard_num]):
+                yield name, json.loads(content[offset:offset + length])['data']
+
+
+    # This function appends several rounds to the packed dataset, given as (name, data) pairs
+    # If a round with the same name already exists, the index will point to the new version
+    def append_rounds(self, rounds):
+        os.makedirs(self.directory, exist_ok=True)
+        file = None
+
+        for name, data in rounds:
+
+            # Open a new shard when there are none, or when the last one is full
+            if not self.shards or self.shards[-1][1] >= SHARD_SIZE:
+                if file is not None:
+                    file.close()
+                    file = None
+                self.shards.append([f"shard_{len(self.shards):05d}.jsonl", 0])
+
+            if file is None:
+                file = open(os.path.join(self.directory, self.shards[-1][0]), 'ab')
+
+            # Each line stores the round name too, so the index could be rebuilt from the shards
+            line = json.dumps({'name': name, 'data': data}, separators=(',', ':')).encode('utf-8')
+            file.seek(0, os.SEEK_END)
+            offset = file.tell()
+            file.write(line + b'\n')
+
+            self.rounds[name] = [len(self.shards) - 1, offset, len(line)]
+            self.shards[-1][1] += 1
+
+        if file is not None:
+            file.close()
+
+        # The index is written once all the rounds are in the shards
+        self.save_index()
+
+
+    # This function appends a single round to the packed dataset
+    def append_round(self, name, data):
+        self.append_rounds([(name, data)])
+
+
+# This function returns the packed dataset of a directory for reading its rounds
+# The index is only parsed again if it changed (it's always replaced by a new file, see 'save_index'), so reading the rounds one by one
+# doesn't parse the whole index for every round. Rounds are written with a new ROUND_SHARDS, never through this one
+def open_shards(directory):
+    info = os.stat(os.path.join(directory, INDEX_FILENAME))
+    signature = (info.st_ino, info.st_size, info.st_mtime_ns)
+    key = os.path.abspath(directory)
+
+    with OPEN_SHARDS_LOCK:
+        known = OPEN_SHARDS.get(key)
+        if known is None or known[0] != signature:
+            known = (signature, ROUND_SHARDS(directory))
+            OPEN_SHARDS[key] = known
+        return known[1]
+
+
+# This function returns the names of the round files in a directory, whatever its format is
+def list_rounds(directory):
+    if is_shard_store(directory):
+        return open_shards(directory).round_names()
+    return [filename for filename in os.listdir(directory) if filename.endswith('.json')]
+
+
+# This function reads a round from a directory, whatever its format is
+def read_round(directory, name):
+    if is_shard_store(directory):
+        return open_shards(directory).read_round(name)
+    with open(os.path.join(directory, name), 'r') as file:
+        return json.load(file)
+
+
+# This function stores a round in a directory, appending it to the shards if the dataset is packed
+# It returns the location of the round (file path or shard)
+def write_round(directory, name, data):
+    if is_shard_store(directory):
+        shards = ROUND_SHARDS(directory)
+        shards.append_round(name, data)
+        return f"{os.path.join(directory, shards.shards[-1][0])}:{name}"
+
+    # The file is written with a temporary name and then renamed, so a crash never leaves a half-written round
+    path = os.path.join(directory, name)
+    tmp_path = f"{path}.{os.getpid()}_{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as json_file:
+        json.dump(data, json_file, indent=4, separators=(',', ': '))
+    os.replace(tmp_path, path)
+    return path
+
+
+# This function converts a directory with one JSON file per round into a packed dataset
+def pack_directory(source, destination):
+    names = sorted(filename for filename in os.listdir(source) if filename.endswith('.json'))
+
+    def rounds():
+        for name in names:
+            with open(os.path.join(source, name), 'r') as file:
+                yield name, json.load(file)
+
+    ROUND_SHARDS(destination).append_rounds(rounds())
+    return len(names)
+
+
+# This function converts a packed dataset into a directory with one JSON file per round
+def unpack_shards(source, destination):
+    os.makedirs(destination, exist_ok=True)
+
+    count = 0
+    for name, data in ROUND_SHARDS(source).iter_rounds():
+        write_round(destination, name, data)
+        count += 1
+
+    return count
+
+
+# Main
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] not in ('pack', 'unpack'):
+        print("Usage: python -m judgionLib.shards [pack|unpack] SOURCE DESTINATION")
+        sys.exit(1)
+
+    if sys.argv[1] == 'pack':
+        total = pack_directory(sys.argv[2], sys.argv[3])
+    else:
+        total = unpack_shards(sys.argv[2], sys.argv[3])
+
+    print(f"{total} rounds converted from {sys.argv[2]} to {sys.argv[3]}.")
@@ -0,0 +1,167 @@
+# judgionLib/tflite_runtime.py
+# Iván Ontiveros - RetroVortex
+
+
+# This script implements the TFLite version of the judge models, for panels running on small CPU machines
+# A trained judge can be exported as a float16 or int8-quantized TFLite model (int8 models are calibrated with the training rounds)
+# 'TFLITE_JUDGE' runs those models with the TFLite interpreter, which is much lighter than the full Keras runtime
+# It can be run as a script to export a judge:
+#   python -m judgionLib.tflite_runtime "models/The Pyramid.h5" int8
+
+
+import os
+import sys
+import time
+import threading
+import numpy as np
+
+from judgionLib.constants import TRAINING_DIRECTORY
+
+
+# Supported quantization modes
+QUANTIZATION_MODES = ('float16', 'int8')
+
+
+# This function returns the TFLite interpreter class
+# The standalone 'tflite_runtime' package is used if it's installed, as it doesn't need the whole TensorFlow library
+def get_interpreter_class():
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite import Interpreter
+    return Interpreter
+
+
+class TFLITE_JUDGE:
+
+    def __init__(self, path):
+
+        # TFLite interpreter with the judge model loaded
+        self.interpreter = get_interpreter_class()(model_path=path)
+        self.interpreter.allocate_tensors()
+
+        # Indexes of the input and output tensors
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+
+        # Number of rows the input tensor is currently allocated for
+        self.batch_size = self.interpreter.get_input_details()[0]['shape'][0]
+
+        # The interpreter can't be used by several threads at the same time
+        self.lock = threading.Lock()
+
+
+    # This function loads a TFLite judge from its file
+    @classmethod
+    def load(cls, path):
+        return cls(path)
+
+
+    # This function returns the model's output for a matrix of rounds. It works as the Keras 'predict' method (extra arguments are ignored)
+    def predict(self, input_data, **kwargs):
+        x = np.asarray(input_data, dtype=np.float32)
+
+        with self.lock:
+            # The input tensor is only resized when the number of rounds changes
+            if len(x) != self.batch_size:
+                self.interpreter.resize_tensor_input(self.input_index, x.shape)
+                self.interpreter.allocate_tensors()
+                self.batch_size = len(x)
+
+            self.interpreter.set_tensor(self.input_index, x)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index).copy()
+
+
+# This function returns the path of the TFLite export of a judge model
+def tflite_path(model_path):
+    return os.path.splitext(model_path)[0] + '.tflite'
+
+
+# This function returns the training rounds (normalized if the judge uses normalization factors) and their labels
+def training_rounds(norm_factors):
+    from judgionLib.dataset_cache import load_dataset
+
+    stats, winners = load_dataset(TRAINING_DIRECTORY)
+    if norm_factors is not None:
+        stats = (stats / norm_factors).astype(np.float32)
+
+    return stats, winners
+
+
+# This function returns the average time (in seconds) a prediction function takes to score a matrix of rounds
+def time_predictions(predict, stats, repetitions=20):
+    predict(stats)      # Warm-up call, not measured
+    ini_t = time.perf_counter()
+    for _ in range(repetitions):
+        predict(stats)
+    return (time.perf_counter() - ini_t) / repetitions
+
+
+# This function exports a judge model ('.h5') as a TFLite model, next to the original file
+# It returns the path of the export and a report comparing it with the original model on the training rounds
+def export_tflite(model_path, quantization='float16'):
+    import tensorflow as tf
+    from judgionLib.models import load_keras_judge
+
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode '{quantization}'. Use one of: {', '.join(QUANTIZATION_MODES)}")
+
+    model = load_keras_judge(model_path)
+    npy_path = os.path.splitext(model_path)[0] + '.npy'
+    norm_factors = np.load(npy_path) if os.path.exists(npy_path) else None
+    stats, winners = training_rounds(norm_factors)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    else:
+        # The int8 ranges of the activations are calibrated with the training rounds
+        # The input and output stay as float32, so the judges use the model just like the Keras one
+        def representative_dataset():
+            for row in stats:
+                yield [row.reshape(1, -1)]
+        converter.representative_dataset = representative_dataset
+
+    path = tflite_path(model_path)
+    with open(path, 'wb') as file:
+        file.write(converter.convert())
+
+    # Compare both models on the training rounds
+    judge = TFLITE_JUDGE.load(path)
+    keras_output = model.predict(stats, verbose=0)
+    tflite_output = judge.predict(stats)
+
+    keras_accuracy = float(np.mean(np.argmax(keras_output, axis=1) == winners))
+    tflite_accuracy = float(np.mean(np.argmax(tflite_output, axis=1) == winners))
+    keras_time = time_predictions(lambda x: model.predict(x, verbose=0), stats)
+    tflite_time = time_predictions(judge.predict, stats)
+
+    report = {
+        'keras_accuracy': keras_accuracy,
+        'tflite_accuracy': tflite_accuracy,
+        'accuracy_difference': tflite_accuracy - keras_accuracy,
+        'agreement': float(np.mean(np.argmax(keras_output, axis=1) == np.argmax(tflite_output, axis=1))),
+        'speedup': keras_time / tflite_time if tflite_time > 0 else float('inf'),
+    }
+
+    return path, report
+
+
+# This function prints the report of a TFLite export
+def print_report(path, report):
+    print(f"TFLite judge saved as {path}")
+    print(f"Accuracy on the training rounds: {report['keras_accuracy'] * 100:.2f}% (Keras) | {report['tflite_accuracy'] * 100:.2f}% (TFLite) | Difference: {report['accuracy_difference'] * 100:+.2f}%")
+    print(f"Same round winner as Keras in {report['agreement'] * 100:.2f}% of the rounds")
+    print(f"Speedup over Keras: x{report['speedup']:.1f}")
+
+
+# Main
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(f"Usage: python -m judgionLib.tflite_runtime MODEL_PATH [{'|'.join(QUANTIZATION_MODES)}]")
+        sys.exit(1)
+
+    export = export_tflite(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else 'float16')
+    print_report(*export)
@@ -3,85 +3,147 @@
 
 # This script executes the AI-powered judging process for a fight 
 # Initializing 3 judges who will decide the winner, just as in real life
+#
+# It can also score every fight already stored in the test directory without asking anything (batch mode):
+#   python main.py --batch "The Pyramid" "The Diagonal" "The Cross"
+# The results (probabilities, scorecards and decision of every fight) are saved as a JSON file in the logs directory
+#
+# With the '--in-memory' flag, the scraped rounds go directly to the judges, and the JSON files are written in the background
+# The files can't be edited before the judging in this mode. Add '--no-files' to skip writing them
+#
+# With the '--live' flag, the fight is scored while it's happening: after every round, only the new round is scored
+# and the projected decision is updated
 
 
 # Libraries
-from round_judge import AI_JUDGE
+import os
+import sys
+import json
+import time
+
+from judge_panel import JUDGE_PANEL
 from json_generator import UFC_WEB_SCRAPER
-from judgionLib.constants import NUM_JUDGES
+from judgionLib.profiling import span
+from judgionLib.decisions import decision_text, decision_probabilities
+from judgionLib.constants import NUM_JUDGES, MODELS_DIRECTORY, LOG_DIRECTORY
 
 
 # This function is used to declare the winner based on the judges' scorecards
-def declare_winner(results, red_name, blue_name):
-
-    # Counting the wins
-    red_wins = results.count(1)
-    blue_wins = results.count(2)
-    draw_votes = results.count(0)
+# If the judges' predictions are given, the probability of every possible decision is printed too
+def declare_winner(results, red_name, blue_name, predictions=None):
 
     # Printing the final result
     print("\n-------------------")
     print("| OFFICIAL DECISION |")
     print("-------------------\n")
 
-    # Processing the winner. This method does not assume there are 3 scorecards.
-    if draw_votes == 0:
-        if blue_wins == 0:
-            print(f"Winner by Unanimous Decision: {red_name}")
-        elif red_wins == 0:
-            print(f"Winner by Unanimous Decision: {blue_name}")
-        else:
-            if red_wins > blue_wins:
-                print(f"Winner by Split Decision: {red_name}")
-            elif blue_wins > red_wins:
-                print(f"Winner by Split Decision: {blue_name}")
-            else:
-                print("Split Draw")
-    
-    else:
-        if draw_votes == NUM_JUDGES:
-            print("Unanimous Draw")
-
-        else:
-
-            if red_wins > 0 and blue_wins > 0:
-                if draw_votes >= red_wins: 
-                    if draw_votes >= blue_wins:
-                        print("Split Draw")
-                    else:
-                        print(f"Winner by Split Decision: {blue_name}")
-                elif draw_votes >= blue_wins:
-                    if draw_votes >= red_wins:
-                        print("Split Draw")
-                    else:
-                        print(f"Winner by Split Decision: {red_name}")
-
-            elif red_wins == 0:
-                if draw_votes > blue_wins:
-                    print("Majority Draw")
-                else:
-                    print(f"Winner by Majority Decision: {blue_name}")
-
-            else:
-                if draw_votes > red_wins:
-                    print("Majority Draw")
-                else:
-                    print(f"Winner by Majority Decision: {red_name}")
+    # Processing the winner (unanimous, split or majority decision, or draw). This method does not assume there are 3 scorecards.
+    print(decision_text(results, red_name, blue_name))
+
+    if predictions is not None:
+        print_decision_probabilities(predictions, red_name, blue_name)
+
+
+# This function prints the probability of every decision, taking into account all the probabilities of every round (not only the most likely score)
+def print_decision_probabilities(predictions, red_name, blue_name):
+    print("\n---- Decision probabilities ----")
+    names = {0: '', 1: f": {red_name}", 2: f": {blue_name}"}
+    probabilities = decision_probabilities(predictions)
+    for (kind, winner), probability in sorted(probabilities.items(), key=lambda x: -x[1]):
+        print(f"{kind}{names[winner]}: {probability * 100:.2f}%")
+
+
+# This function scores a fight while it's happening. Every time a round finishes, the scraper gets the stats again
+# and only the new rounds are scored; the judges keep the running totals of their scorecards and the projected decision is updated
+def live_scoring(panel, scraper):
+    scored_rounds = 0
+
+    while True:
+        command = input("\nPress Enter when a round finishes to score it (or type 'q' to end the live mode): ")
+        if command.strip().lower() == 'q':
+            break
+
+        rounds = scraper.start_scraping(in_memory=True, save_files=False)
+        if not rounds[scored_rounds:]:
+            print("There are no new rounds yet.")
+            continue
+
+        if scored_rounds == 0:
+            panel.start_live(rounds[0]['red_fighter']['name'], rounds[0]['blue_fighter']['name'], f"{scraper.red_last_name}_{scraper.blue_last_name}")
+
+        # Only the rounds that weren't scored before go through the judges
+        for data in rounds[scored_rounds:]:
+            with span('live_round'):
+                results = panel.score_live_round(data)
+            scored_rounds += 1
+
+        # Projected decision if the fight ended now
+        print("\n--------------------")
+        print(f"| PROJECTED DECISION | (after {scored_rounds} rounds)")
+        print("--------------------\n")
+        for judge in panel.judges:
+            print(f"{judge.judge_name}: Red corner | {judge.live_scores[0]} | {judge.live_scores[1]} | Blue corner")
+        print(decision_text(results, scraper.red_last_name, scraper.blue_last_name))
+        print_decision_probabilities(panel.last_predictions, scraper.red_last_name, scraper.blue_last_name)
+
+
+# This function scores all the fights of the test directory and saves the results, without asking the user anything
+# If no model names are given, the first models of the models directory (in alphabetical order) are used
+def batch_scoring(names):
+    if not names:
+        names = sorted(os.path.splitext(f)[0] for f in os.listdir(MODELS_DIRECTORY) if f.endswith('.h5'))[:NUM_JUDGES]
+
+    panel = JUDGE_PANEL()
+    panel.load_judges(names)
+
+    ini_t = time.perf_counter()
+    with span('batch_scoring'):
+        fights = panel.score_test_directory()
+    elapsed = time.perf_counter() - ini_t
+
+    for fight in fights:
+        print(f"{fight['fight_id']:30} | {fight['decision']['text']}")
+
+    os.makedirs(LOG_DIRECTORY, exist_ok=True)
+    path = f"{LOG_DIRECTORY}/batch_results_{int(time.time())}.json"
+    with open(path, 'w') as file:
+        json.dump({'judges': names, 'fights': fights}, file, indent=4)
+
+    print(f"\n{len(fights)} fights scored in {elapsed:.2f} s. Results saved as {path}")
 
 
 
 if __name__ == '__main__':
 
+    # Batch mode: score every fight of the test directory
+    if len(sys.argv) > 1 and sys.argv[1] == '--batch':
+        batch_scoring(sys.argv[2:])
+        sys.exit(0)
+
     # Init the judges
-    judges = []
-    for i in range(NUM_JUDGES):
-        judges.append(AI_JUDGE())
-        judges[i].set_judge()
+    panel = JUDGE_PANEL()
+    panel.set_judges(NUM_JUDGES)
 
     # Ask the user for the link and init the web scraper
     fight_link = input("Enter the fight link (UFC Stats website link): ")
     scraper = UFC_WEB_SCRAPER(fight_link, False, True)      # We generate the files in the testing directory, not the training directory
 
+    # Live mode: the rounds are scored one by one as the fight goes on
+    if '--live' in sys.argv:
+        live_scoring(panel, scraper)
+        sys.exit(0)
+
+    # In-memory mode: the judges score the scraped rounds right away
+    if '--in-memory' in sys.argv:
+        rounds = scraper.start_scraping(in_memory=True, save_files='--no-files' not in sys.argv)
+        if rounds:
+            with span('judging', rounds=len(rounds)):
+                results = panel.score_fight(rounds, f"{scraper.red_last_name}_{scraper.blue_last_name}")
+            with span('declare_winner'):
+                declare_winner(results, scraper.red_last_name, scraper.blue_last_name, panel.last_predictions)
+        scraper.wait_for_files()
+        sys.exit(0)
+
     # Do the scraping
     scraper.start_scraping()
 
@@ -91,18 +153,14 @@ if __name__ == '__main__':
     # The user can change the file now (useful for adding cuts or changing the label)
     input("\nYou can change the generated JSON files if needed (f.e. the 'cuts' stat).\nPress Enter when all is set to start the judging process.")
 
-    # Request the scorecards
-    results = []
-    for judge in judges:
-
-        # First, set the fight ID so the model can open the requested files
-        judge.fight_id = identificator
-
-        # Then, do the judging process and store the result --> 0: Draw ; 1: Red fighter win ; 2: Blue fighter win
-        results.append(judge.give_scorecards())
+    # Request the scorecards. The fight is parsed once and all the judges score it at the same time
+    # The result of each judge is stored --> 0: Draw ; 1: Red fighter win ; 2: Blue fighter win
+    with span('judging'):
+        results = panel.give_scorecards(identificator)
 
     # Process the winner 
-    declare_winner(results, scraper.red_last_name, scraper.blue_last_name)
+    with span('declare_winner'):
+        declare_winner(results, scraper.red_last_name, scraper.blue_last_name, panel.last_predictions)
 
 
 
@@ -16,7 +16,9 @@ from functools import partial
 from sklearn.model_selection import GridSearchCV, StratifiedKFold
 from scikeras.wrappers import KerasClassifier
 
-from judgionLib.utils import stats_getter, normalize_stats, model_builder
+from judgionLib.utils import normalize_stats
+from judgionLib.models import model_builder
+from judgionLib.dataset_cache import load_dataset
 from judgionLib.constants import TRAINING_DIRECTORY, USE_SEED, TRAINING_SEED, LOG_DIRECTORY
 
 # Some optimizers can cause problems when using Grid Search, like AdamW. To solve them, add this code for said optimizer:
@@ -61,10 +63,9 @@ class PARAMS_FINDER:
 
         # Normalize the data if the user chose to
         if self.norm_flag:
-            normalized_stats, _ = normalize_stats(self.x_train)
-            x_train_processed = np.array(normalized_stats)
+            x_train_processed, _ = normalize_stats(self.x_train)
         else:
-            x_train_processed = np.array(self.x_train)
+            x_train_processed = np.asarray(self.x_train, dtype=np.float32)
 
         # Transforming 'y_train' into a one-hot encoded array
         y_train_processed = np.array(self.y_train)
@@ -102,7 +103,7 @@ class PARAMS_FINDER:
     def init_search(self):
 
         # Initialize the training matrices
-        (self.x_train, self.y_train) = stats_getter(TRAINING_DIRECTORY)
+        (self.x_train, self.y_train) = load_dataset(TRAINING_DIRECTORY)
 
         # Normalize the stats
         x = input("Normalize stats for training? [Y/N]: ")
@@ -6,14 +6,56 @@
 
 
 # Libraries
-from tensorflow.keras.models import load_model
-from tensorflow.keras.utils import custom_object_scope
+# TensorFlow isn't imported here: it's only loaded when a Keras judge model is set (see 'load_judge_model')
 import numpy as np
-import json
 import os
 
-from judgionLib.utils import stats_extractor, DiagonalLayer
-from judgionLib.constants import TEST_DIRECTORY, MODELS_DIRECTORY
+from judgionLib.ingestion import round_extractor, STATS_PER_FIGHTER
+from judgionLib.decisions import ROUND_SCORES
+from judgionLib.shards import read_round
+from judgionLib.fight_index import fight_index
+from judgionLib.model_registry import JUDGE_REGISTRY
+from judgionLib.prediction_cache import prediction_cache, model_hash
+from judgionLib.profiling import span
+from judgionLib.numpy_runtime import NUMPY_JUDGE
+from judgionLib.tflite_runtime import TFLITE_JUDGE
+from judgionLib.constants import TEST_DIRECTORY, MODELS_DIRECTORY, JUDGE_BACKEND, USE_PREDICTION_CACHE
+
+
+# File extension used by each judge runtime other than Keras
+RUNTIME_EXTENSIONS = {'numpy': '.npz', 'tflite': '.tflite'}
+
+
+# This function returns the file that will be used for running a judge model, depending on the 'JUDGE_BACKEND' constant
+# 'keras' uses the '.h5' file; 'numpy' and 'tflite' use the exported model; 'auto' uses the NumPy export only if it's up to date
+def judge_runtime_path(model_path):
+    if JUDGE_BACKEND == 'keras':
+        return model_path
+
+    backend = 'numpy' if JUDGE_BACKEND == 'auto' else JUDGE_BACKEND
+    runtime_path = os.path.splitext(model_path)[0] + RUNTIME_EXTENSIONS[backend]
+
+    if not os.path.exists(runtime_path):
+        if JUDGE_BACKEND != 'auto':
+            print(f"There's no {backend} export for {model_path}, the Keras model will be used instead.")
+        return model_path
+
+    if JUDGE_BACKEND == 'auto' and os.path.getmtime(runtime_path) < os.path.getmtime(model_path):
+        return model_path
+
+    return runtime_path
+
+
+# This function loads a judge model, using the runtime that matches its file
+# TensorFlow is only imported for '.h5' files, the first time one is needed, so importing this script stays fast
+def load_judge_model(path):
+    if path.endswith('.npz'):
+        return NUMPY_JUDGE.load(path)
+    if path.endswith('.tflite'):
+        return TFLITE_JUDGE.load(path)
+
+    from judgionLib.models import load_keras_judge
+    return load_keras_judge(path)
 
 
 class AI_JUDGE:
@@ -23,6 +65,9 @@ class AI_JUDGE:
         # This variable will store a judge model generated with the training script
         self.judge_model = None
 
+        # This variable will store the name of the judge model
+        self.judge_name = None
+
         # This variable will store the ID for the fight to score
         self.fight_id = None
 
@@ -34,15 +79,22 @@ class AI_JUDGE:
         self.blue_fighter = None
 
         # This array stores the normalization factors for this judge's training data (if normalization was applied)
-        self.norm_factors = None    # TODO: Buscar en el directorio de modelos si hay un '.npy' aparte del '.h5', y meterlo aquí y usarlo para el judgind process si tal
+        self.norm_factors = None
+
+        # Content hash of the model file (used by the prediction cache, only for Keras models)
+        self.model_hash = None
+
+        # Live mode: predictions of the rounds scored so far (1x4 matrices) and running total of each fighter
+        self.live_predictions = []
+        self.live_scores = [0, 0]
 
 
     # Function to load the stats for the round selected
+    # It accepts the path of the file, or just its name (then it's looked for in the test directory)
     def load_data(self, filename):
 
-        # Opening the file
-        with open(filename, 'r') as file:
-            data = json.load(file)
+        # Opening the file (or reading the round from the shards, if its directory stores a packed dataset)
+        data = read_round(os.path.dirname(filename) or TEST_DIRECTORY, os.path.basename(filename))
         
         # Isolate the stats
         red_stats = data['red_fighter']
@@ -52,32 +104,23 @@ class AI_JUDGE:
         self.red_fighter = red_stats['name']
         self.blue_fighter = blue_stats['name']
 
-        # Extract the stats and store them in matrices
-        red = stats_extractor(red_stats)
-        blue = stats_extractor(blue_stats)
+        # Extract the stats of both fighters (red, then blue) into a matrix with the Keras structure (1x46)
+        model_input = np.empty((1, 2 * STATS_PER_FIGHTER), dtype=np.float32)
+        round_extractor(data, model_input[0])
 
-        # Prepare the model input by combining red and blue stats
-        model_input = []
-        model_input.extend(red)
-        model_input.extend(blue)
+        return model_input
 
-        # Return the matrix rearranged so it fits the Keras structure (1x46)
-        return np.array(model_input).reshape(1,-1)
 
-
-    # This method returns all the rounds that match the ID specified by the user in a sorted list
+    # This method returns all the rounds that match the ID specified by the user in a sorted list (R1 first, then R2, and so on)
+    # The rounds are taken from the fight index of the directory, so it isn't scanned for every fight
     def rounds_extractor(self):
-        fight_rounds = []
+        with span('find_rounds'):
+            return fight_index(TEST_DIRECTORY).rounds(self.fight_id)
 
-        # Iterate over the directory and extract all the files that match the ID
-        for filename in os.listdir(TEST_DIRECTORY):
-            if filename.startswith(self.fight_id) and filename.endswith('.json'):
-                fight_rounds.append(filename)
 
-        # Sorting the rounds (R1 first, then R2, and so on)
-        fight_rounds.sort(key=lambda x: int(x.split('_R')[-1].replace('.json', '')))
-        
-        return fight_rounds
+    # This function returns the round number of each file (assuming the format: {RedFighterLastName}_{BlueFighterLastName}_R{round number}.json)
+    def get_round_numbers(self, fight_files):
+        return [filename.replace(self.fight_id, '').replace('.json', '').strip('_R') for filename in fight_files]
 
 
     # This function processes the model's output and prints it in a friendly/readable way
@@ -106,6 +149,28 @@ class AI_JUDGE:
             print(f"{label}: {value:.2f}%")
 
 
+    # This function loads all the rounds of the fight in a single matrix (one row per round)
+    def load_rounds(self, fight_files):
+        with span('parse_rounds', rounds=len(fight_files)):
+            return np.concatenate([self.load_data(filename) for filename in fight_files])
+
+
+    # This function returns the model's output for all the rounds of a fight, using a single prediction call
+    def predict_rounds(self, input_data):
+
+        # Checking if the data should be normalized, and doing so if needed (all the rounds at once)
+        with span('normalize', rounds=len(input_data)):
+            if self.norm_factors is not None:
+                input_data = input_data / self.norm_factors
+
+        # Get the predictions for the whole fight
+        # With the prediction cache (Keras models), only the rounds this model hasn't scored before go through the model
+        with span('predict', judge=self.judge_name, rounds=len(input_data)):
+            if self.model_hash is not None:
+                return prediction_cache().predict(self.model_hash, np.asarray(input_data), self.judge_model.predict)
+            return self.judge_model.predict(input_data)
+
+
     # This function executes the judging process
     def give_scorecards(self):
 
@@ -118,69 +183,59 @@ class AI_JUDGE:
             print("Enter a valid fight ID and restart the process.\n")
             return
 
-        # Initial scores for each fighter
-        red_score = 0
-        blue_score = 0
+        # Extract the round numbers
+        round_numbers = self.get_round_numbers(fight_files)
 
-        # Loop through the directory
-        for filename in fight_files:
-                
-            print("OFFICIAL SCORECARD")
-            
-            # Extract the round number (assuming the format: {RedFighterLastName}_{BlueFighterLastName}_R{round number}.json)
-            round_number = filename.replace(self.fight_id, '').replace('.json', '').strip('_R')
+        # Load the data for all the rounds, and get the predictions with a single call to the model
+        predictions = self.predict_rounds(self.load_rounds(fight_files))
 
-            # Load the data for the current round
-            file_path = os.path.join(TEST_DIRECTORY, filename)
-            input_data = self.load_data(file_path)
+        return self.print_scorecards(predictions, round_numbers)
 
-            # print("Input data: ", input_data)
 
-            # Checking if the data should be normalized, and doing so if needed
-            if self.norm_factors is not None:
-                input_data = input_data / self.norm_factors
-                # print("Normalized data: ", input_data)
-
-            # Get the prediction
-            prediction = self.judge_model.predict(input_data)
-
-            # Print the round number
-            print("")
-            print("")
-            print(f"ROUND {round_number}")
-            print("-----------")
-            print("")
-
-            # Full prediction output
-            self.print_probabilities(prediction)
-
-            # Winner of the round (summary)
-            predicted_class = np.argmax(prediction)
-            print("")
-            print("     OFFICIAL RESULT")
-            print("")
-            if predicted_class == 0:
-                print("Red corner | 10 | 8 | Blue corner")
-                red_score += 10
-                blue_score += 8
-            elif predicted_class == 1:
-                print("Red corner | 10 | 9 | Blue corner")
-                red_score += 10
-                blue_score += 9
-            elif predicted_class == 2:
-                print("Red corner | 9 | 10 | Blue corner")
-                red_score += 9
-                blue_score += 10
-            else:
-                print("Red corner | 8 | 10 | Blue corner")
-                red_score += 8
-                blue_score += 10
+    # This function prints the scorecard of a round from the model's prediction (a 1x4 matrix), returning the points of each fighter
+    def print_round(self, prediction, round_number):
+
+        print("OFFICIAL SCORECARD")
+
+        # Print the round number
+        print("")
+        print("")
+        print(f"ROUND {round_number}")
+        print("-----------")
+        print("")
 
-            # Separator for the next round
-            print("")
-            print('================================================')
-            print('================================================')
-            print("")
+        # Full prediction output
+        self.print_probabilities(prediction)
+
+        # Winner of the round (summary)
+        red_points, blue_points = ROUND_SCORES[np.argmax(prediction)]
+        print("")
+        print("     OFFICIAL RESULT")
+        print("")
+        print(f"Red corner | {red_points} | {blue_points} | Blue corner")
+
+        # Separator for the next round
+        print("")
+        print('================================================')
+        print('================================================')
+        print("")
+
+        return red_points, blue_points
+
+
+    # This function prints the scorecard of every round from the model's predictions, returning the winner of the fight
+    def print_scorecards(self, predictions, round_numbers):
+
+        # Initial scores for each fighter
+        red_score = 0
+        blue_score = 0
+
+        # Loop through the rounds (each prediction is kept as a 1x4 matrix)
+        with span('print_scorecards', rounds=len(round_numbers)):
+            for i, round_number in enumerate(round_numbers):
+                red_points, blue_points = self.print_round(predictions[i:i + 1], round_number)
+                red_score += red_points
+                blue_score += blue_points
 
 
         # Print the final results
@@ -202,6 +257,64 @@ class AI_JUDGE:
             return 0
 
     
+    # This function starts the live mode for a new fight, where rounds are scored one by one as they finish
+    def start_live(self, red_fighter, blue_fighter, fight_id=None):
+        self.fight_id = fight_id
+        self.red_fighter = red_fighter
+        self.blue_fighter = blue_fighter
+        self.live_predictions = []
+        self.live_scores = [0, 0]
+
+
+    # This function adds the prediction of the round that just finished to the live scorecard, returning the current result
+    # Only the new round is processed; the previous ones are already included in the running totals
+    def add_live_round(self, prediction):
+        self.live_predictions.append(prediction)
+
+        red_points, blue_points = self.print_round(prediction, len(self.live_predictions))
+        self.live_scores[0] += red_points
+        self.live_scores[1] += blue_points
+
+        print(f"Scorecard after {len(self.live_predictions)} rounds --> Red corner | {self.live_scores[0]} | {self.live_scores[1]} | Blue corner")
+        print("")
+
+        return self.live_result()
+
+
+    # This function scores the round that just finished in live mode (one single-round prediction), returning the current result
+    def score_live_round(self, data):
+        model_input = np.empty((1, 2 * STATS_PER_FIGHTER), dtype=np.float32)
+        round_extractor(data, model_input[0])
+        return self.add_live_round(self.predict_rounds(model_input))
+
+
+    # This function returns the result of the live scorecard so far --> 0: Draw ; 1: Red fighter ahead ; 2: Blue fighter ahead
+    def live_result(self):
+        red_score, blue_score = self.live_scores
+        if red_score > blue_score:
+            return 1
+        if blue_score > red_score:
+            return 2
+        return 0
+
+
+    # This function loads the judge model stored in 'model_path' (an '.h5' file), without asking the user
+    def load_judge(self, model_path):
+
+        # The model comes from the registry, so judges that pick the same model share a single loaded instance
+        # The registry also loads the '.npy' file assigned to this judge, if there's any
+        runtime_path = judge_runtime_path(model_path)
+        with span('load_judge', model=os.path.basename(runtime_path)):
+            self.judge_model, self.norm_factors = JUDGE_REGISTRY.get(runtime_path, load_judge_model)
+
+            # Content hash of the model file, which identifies its predictions in the prediction cache
+            # Only Keras models use the cache: the NumPy and TFLite runtimes predict faster than the cache can be read
+            self.model_hash = model_hash(runtime_path) if USE_PREDICTION_CACHE and runtime_path.endswith('.h5') else None
+
+        # Readable name of the judge
+        self.judge_name = os.path.splitext(os.path.basename(model_path))[0].replace('_', ' ')
+
+
     # This function sets which judge model will be used
     def set_judge(self):
         models = []
@@ -230,18 +343,11 @@ class AI_JUDGE:
 
             # Check if the pick is valid. If not, ask again
             if choice.isdigit() and 1 <= int(choice) <= len(models):
-                # Load and return the chosen model
-                chosen_model = models[int(choice) - 1]
-
-                with custom_object_scope({'DiagonalLayer': DiagonalLayer}):     # This line is only used for compatibility with a personalised layer
-                    self.judge_model = load_model(chosen_model)
-
-                # Checking if there's any '.npy' file assigned to this judge
-                base_name = os.path.splitext(os.path.basename(chosen_model))[0]
-                npy_path = os.path.join(MODELS_DIRECTORY, base_name + '.npy')
-                # If there is, it means we need to normalize the data before getting the prediction
-                if os.path.exists(npy_path):
-                    self.norm_factors = np.load(npy_path)
+                # Load the chosen model
+                self.load_judge(models[int(choice) - 1])
+
+                # If there are normalization factors, it means we need to normalize the data before getting the prediction
+                if self.norm_factors is not None:
                     print(f"Normalization factors for the selected judge: {self.norm_factors}")
 
                 return
@@ -0,0 +1,112 @@
+# tests/conftest.py
+# Iván Ontiveros - RetroVortex
+
+
+# Shared setup of the tests: the scripts of the repository are importable, and every test runs in its own temporary directory
+# so the caches, logs and indexes it creates never touch the ones of the repository
+
+
+import os
+import sys
+import hashlib
+import threading
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# Directories with data shipped with the repository
+TEST_ROUNDS = os.path.join(REPO_ROOT, 'test')
+TRAINING_ROUNDS = os.path.join(REPO_ROOT, 'judgion-dataset')
+FIXTURES = os.path.join(REPO_ROOT, 'tests', 'fixtures')
+
+# Pages served by the fixture server: the list of events and the events (tests/fixtures/backfill), and the fight pages
+EVENT_PAGES = os.path.join(FIXTURES, 'backfill')
+FIGHT_PAGES = os.path.join(FIXTURES, 'fight_pages')
+
+# Date of the 'Last-Modified' header of every page of the fixture server
+LAST_MODIFIED = 'Sat, 01 Jun 2024 00:00:00 GMT'
+
+
+@pytest.fixture(autouse=True)
+def isolated_directory(tmp_path, monkeypatch):
+    from judgionLib import profiling
+
+    # Relative paths (the 'cache' and 'logs' directories) are created inside the temporary directory
+    monkeypatch.chdir(tmp_path)
+
+    # The latency spans of the tests aren't recorded
+    monkeypatch.setattr(profiling, 'PROFILING', False)
+    return tmp_path
+
+
+class FIXTURE_HANDLER(BaseHTTPRequestHandler):
+
+    # This function returns the content of the page of a path (pages set by the test first, then the fixture files), or None
+    def page_content(self, path):
+        if path in self.server.pages:
+            return self.server.pages[path]
+
+        if path == '/statistics/events/completed':
+            filename = os.path.join(EVENT_PAGES, 'completed.html')
+        elif path.startswith('/event-details/'):
+            filename = os.path.join(EVENT_PAGES, path.rsplit('/', 1)[1] + '.html')
+        elif path.startswith('/fight-details/'):
+            filename = os.path.join(FIGHT_PAGES, path.rsplit('/', 1)[1] + '.html')
+        else:
+            return None
+
+        if not os.path.exists(filename):
+            return None
+        with open(filename, 'rb') as file:
+            return file.read()
+
+
+    # This function answers a request with the page of its path, or a 404 if there's none
+    # Conditional requests get a 304 (and no content) if the page didn't change: same ETag or, without one, same modification date
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        content = self.page_content(urlparse(self.path).path)
+        if content is None:
+            self.send_error(404)
+            return
+
+        etag = f'"{hashlib.sha1(content).hexdigest()}"'
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match == etag or (if_none_match is None and self.headers.get('If-Modified-Since') == LAST_MODIFIED):
+            self.server.not_modified.append(self.path)
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(content)
+
+
+    # The requests aren't printed
+    def log_message(self, format, *args):
+        pass
+
+
+# Local server with the fixture pages (on 127.0.0.1, with a free port)
+# It returns the server, with its base URL, the requested paths, the ones answered with a 304, and the pages set by the test (path -> bytes)
+@pytest.fixture
+def fixture_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FIXTURE_HANDLER)
+    server.requests = []
+    server.not_modified = []
+    server.pages = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield server
+    server.shutdown()
+    server.server_close()
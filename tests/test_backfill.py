@@ -0,0 +1,171 @@
+# tests/test_backfill.py
+# Iván Ontiveros - RetroVortex
+
+
+import os
+import json
+import pytest
+from urllib.parse import urlparse
+
+from conftest import FIGHT_PAGES
+import backfill
+from backfill import BACKFILL_CRAWLER
+from judgionLib.fight_index import FIGHT_INDEX
+from judgionLib.ingestion import parse_directory
+
+
+# The events of the fixture server (see 'conftest.py') link decisions, a first round KO, a missing page and a rematch of the first fight
+# Files expected after crawling all the events (the rematch continues the round numbers of the first fight)
+EXPECTED_FILES = sorted([f'Jones_Reyes_R{n}.json' for n in range(1, 11)] + [f'St-Pierre_Hendricks_R{n}.json' for n in range(1, 6)] +
+                        [f'Usman_Chimaev_R{n}.json' for n in range(1, 4)])
+
+
+# This function returns a crawler for the fixture server, without waits between the requests
+def make_crawler(directory, server, **kwargs):
+    settings = {'rate': 1000.0, 'workers': 2, 'retries': 1, 'backoff': 0.01}
+    settings.update(kwargs)
+    return BACKFILL_CRAWLER(str(directory), server.base_url, **settings)
+
+
+# This function returns the round files of a directory with their content
+def read_rounds(directory):
+    rounds = {}
+    for filename in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, filename), 'r') as file:
+            rounds[filename] = json.load(file)
+    return rounds
+
+
+def test_crawler_stores_unlabeled_rounds(tmp_path, fixture_server):
+    crawler = make_crawler(tmp_path / 'backfill', fixture_server)
+    crawler.start()
+
+    rounds = read_rounds(tmp_path / 'backfill')
+    assert sorted(rounds) == EXPECTED_FILES
+    assert all(data['winner'] is None for data in rounds.values())
+
+    # Same stats as the pages (the rematch has the same page as the first fight)
+    with open(os.path.join(FIGHT_PAGES, 'Jones_Reyes.json'), 'r') as file:
+        expected = json.load(file)
+    for i, data in enumerate(expected * 2):
+        assert rounds[f'Jones_Reyes_R{i + 1}.json'] == dict(data, winner=None)
+
+    statuses = {urlparse(url).path.rsplit('/', 1)[1]: fight['status'] for url, fight in crawler.fights.items()}
+    assert statuses == {'Jones_Reyes': 'done', 'Fixture_Fixture': 'skipped', 'Missing_Fight': 'failed', 'Usman_Chimaev': 'done',
+                        'St-Pierre_Hendricks': 'done'}
+    assert len(crawler.events) == 2
+
+    # The rounds can't be used for training until they're labeled
+    with pytest.raises(ValueError, match="isn't labeled"):
+        parse_directory(str(tmp_path / 'backfill'))
+
+    # Nothing is requested again on the next run
+    requests_num = len(fixture_server.requests)
+    make_crawler(tmp_path / 'backfill', fixture_server).start()
+    assert fixture_server.requests[requests_num:] == ['/statistics/events/completed?page=all']
+
+
+def test_first_round_finishes_are_skipped_silently(tmp_path, fixture_server, capsys):
+    crawler = make_crawler(tmp_path / 'backfill', fixture_server)
+    url = f'{fixture_server.base_url}/fight-details/Fixture_Fixture'
+    crawler.process_fight(url)
+
+    assert crawler.fights[url] == {'status': 'skipped', 'reason': 'finished in the first round'}
+    assert os.listdir(tmp_path / 'backfill') == []
+    assert capsys.readouterr().out == ''
+
+
+@pytest.mark.parametrize('written_rounds', [0, 2, 7])
+def test_interrupted_crawl_is_resumed(tmp_path, fixture_server, written_rounds):
+    make_crawler(tmp_path / 'reference', fixture_server).start()
+
+    # The crawler is interrupted (as with Ctrl+C) while writing the files of a fight
+    write_round = FIGHT_INDEX.write_round
+    calls = []
+
+    def interrupted_write_round(self, name, data):
+        if len(calls) == written_rounds:
+            raise KeyboardInterrupt
+        calls.append(name)
+        return write_round(self, name, data)
+
+    FIGHT_INDEX.write_round = interrupted_write_round
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            make_crawler(tmp_path / 'backfill', fixture_server).start()
+    finally:
+        FIGHT_INDEX.write_round = write_round
+
+    assert sorted(os.listdir(tmp_path / 'backfill')) == sorted(calls)
+    assert len(calls) == written_rounds
+
+    # The next run writes the rest of the fight with the same file names, and nothing is duplicated
+    make_crawler(tmp_path / 'backfill', fixture_server).start()
+    assert read_rounds(tmp_path / 'backfill') == read_rounds(tmp_path / 'reference')
+    assert sorted(os.listdir(tmp_path / 'backfill')) == EXPECTED_FILES
+
+
+def test_offline_missing_pages_are_not_retried(tmp_path, fixture_server, monkeypatch):
+    make_crawler(tmp_path / 'reference', fixture_server).start()
+    requests_num = len(fixture_server.requests)
+
+    fetched = []
+    fetch_page = backfill.fetch_page
+    monkeypatch.setattr(backfill, 'fetch_page', lambda url, *args: fetched.append(url) or fetch_page(url, *args))
+
+    # Same pages, read from the HTTP cache: the missing one isn't in it, and waiting won't change that
+    crawler = make_crawler(tmp_path / 'backfill', fixture_server, retries=3, backoff=60.0, offline=True)
+    crawler.start()
+
+    assert fixture_server.requests[requests_num:] == []
+    missing_url = f'{fixture_server.base_url}/fight-details/Missing_Fight'
+    assert fetched.count(missing_url) == 1
+    assert crawler.fights[missing_url] == {'status': 'failed', 'reason': 'page not found'}
+    assert read_rounds(tmp_path / 'backfill') == read_rounds(tmp_path / 'reference')
+
+
+def test_checkpoint_is_a_journal(tmp_path, fixture_server, monkeypatch):
+    monkeypatch.setattr(backfill, 'CHECKPOINT_COMPACT_INTERVAL', 1000)
+    crawler = make_crawler(tmp_path / 'backfill', fixture_server)
+    crawler.start()
+
+    # One line per change: the format, and every state of the fights and events (a written fight goes through 'writing' and 'done')
+    with open(crawler.checkpoint_path, 'r') as file:
+        lines = file.read().splitlines()
+    assert json.loads(lines[0]) == {'format': backfill.CHECKPOINT_FORMAT}
+    assert len(lines) == 1 + 2 * 4 + 2 + 2
+
+    # A line left half-written by a crash is ignored, and the journal is compacted when it's loaded
+    with open(crawler.checkpoint_path, 'a') as file:
+        file.write('["events", "http://127.0.0.1/event-det')
+    resumed = make_crawler(tmp_path / 'backfill', fixture_server)
+    assert (resumed.events, resumed.fights) == (crawler.events, crawler.fights)
+    with open(crawler.checkpoint_path, 'r') as file:
+        assert len(file.read().splitlines()) == 1 + len(crawler.events) + len(crawler.fights)
+
+
+def test_checkpoint_is_compacted_periodically(tmp_path, fixture_server, monkeypatch):
+    monkeypatch.setattr(backfill, 'CHECKPOINT_COMPACT_INTERVAL', 3)
+    crawler = make_crawler(tmp_path / 'backfill', fixture_server)
+    crawler.start()
+
+    with open(crawler.checkpoint_path, 'r') as file:
+        assert len(file.read().splitlines()) <= 1 + len(crawler.events) + len(crawler.fights) + 3
+    resumed = make_crawler(tmp_path / 'backfill', fixture_server)
+    assert (resumed.events, resumed.fights) == (crawler.events, crawler.fights)
+
+
+def test_checkpoint_of_format_1_is_resumed(tmp_path, fixture_server):
+    crawler = make_crawler(tmp_path / 'backfill', fixture_server)
+    crawler.start()
+
+    with open(crawler.legacy_checkpoint_path, 'w') as file:
+        json.dump({'format': 1, 'events': crawler.events, 'fights': crawler.fights}, file)
+    os.remove(crawler.checkpoint_path)
+
+    # The fights already written aren't written again as rematches
+    resumed = make_crawler(tmp_path / 'backfill', fixture_server)
+    assert (resumed.events, resumed.fights) == (crawler.events, crawler.fights)
+    assert not os.path.exists(crawler.legacy_checkpoint_path)
+    resumed.start()
+    assert sorted(os.listdir(tmp_path / 'backfill')) == EXPECTED_FILES
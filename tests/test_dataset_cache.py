@@ -0,0 +1,141 @@
+# tests/test_dataset_cache.py
+# Iván Ontiveros - RetroVortex
+
+
+import os
+import json
+import shutil
+import numpy as np
+
+from conftest import TRAINING_ROUNDS
+from judgionLib import dataset_cache
+from judgionLib.dataset_cache import update_store, load_dataset, load_cache, cache_path
+from judgionLib.ingestion import parse_directory, list_round_files, mirror_rounds
+
+
+# This function copies the shipped training rounds to a new directory
+def copy_rounds(directory):
+    shutil.copytree(TRAINING_ROUNDS, directory)
+    return str(directory)
+
+
+# This function returns the rounds of the store of a directory by file name: name -> (stats, winner)
+def store_rounds(directory, stats, winners):
+    manifest, _, _ = load_cache(cache_path(directory))
+    assert len(manifest) == len(stats) == len(winners)
+    return {name: (stats[entry['row']].tolist(), int(winners[entry['row']])) for name, entry in manifest.items()}
+
+
+# This function parses the whole directory again, returning its rounds by file name: name -> (stats, winner)
+def parsed_rounds(directory):
+    stats, winners = parse_directory(directory)
+    return {os.path.basename(path): (row.tolist(), int(winner)) for path, row, winner in zip(list_round_files(directory), stats, winners)}
+
+
+# This function changes the modification time of a file, as saving it again without changes would
+def touch(path):
+    mtime = os.stat(path).st_mtime_ns + 1_000_000_000
+    os.utime(path, ns=(mtime, mtime))
+
+
+# This function changes the label of a round file
+def relabel(path, winner):
+    with open(path, 'r') as file:
+        data = json.load(file)
+    data['winner'] = winner
+    with open(path, 'w') as file:
+        json.dump(data, file)
+
+
+# This function counts the calls to the functions of the store that parse and hash files
+def count_calls(monkeypatch):
+    calls = {'parsed': [], 'hashed': []}
+    parse_rounds, file_hash = dataset_cache.parse_rounds, dataset_cache.file_hash
+    monkeypatch.setattr(dataset_cache, 'parse_rounds', lambda paths: calls['parsed'].extend(paths) or parse_rounds(paths))
+    monkeypatch.setattr(dataset_cache, 'file_hash', lambda path: calls['hashed'].append(path) or file_hash(path))
+    return calls
+
+
+def test_store_is_built_and_reused(tmp_path, monkeypatch):
+    directory = copy_rounds(tmp_path / 'rounds')
+
+    stats, winners, changes = update_store(directory)
+    assert changes == {'added': sorted(os.listdir(directory)), 'modified': [], 'removed': []}
+    assert store_rounds(directory, stats, winners) == parsed_rounds(directory)
+
+    # Without changes, no file is opened
+    calls = count_calls(monkeypatch)
+    stats, winners, changes = update_store(directory)
+    assert changes == {'added': [], 'modified': [], 'removed': []}
+    assert calls == {'parsed': [], 'hashed': []}
+    assert store_rounds(directory, stats, winners) == parsed_rounds(directory)
+
+
+def test_touched_files_are_hashed_but_not_parsed(tmp_path, monkeypatch):
+    directory = copy_rounds(tmp_path / 'rounds')
+    update_store(directory)
+    touch(os.path.join(directory, 'Theory_3.json'))
+
+    calls = count_calls(monkeypatch)
+    stats, winners, changes = update_store(directory)
+    assert changes == {'added': [], 'modified': [], 'removed': []}
+    assert [os.path.basename(path) for path in calls['hashed']] == ['Theory_3.json']
+    assert calls['parsed'] == []
+    assert store_rounds(directory, stats, winners) == parsed_rounds(directory)
+
+    # The new modification time is stored, so the file isn't hashed again
+    calls['hashed'].clear()
+    update_store(directory)
+    assert calls['hashed'] == []
+
+
+def test_added_modified_and_removed_files(tmp_path, monkeypatch):
+    directory = copy_rounds(tmp_path / 'rounds')
+    update_store(directory)
+
+    relabel(os.path.join(directory, 'Theory_5.json'), 3)
+    touch(os.path.join(directory, 'Theory_5.json'))
+    shutil.copy(os.path.join(directory, 'Theory_1.json'), os.path.join(directory, 'Theory_40.json'))
+    relabel(os.path.join(directory, 'Theory_40.json'), 0)
+    os.remove(os.path.join(directory, 'Theory_2.json'))
+    os.remove(os.path.join(directory, 'Theory_9.json'))
+
+    calls = count_calls(monkeypatch)
+    stats, winners, changes = update_store(directory)
+    assert changes == {'added': ['Theory_40.json'], 'modified': ['Theory_5.json'], 'removed': ['Theory_2.json', 'Theory_9.json']}
+    assert sorted(os.path.basename(path) for path in calls['parsed']) == ['Theory_40.json', 'Theory_5.json']
+
+    rounds = store_rounds(directory, stats, winners)
+    assert rounds == parsed_rounds(directory)
+    assert rounds['Theory_5.json'][1] == 3 and rounds['Theory_40.json'][1] == 0
+
+    # The updated store is saved: loading it again gives the same rounds without parsing anything
+    calls['parsed'].clear()
+    stats, winners, _ = update_store(directory)
+    assert calls['parsed'] == []
+    assert store_rounds(directory, stats, winners) == parsed_rounds(directory)
+
+
+def test_stores_of_other_formats_are_rebuilt(tmp_path, monkeypatch):
+    directory = copy_rounds(tmp_path / 'rounds')
+    update_store(directory)
+
+    monkeypatch.setattr(dataset_cache, 'CACHE_FORMAT', dataset_cache.CACHE_FORMAT + 1)
+    _, _, changes = update_store(directory)
+    assert len(changes['added']) == len(os.listdir(directory))
+
+
+def test_load_dataset_matches_the_parsed_directory(tmp_path):
+    directory = copy_rounds(tmp_path / 'rounds')
+    os.remove(os.path.join(directory, 'Theory_4.json'))
+    update_store(directory)
+    relabel(os.path.join(directory, 'Theory_6.json'), 2)
+    touch(os.path.join(directory, 'Theory_6.json'))
+
+    stats, winners = load_dataset(directory)
+    expected_stats, expected_winners = mirror_rounds(*parse_directory(directory))
+
+    # Same rounds (original and symmetric ones), maybe in another order
+    order = lambda s, w: sorted(zip(map(tuple, s.tolist()), w.tolist()))
+    assert order(stats, winners) == order(expected_stats, expected_winners)
+    assert stats.dtype == np.float32
@@ -0,0 +1,94 @@
+# tests/test_decisions.py
+# Iván Ontiveros - RetroVortex
+
+
+import itertools
+import numpy as np
+import pytest
+
+from judgionLib.decisions import ROUND_SCORES, scorecard, decision_type, decision_text, scorecard_probabilities, decision_probabilities
+
+
+# This function computes the probability of every official decision by going through every combination of the judges' scorecards
+def brute_force_probabilities(predictions):
+    predictions = np.asarray(predictions, dtype=np.float64)
+    predictions = predictions / predictions.sum(axis=2, keepdims=True)
+    num_judges, num_rounds, num_scores = predictions.shape
+
+    # Every possible scorecard of a judge (one score per round), with its result
+    cards = list(itertools.product(range(num_scores), repeat=num_rounds))
+    card_results = np.array([scorecard(np.eye(num_scores)[list(card)])[3] for card in cards])
+
+    # Probability of every scorecard for each judge, and of every combination of scorecards (judges are independent)
+    card_probabilities = [np.prod(predictions[judge, np.arange(num_rounds), np.array(cards)], axis=1) for judge in range(num_judges)]
+    joint = card_probabilities[0]
+    for judge_probabilities in card_probabilities[1:]:
+        joint = np.multiply.outer(joint, judge_probabilities)
+
+    # Result of every judge for every combination, and the number of scorecards won by each fighter
+    results = np.stack(np.meshgrid(*[card_results] * num_judges, indexing='ij'))
+    red_wins = (results == 1).sum(axis=0)
+    blue_wins = (results == 2).sum(axis=0)
+
+    probabilities = {}
+    for red, blue, probability in zip(red_wins.ravel(), blue_wins.ravel(), joint.ravel()):
+        outcome = decision_type(int(red), int(blue), num_judges - int(red) - int(blue))
+        probabilities[outcome] = probabilities.get(outcome, 0.0) + probability
+
+    return probabilities
+
+
+@pytest.mark.parametrize('num_judges, num_rounds', [(1, 1), (1, 4), (2, 3), (3, 1), (3, 2), (3, 3), (4, 2), (5, 1)])
+def test_decision_probabilities_match_brute_force(num_judges, num_rounds):
+    predictions = np.random.default_rng(num_judges * 10 + num_rounds).random((num_judges, num_rounds, 4))
+
+    exact = decision_probabilities(predictions)
+    expected = brute_force_probabilities(predictions)
+
+    # Outcomes that can't happen (f.e. draws in a 1-round fight) may be listed with a probability of 0
+    for outcome in set(exact) | set(expected):
+        assert exact.get(outcome, 0.0) == pytest.approx(expected.get(outcome, 0.0), abs=1e-12)
+    assert sum(exact.values()) == pytest.approx(1.0, abs=1e-12)
+
+
+def test_scorecard_probabilities_of_certain_predictions():
+    # Judge 1: 10-9 red in every round (red wins) ; Judge 2: 10-8 red, then 9-10 blue twice (28-28 draw) ; Judge 3: 10-9, 9-10, 10-9 (red wins)
+    predictions = np.eye(4)[[[1, 1, 1], [0, 2, 2], [1, 2, 1]]]
+
+    np.testing.assert_allclose(scorecard_probabilities(predictions), [[0, 1, 0], [1, 0, 0], [0, 1, 0]])
+    assert decision_probabilities(predictions)[('Majority Decision', 1)] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize('red_wins, blue_wins, draws, expected', [
+    (3, 0, 0, ('Unanimous Decision', 1)),
+    (0, 3, 0, ('Unanimous Decision', 2)),
+    (2, 1, 0, ('Split Decision', 1)),
+    (1, 2, 0, ('Split Decision', 2)),
+    (2, 0, 1, ('Majority Decision', 1)),
+    (0, 2, 1, ('Majority Decision', 2)),
+    (1, 0, 2, ('Majority Draw', 0)),
+    (0, 1, 2, ('Majority Draw', 0)),
+    (1, 1, 1, ('Split Draw', 0)),
+    (0, 0, 3, ('Unanimous Draw', 0)),
+    (1, 1, 0, ('Split Draw', 0)),
+    (2, 2, 1, ('Split Draw', 0)),
+    (3, 2, 0, ('Split Decision', 1)),
+    (3, 1, 1, ('Split Decision', 1)),
+    (1, 3, 1, ('Split Decision', 2)),
+    (3, 2, 1, ('Split Decision', 1)),
+    (2, 3, 1, ('Split Decision', 2)),
+    (3, 3, 1, ('Split Draw', 0)),
+    (2, 1, 2, ('Split Draw', 0)),
+    (1, 2, 3, ('Split Draw', 0)),
+])
+def test_decision_type(red_wins, blue_wins, draws, expected):
+    assert decision_type(red_wins, blue_wins, draws) == expected
+
+
+def test_scorecard_and_decision_text():
+    rounds, red_score, blue_score, result = scorecard(np.eye(4)[[0, 2, 2]])
+
+    assert rounds == [ROUND_SCORES[0], ROUND_SCORES[2], ROUND_SCORES[2]]
+    assert (red_score, blue_score, result) == (28, 28, 0)
+    assert decision_text([1, 1, 0], 'Red', 'Blue') == 'Winner by Majority Decision: Red'
+    assert decision_text([1, 2, 0], 'Red', 'Blue') == 'Split Draw'
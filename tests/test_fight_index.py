@@ -0,0 +1,84 @@
+# tests/test_fight_index.py
+# Iván Ontiveros - RetroVortex
+
+
+import os
+import json
+import shutil
+
+from conftest import TEST_ROUNDS
+from judgionLib.fight_index import FIGHT_INDEX, split_round_name
+from judgionLib.shards import pack_directory
+
+
+# This function copies the shipped test rounds to a new directory
+def copy_rounds(directory):
+    shutil.copytree(TEST_ROUNDS, directory)
+    return str(directory)
+
+
+# This function changes the modification time of a directory, as a later change by another program would
+def touch_directory(directory):
+    signature = os.stat(directory).st_mtime_ns + 1_000_000_000
+    os.utime(directory, ns=(signature, signature))
+
+
+def test_split_round_name():
+    assert split_round_name('Jones_Reyes_R12.json') == ('Jones_Reyes', 12)
+    assert split_round_name('Rodriguez_Rountree_R3.json') == ('Rodriguez_Rountree', 3)
+    assert split_round_name('Theory_7.json') == (None, None)
+    assert split_round_name('index.json.tmp') == (None, None)
+
+
+def test_rounds_are_sorted_by_number(tmp_path):
+    directory = copy_rounds(tmp_path / 'rounds')
+    for number in (10, 11):
+        shutil.copy(os.path.join(directory, 'Usman_Chimaev_R1.json'), os.path.join(directory, f'Usman_Chimaev_R{number}.json'))
+
+    index = FIGHT_INDEX(directory)
+
+    assert index.fight_ids() == ['Jones_Reyes', 'St-Pierre_Hendricks', 'Usman_Chimaev']
+    assert index.rounds('Usman_Chimaev') == [f'Usman_Chimaev_R{n}.json' for n in (1, 2, 3, 10, 11)]
+    assert index.max_round('Usman_Chimaev') == 11
+    assert index.max_round('Unknown_Fight') == 0
+    assert index.rounds('Unknown_Fight') == []
+
+
+def test_saved_index_is_reused_and_refreshed(tmp_path):
+    directory = copy_rounds(tmp_path / 'rounds')
+    FIGHT_INDEX(directory)
+
+    # A new instance loads the saved index without scanning the directory
+    index = FIGHT_INDEX(directory)
+    assert index.max_round('Jones_Reyes') == 5
+
+    # Files added or removed by other programs are found on the next query
+    shutil.copy(os.path.join(directory, 'Jones_Reyes_R1.json'), os.path.join(directory, 'Jones_Reyes_R6.json'))
+    os.remove(os.path.join(directory, 'Usman_Chimaev_R3.json'))
+    touch_directory(directory)
+
+    assert index.max_round('Jones_Reyes') == 6
+    assert index.rounds('Usman_Chimaev') == ['Usman_Chimaev_R1.json', 'Usman_Chimaev_R2.json']
+
+
+def test_written_rounds_are_indexed(tmp_path):
+    directory = copy_rounds(tmp_path / 'rounds')
+    index = FIGHT_INDEX(directory)
+
+    with open(os.path.join(directory, 'Usman_Chimaev_R1.json'), 'r') as file:
+        data = json.load(file)
+    index.write_round('Usman_Chimaev_R4.json', data)
+
+    assert index.rounds('Usman_Chimaev')[-1] == 'Usman_Chimaev_R4.json'
+    assert FIGHT_INDEX(directory).max_round('Usman_Chimaev') == 4
+
+
+def test_packed_datasets_are_indexed(tmp_path):
+    pack_directory(TEST_ROUNDS, str(tmp_path / 'packed'))
+    index = FIGHT_INDEX(str(tmp_path / 'packed'))
+
+    assert index.max_round('St-Pierre_Hendricks') == 5
+
+    with open(os.path.join(TEST_ROUNDS, 'Jones_Reyes_R1.json'), 'r') as file:
+        index.write_round('Jones_Reyes_R6.json', json.load(file))
+    assert index.rounds('Jones_Reyes')[-1] == 'Jones_Reyes_R6.json'
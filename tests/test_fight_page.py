@@ -0,0 +1,100 @@
+# tests/test_fight_page.py
+# Iván Ontiveros - RetroVortex
+
+
+import os
+import json
+import pytest
+from bs4 import BeautifulSoup
+
+from conftest import FIGHT_PAGES
+from judgionLib.fight_page import parse_fight_page, round_data, fight_method, PARSER_BACKENDS
+
+
+# Fight pages saved as fixtures, and the rounds expected from each of them (same name, '.json')
+PAGE_NAMES = sorted(filename[:-len('.html')] for filename in os.listdir(FIGHT_PAGES) if filename.endswith('.html'))
+
+
+# This function returns the HTML code of a fixture page and its expected rounds
+def load_fixture(name):
+    with open(os.path.join(FIGHT_PAGES, f'{name}.html'), 'r', encoding='utf-8') as file:
+        html = file.read()
+    with open(os.path.join(FIGHT_PAGES, f'{name}.json'), 'r') as file:
+        return html, json.load(file)
+
+
+# Original parser of the scraper: the stats are found by their position among all the table texts of the page
+def legacy_rounds(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    rounds_num = int(soup.select('i.b-fight-details__text-item')[0].text.strip()[-1])
+    stats = [p.text.strip() for p in soup.select('p.b-fight-details__table-text')]
+
+    split = lambda text: tuple(map(int, text.split(' of ')))
+    seconds = lambda text: 60 * int(text.split(':')[0]) + int(text.split(':')[1])
+
+    # Position of the first stat of every round: totals table, then significant strikes table
+    starting_points = [22, (22 + 17) + (rounds_num - 1) * 20 + 21]
+    for i in range(2, rounds_num * 2, 2):
+        starting_points.append(starting_points[i - 2] + 20)
+        starting_points.append(starting_points[i - 1] + 18)
+
+    rounds = []
+    for j in range(1, rounds_num * 2, 2):
+        global_sp, sigstrikes_sp = starting_points[j - 1], starting_points[j]
+        data = {}
+        for corner, side, name in (('red_fighter', 0, stats[0]), ('blue_fighter', 1, stats[1])):
+            sigstrikes = {}
+            for offset, key in ((4, 'head'), (6, 'body'), (8, 'leg'), (0, 'total'), (10, 'distance'), (12, 'clinch'), (14, 'ground')):
+                landed, attempted = split(stats[sigstrikes_sp + offset + side])
+                sigstrikes[f'{key}_attempted'] = attempted
+                sigstrikes[f'{key}_landed'] = landed
+            strikes_landed, strikes_attempted = split(stats[global_sp + 6 + side])
+            takedowns_landed, takedowns_attempted = split(stats[global_sp + 8 + side])
+            data[corner] = {
+                'name': name,
+                'knockdowns': int(stats[global_sp + side]),
+                'cuts': 0,
+                'sigstrikes': sigstrikes,
+                'strikes': {'attempted': strikes_attempted, 'landed': strikes_landed},
+                'takedowns': {'attempted': takedowns_attempted, 'landed': takedowns_landed},
+                'sub_attempts': int(stats[global_sp + 12 + side]),
+                'reversals': int(stats[global_sp + 14 + side]),
+                'control_seconds': seconds(stats[global_sp + 16 + side]),
+            }
+        data['winner'] = 0
+        rounds.append(data)
+
+    return rounds
+
+
+@pytest.mark.parametrize('backend', list(PARSER_BACKENDS))
+@pytest.mark.parametrize('name', PAGE_NAMES)
+def test_fixture_pages_give_the_expected_rounds(name, backend):
+    html, expected = load_fixture(name)
+
+    page = parse_fight_page(html, backend)
+    rounds = [round_data(page.red_fighter, page.blue_fighter, stats) for stats in page.stats]
+
+    # Same content and same key order as the files written by the original scraper
+    assert json.dumps(rounds) == json.dumps(legacy_rounds(html))
+    assert rounds == expected
+
+
+@pytest.mark.parametrize('name', PAGE_NAMES)
+def test_fight_method(name):
+    html, _ = load_fixture(name)
+    assert fight_method(html).startswith(('Decision', 'KO/TKO', 'Submission'))
+    assert fight_method('<html></html>') is None
+
+
+@pytest.mark.parametrize('backend', list(PARSER_BACKENDS))
+def test_pages_without_round_stats_are_rejected(backend):
+    html, _ = load_fixture(PAGE_NAMES[0])
+
+    with pytest.raises(ValueError):
+        parse_fight_page('<html><body><p>Page not found</p></body></html>', backend)
+
+    # Fight still in progress: the significant strikes of the last round aren't published yet
+    truncated = html[:html.rindex('<thead class="b-fight-details__table-row b-fight-details__table-row_type_head">')] + '</table></body></html>'
+    with pytest.raises(ValueError):
+        parse_fight_page(truncated, backend)
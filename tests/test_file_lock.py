@@ -0,0 +1,90 @@
+# tests/test_file_lock.py
+# Iván Ontiveros - RetroVortex
+
+
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+from conftest import REPO_ROOT, TEST_ROUNDS
+from judgionLib.file_lock import FILE_LOCK
+
+
+# Process that takes the lock, says so, and holds it until it's killed
+HOLDER_SCRIPT = '''
+import sys, time
+from judgionLib.file_lock import FILE_LOCK
+lock = FILE_LOCK(sys.argv[1])
+lock.acquire()
+print('locked', flush=True)
+time.sleep(60)
+'''
+
+# Process that writes the same fight several times to a round directory (as parallel scrapers of rematches would)
+WRITER_SCRIPT = '''
+import sys, json
+from judgionLib.fight_index import fight_index
+with open(sys.argv[2], 'r') as file:
+    data = json.load(file)
+index = fight_index(sys.argv[1])
+for _ in range(int(sys.argv[3])):
+    index.write_fight('Jones_Reyes', [data, data], 'append')
+'''
+
+
+# This function starts a Python process that runs a script with the repository importable, from the current directory
+def start_script(script, *args, **kwargs):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    return subprocess.Popen([sys.executable, '-c', script, *map(str, args)], env=env, **kwargs)
+
+
+def test_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / 'dir.lock')
+    with FILE_LOCK(path):
+        # Another holder (even in the same process) has to wait, and gives up after the timeout
+        with pytest.raises(TimeoutError):
+            FILE_LOCK(path, timeout=0.05).acquire()
+
+        # Releasing a lock that wasn't taken doesn't release the one of the holder
+        FILE_LOCK(path).release()
+        with pytest.raises(TimeoutError):
+            FILE_LOCK(path, timeout=0.05).acquire()
+
+    # The lock file is kept, and the lock can be taken again
+    assert os.path.exists(path)
+    with FILE_LOCK(path, timeout=0.05):
+        pass
+
+
+def test_lock_of_a_killed_process_is_released(tmp_path):
+    path = str(tmp_path / 'dir.lock')
+    holder = start_script(HOLDER_SCRIPT, path, stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline().strip() == 'locked'
+        with pytest.raises(TimeoutError):
+            FILE_LOCK(path, timeout=0.05).acquire()
+    finally:
+        holder.kill()
+        holder.wait()
+        holder.stdout.close()
+
+    # The operating system releases the lock of the dead process, with no waiting for it to look abandoned
+    with FILE_LOCK(path, timeout=1):
+        pass
+
+
+def test_parallel_processes_get_different_round_numbers(tmp_path):
+    directory = tmp_path / 'rounds'
+    os.makedirs(directory)
+    processes_num, fights_num = 4, 5
+
+    writers = [start_script(WRITER_SCRIPT, directory, os.path.join(TEST_ROUNDS, 'Jones_Reyes_R1.json'), fights_num)
+               for _ in range(processes_num)]
+    assert [writer.wait(timeout=120) for writer in writers] == [0] * processes_num
+
+    rounds_num = processes_num * fights_num * 2
+    assert sorted(os.listdir(directory)) == sorted(f'Jones_Reyes_R{n}.json' for n in range(1, rounds_num + 1))
+    with open(directory / f'Jones_Reyes_R{rounds_num}.json', 'r') as file:
+        assert 'red_fighter' in json.load(file)
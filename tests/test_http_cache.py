@@ -0,0 +1,106 @@
+# tests/test_http_cache.py
+# Iván Ontiveros - RetroVortex
+
+
+import os
+import json
+import shutil
+import pytest
+
+from conftest import FIGHT_PAGES, TEST_ROUNDS, LAST_MODIFIED
+from judgionLib.http_cache import HTTP_CACHE
+from judgionLib.constants import BACKFILL_DIRECTORY
+from json_generator import replay_cache
+
+
+def test_unchanged_pages_are_revalidated(fixture_server):
+    cache = HTTP_CACHE()
+    url = f'{fixture_server.base_url}/fight-details/Jones_Reyes'
+
+    first = cache.get(url)
+    assert first.status_code == 200 and not first.from_cache
+
+    # The server answers the conditional request with a 304, and the stored page is returned
+    second = cache.get(url)
+    assert second.status_code == 200 and second.from_cache
+    assert second.text == first.text
+    assert fixture_server.not_modified == ['/fight-details/Jones_Reyes']
+
+
+def test_changed_pages_are_downloaded_again(fixture_server):
+    cache = HTTP_CACHE()
+    url = f'{fixture_server.base_url}/changing-page'
+
+    fixture_server.pages['/changing-page'] = b'<html>first version</html>'
+    assert cache.get(url).text == '<html>first version</html>'
+
+    fixture_server.pages['/changing-page'] = b'<html>second version</html>'
+    page = cache.get(url)
+    assert page.text == '<html>second version</html>' and not page.from_cache
+    assert fixture_server.not_modified == []
+
+    # The new version replaces the old one in the cache
+    assert cache.read(url)[1] == '<html>second version</html>'
+
+
+def test_pages_without_etag_are_revalidated_by_date(fixture_server):
+    cache = HTTP_CACHE()
+    url = f'{fixture_server.base_url}/fight-details/Usman_Chimaev'
+    with open(os.path.join(FIGHT_PAGES, 'Usman_Chimaev.html'), 'r', encoding='utf-8') as file:
+        html = file.read()
+    cache.write(url, html, {'Last-Modified': LAST_MODIFIED})
+
+    page = cache.get(url)
+    assert page.from_cache and page.text == html
+    assert fixture_server.not_modified == ['/fight-details/Usman_Chimaev']
+
+
+def test_offline_mode_only_reads_the_cache(fixture_server):
+    url = f'{fixture_server.base_url}/fight-details/Jones_Reyes'
+
+    # Missing pages are reported with a 504, without any request
+    page = HTTP_CACHE(offline=True).get(url)
+    assert (page.status_code, page.text, page.from_cache) == (504, '', False)
+    assert fixture_server.requests == []
+
+    html = HTTP_CACHE().get(url).text
+    page = HTTP_CACHE(offline=True).get(url)
+    assert (page.status_code, page.text, page.from_cache) == (200, html, True)
+    assert fixture_server.requests == ['/fight-details/Jones_Reyes']
+
+
+def test_replay_generates_unlabeled_rounds(tmp_path, fixture_server):
+    cache = HTTP_CACHE()
+
+    # A fight that went to decision, a fight finished in the fifth round, a fight finished in the first one, and a fight already labeled
+    with open(os.path.join(FIGHT_PAGES, 'St-Pierre_Hendricks.html'), 'rb') as file:
+        fixture_server.pages['/fight-details/finished'] = file.read().replace(b'Decision - Split', b'KO/TKO')
+    for name in ('Usman_Chimaev', 'finished', 'Fixture_Fixture', 'Jones_Reyes'):
+        assert cache.get(f'{fixture_server.base_url}/fight-details/{name}').status_code == 200
+
+    os.makedirs(BACKFILL_DIRECTORY)
+    shutil.copy(os.path.join(TEST_ROUNDS, 'Jones_Reyes_R1.json'), os.path.join(BACKFILL_DIRECTORY, 'Jones_Reyes_R1.json'))
+    with open(os.path.join(BACKFILL_DIRECTORY, 'Jones_Reyes_R1.json'), 'r') as file:
+        labeled = json.load(file)
+
+    requests_num = len(fixture_server.requests)
+    replay_cache()
+
+    assert len(fixture_server.requests) == requests_num
+    assert sorted(os.listdir(BACKFILL_DIRECTORY)) == sorted(['Jones_Reyes_R1.json'] + [f'St-Pierre_Hendricks_R{n}.json' for n in range(1, 5)] +
+                                                            [f'Usman_Chimaev_R{n}.json' for n in range(1, 4)])
+
+    # The labeled round is kept as it was, and the new ones aren't labeled
+    for filename in os.listdir(BACKFILL_DIRECTORY):
+        with open(os.path.join(BACKFILL_DIRECTORY, filename), 'r') as file:
+            data = json.load(file)
+        assert data == labeled if filename == 'Jones_Reyes_R1.json' else data['winner'] is None
+
+    # Replaying again doesn't change anything
+    replay_cache()
+    assert len(os.listdir(BACKFILL_DIRECTORY)) == 8
+
+
+def test_replay_rejects_the_ask_policy():
+    with pytest.raises(ValueError):
+        replay_cache(policy='ask')
@@ -0,0 +1,103 @@
+# tests/test_ingestion.py
+# Iván Ontiveros - RetroVortex
+
+
+import os
+import json
+import shutil
+import numpy as np
+import pytest
+
+from conftest import TEST_ROUNDS, TRAINING_ROUNDS
+from judgionLib.ingestion import parse_directory, parse_rounds, mirror_rounds, STATS_PER_FIGHTER
+from judgionLib.utils import stats_getter, parallel_winner
+
+
+# Original version of 'stats_extractor': the numbers of a dictionary, in the order of its keys
+def legacy_stats_extractor(data):
+    numbers = []
+    for value in data.values():
+        if isinstance(value, dict):
+            numbers.extend(legacy_stats_extractor(value))
+        elif isinstance(value, (int, float)):
+            numbers.append(value)
+    return numbers
+
+
+# Original version of 'stats_getter', kept to check that the compiled layout gives the same matrices
+def legacy_stats_getter(directory):
+    stats = []
+    winners = []
+    for filename in os.listdir(directory):
+        if filename.endswith('.json'):
+            with open(os.path.join(directory, filename), 'r') as file:
+                data = json.load(file)
+            red = legacy_stats_extractor(data['red_fighter'])
+            blue = legacy_stats_extractor(data['blue_fighter'])
+            stats.append(red + blue)
+            winners.append(data['winner'])
+            stats.append(blue + red)
+            winners.append(parallel_winner(data['winner']))
+    return stats, winners
+
+
+def test_stats_getter_matches_legacy_parser():
+    stats, winners = stats_getter(TRAINING_ROUNDS)
+    legacy_stats, legacy_winners = legacy_stats_getter(TRAINING_ROUNDS)
+
+    assert stats.dtype == np.float32
+    assert stats.shape == (len(legacy_stats), 2 * STATS_PER_FIGHTER)
+    np.testing.assert_array_equal(stats, np.array(legacy_stats, dtype=np.float32))
+    np.testing.assert_array_equal(winners, legacy_winners)
+
+
+def test_parsing_doesnt_depend_on_the_key_order(tmp_path):
+    names = sorted(os.listdir(TRAINING_ROUNDS))[:5]
+    for name in names:
+        with open(os.path.join(TRAINING_ROUNDS, name), 'r') as file:
+            data = json.load(file)
+        for corner in ('red_fighter', 'blue_fighter'):
+            data[corner] = dict(reversed(list(data[corner].items())))
+        with open(tmp_path / name, 'w') as file:
+            json.dump(data, file)
+
+    reordered, _ = parse_rounds([str(tmp_path / name) for name in names])
+    original, _ = parse_rounds([os.path.join(TRAINING_ROUNDS, name) for name in names])
+    np.testing.assert_array_equal(reordered, original)
+
+
+def test_invalid_round_reports_the_file(tmp_path):
+    shutil.copy(os.path.join(TEST_ROUNDS, 'Jones_Reyes_R1.json'), tmp_path / 'Broken_R1.json')
+    with open(tmp_path / 'Broken_R1.json', 'r') as file:
+        data = json.load(file)
+    del data['red_fighter']['reversals']
+    data['winner'] = 1
+    with open(tmp_path / 'Broken_R1.json', 'w') as file:
+        json.dump(data, file)
+
+    with pytest.raises(ValueError, match='Broken_R1.json'):
+        parse_directory(str(tmp_path))
+
+
+@pytest.mark.parametrize('winner, message', [(None, "isn't labeled"), (4, 'invalid winner'), (True, 'invalid winner'), ('1', 'invalid winner')])
+def test_unlabeled_rounds_are_rejected(tmp_path, winner, message):
+    with open(os.path.join(TEST_ROUNDS, 'Jones_Reyes_R1.json'), 'r') as file:
+        data = json.load(file)
+    data['winner'] = winner
+    with open(tmp_path / 'Unlabeled_R1.json', 'w') as file:
+        json.dump(data, file)
+
+    with pytest.raises(ValueError, match=message):
+        parse_directory(str(tmp_path))
+
+
+def test_mirror_rounds_swaps_fighters_and_labels():
+    stats = np.arange(2 * 2 * STATS_PER_FIGHTER, dtype=np.float32).reshape(2, -1)
+    winners = np.array([0, 2])
+
+    full_stats, full_winners = mirror_rounds(stats, winners)
+
+    np.testing.assert_array_equal(full_stats[0::2], stats)
+    np.testing.assert_array_equal(full_stats[1, :STATS_PER_FIGHTER], stats[0, STATS_PER_FIGHTER:])
+    np.testing.assert_array_equal(full_stats[1, STATS_PER_FIGHTER:], stats[0, :STATS_PER_FIGHTER])
+    assert list(full_winners) == [0, parallel_winner(0), 2, parallel_winner(2)]
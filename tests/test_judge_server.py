@@ -0,0 +1,178 @@
+# tests/test_judge_server.py
+# Iván Ontiveros - RetroVortex
+
+
+import os
+import json
+import threading
+import urllib.request
+import urllib.error
+import numpy as np
+import pytest
+from http.server import ThreadingHTTPServer
+
+from conftest import TEST_ROUNDS
+from judge_panel import JUDGE_PANEL
+from judge_server import MICRO_BATCHER, SCORING_SERVICE, make_handler
+
+
+class STUB_JUDGE:
+
+    def __init__(self, name, model):
+        self.judge_name = name
+
+        # Shared object that stands for the loaded model (judges with the same one are grouped by the service)
+        self.judge_model = model
+        self.norm_factors = None
+
+        # Rounds received by every call to 'predict_rounds'
+        self.calls = []
+        self.lock = threading.Lock()
+
+
+    # Probabilities that depend on the stats of every round, so each request can check it got its own rows
+    def predict_rounds(self, input_data):
+        with self.lock:
+            self.calls.append(len(input_data))
+        scores = np.asarray(input_data, dtype=np.float32)[:, [3, 9, 26, 32]] + 1
+        return scores / scores.sum(axis=1, keepdims=True)
+
+
+# This function returns the rounds of a fight of the test directory, in the JSON schema of the round files
+def fight_rounds(fight_id):
+    names = sorted(name for name in os.listdir(TEST_ROUNDS) if name.startswith(fight_id + '_R'))
+    rounds = []
+    for name in names:
+        with open(os.path.join(TEST_ROUNDS, name), 'r') as file:
+            rounds.append(json.load(file))
+    return rounds
+
+
+FIGHTS = ['Jones_Reyes', 'St-Pierre_Hendricks', 'Usman_Chimaev']
+
+
+def test_requests_are_merged_and_split_back():
+    judge = STUB_JUDGE('judge', object())
+    batcher = MICRO_BATCHER(judge, window=0.3)
+    requests = [np.full((rows, 46), value, dtype=np.float32) for rows, value in ((2, 1.0), (3, 5.0), (1, 9.0))]
+
+    futures = [batcher.submit(input_data) for input_data in requests]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert judge.calls == [6]
+    for input_data, result in zip(requests, results):
+        np.testing.assert_allclose(result, judge.predict_rounds(input_data))
+
+
+def test_batches_are_limited_in_size():
+    judge = STUB_JUDGE('judge', object())
+    batcher = MICRO_BATCHER(judge, window=0.2, max_rows=4)
+
+    futures = [batcher.submit(np.zeros((3, 46), dtype=np.float32)) for _ in range(3)]
+    assert [len(future.result(timeout=5)) for future in futures] == [3, 3, 3]
+    assert judge.calls == [6, 3]
+
+
+def test_prediction_errors_reach_every_request():
+    class FAILING_JUDGE(STUB_JUDGE):
+        def predict_rounds(self, input_data):
+            raise RuntimeError('model failed')
+
+    batcher = MICRO_BATCHER(FAILING_JUDGE('judge', object()), window=0.2)
+    futures = [batcher.submit(np.zeros((1, 46), dtype=np.float32)) for _ in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match='model failed'):
+            future.result(timeout=5)
+
+
+# Scoring service with three stub judges (the first two share their model), with a long batching window
+@pytest.fixture
+def service_url():
+    shared_model = object()
+    judges = [STUB_JUDGE('Judge A', shared_model), STUB_JUDGE('Judge B', shared_model), STUB_JUDGE('Judge C', object())]
+    service = SCORING_SERVICE(JUDGE_PANEL(judges))
+    distinct_judges, _ = service.panel.model_groups()
+    service.batchers = [MICRO_BATCHER(judge, window=0.3) for judge in distinct_judges]
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(service))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}', judges
+    server.shutdown()
+    server.server_close()
+
+
+# This function sends a request to the service, returning the status code and the JSON response
+def post(url, body):
+    request = urllib.request.Request(url, data=body if isinstance(body, bytes) else json.dumps(body).encode('utf-8'), method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_concurrent_fights_are_scored_with_one_call_per_model(service_url):
+    url, judges = service_url
+    responses = {}
+    barrier = threading.Barrier(len(FIGHTS))
+
+    def send(fight_id):
+        barrier.wait()
+        responses[fight_id] = post(f'{url}/score', {'rounds': fight_rounds(fight_id)})
+
+    threads = [threading.Thread(target=send, args=(fight_id,)) for fight_id in FIGHTS]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # One prediction call per model (the first two judges share one) with the rounds of the three fights
+    total_rounds = sum(len(fight_rounds(fight_id)) for fight_id in FIGHTS)
+    assert (judges[0].calls, judges[1].calls, judges[2].calls) == ([total_rounds], [], [total_rounds])
+
+    # Every response has the scorecards of its own fight
+    for fight_id in FIGHTS:
+        status, content = responses[fight_id]
+        rounds = fight_rounds(fight_id)
+        assert status == 200 and len(content['fights']) == 1
+        fight = content['fights'][0]
+        assert (fight['red_fighter'], fight['blue_fighter']) == (rounds[0]['red_fighter']['name'], rounds[0]['blue_fighter']['name'])
+
+        landed = lambda fighter: [fighter['sigstrikes']['head_landed'], fighter['sigstrikes']['total_landed']]
+        input_data = np.array([landed(data['red_fighter']) + landed(data['blue_fighter']) for data in rounds], dtype=np.float32) + 1
+        expected = input_data / input_data.sum(axis=1, keepdims=True)
+        for judge in fight['judges']:
+            assert [r['round'] for r in judge['rounds']] == list(range(1, len(rounds) + 1))
+            np.testing.assert_allclose([r['probabilities'] for r in judge['rounds']], expected, rtol=1e-6)
+
+
+def test_whole_cards_are_scored_in_one_request(service_url):
+    url, _ = service_url
+    status, content = post(f'{url}/score', {'fights': [{'rounds': fight_rounds(fight_id)} for fight_id in FIGHTS]})
+
+    assert status == 200
+    assert [fight['red_fighter'] for fight in content['fights']] == [fight_rounds(fight_id)[0]['red_fighter']['name'] for fight_id in FIGHTS]
+
+
+@pytest.mark.parametrize('body', [b'{not json', {'round': []}, {'rounds': []}, {'fights': [{'rounds': []}]}, {'rounds': [{'red_fighter': {}}]},
+                                  'bad stat'])
+def test_invalid_requests_get_a_400(service_url, body):
+    url, judges = service_url
+    if body == 'bad stat':
+        rounds = fight_rounds('Jones_Reyes')
+        rounds[0]['red_fighter']['knockdowns'] = 'many'
+        body = {'rounds': rounds}
+
+    status, content = post(f'{url}/score', body)
+
+    assert status == 400
+    assert content['error'].startswith('Invalid request')
+    assert all(judge.calls == [] for judge in judges)
+
+
+def test_unknown_paths_get_a_404(service_url):
+    url, _ = service_url
+    assert post(f'{url}/other', {'rounds': []})[0] == 404
+    with urllib.request.urlopen(f'{url}/judges', timeout=10) as response:
+        assert json.load(response) == {'judges': ['Judge A', 'Judge B', 'Judge C']}
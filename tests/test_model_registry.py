@@ -0,0 +1,106 @@
+# tests/test_model_registry.py
+# Iván Ontiveros - RetroVortex
+
+
+import os
+import threading
+import numpy as np
+import pytest
+
+from judgionLib.model_registry import MODEL_REGISTRY
+
+
+# This function creates a model file (its content doesn't matter, the loaders of the tests don't read it)
+def model_file(directory, name):
+    path = str(directory / name)
+    with open(path, 'wb') as file:
+        file.write(b'model')
+    return path
+
+
+class SLOW_LOADER:
+
+    def __init__(self):
+        # Paths received by every call, and event that lets the loading of the slow models finish
+        self.calls = []
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def __call__(self, path):
+        self.calls.append(os.path.basename(path))
+        if 'slow' in path:
+            self.started.set()
+            assert self.release.wait(timeout=10)
+        return f'model of {os.path.basename(path)}'
+
+
+def test_loading_a_model_doesnt_block_the_others(tmp_path):
+    registry = MODEL_REGISTRY()
+    loader = SLOW_LOADER()
+    slow_path, fast_path = model_file(tmp_path, 'slow.h5'), model_file(tmp_path, 'fast.h5')
+
+    results = {}
+    thread = threading.Thread(target=lambda: results.setdefault('slow', registry.get(slow_path, loader)))
+    thread.start()
+    assert loader.started.wait(timeout=10)
+
+    # While the slow model is being loaded, other models are loaded and found
+    assert registry.get(fast_path, loader) == ('model of fast.h5', None)
+    assert registry.get(fast_path, loader) == ('model of fast.h5', None)
+
+    loader.release.set()
+    thread.join(timeout=10)
+    assert results['slow'] == ('model of slow.h5', None)
+    assert loader.calls == ['slow.h5', 'fast.h5']
+
+
+def test_a_model_is_loaded_once_by_concurrent_judges(tmp_path):
+    registry = MODEL_REGISTRY()
+    loader = SLOW_LOADER()
+    path = model_file(tmp_path, 'slow.h5')
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get(path, loader))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert loader.started.wait(timeout=10)
+    loader.release.set()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert loader.calls == ['slow.h5']
+    assert len(results) == 4 and all(result[0] is results[0][0] for result in results)
+
+
+def test_failed_loads_are_tried_again(tmp_path):
+    registry = MODEL_REGISTRY()
+    path = model_file(tmp_path, 'judge.h5')
+
+    def failing_loader(path):
+        raise OSError('corrupted model')
+
+    with pytest.raises(OSError, match='corrupted model'):
+        registry.get(path, failing_loader)
+    assert registry.get(path, lambda path: 'model') == ('model', None)
+
+
+def test_models_are_reloaded_when_they_change(tmp_path):
+    registry = MODEL_REGISTRY(max_size=2)
+    loader = SLOW_LOADER()
+    path = model_file(tmp_path, 'judge.h5')
+    np.save(str(tmp_path / 'judge.npy'), np.arange(46, dtype=np.float64))
+
+    model, norm_factors = registry.get(path, loader)
+    np.testing.assert_array_equal(norm_factors, np.arange(46))
+
+    # A retrained model replaces the old version
+    mtime = os.stat(path).st_mtime_ns + 1_000_000_000
+    os.utime(path, ns=(mtime, mtime))
+    registry.get(path, loader)
+    assert loader.calls == ['judge.h5', 'judge.h5']
+    assert len(registry.models) == 1
+
+    # The least recently used model is dropped when the registry is full
+    for name in ('a.h5', 'b.h5'):
+        registry.get(model_file(tmp_path, name), loader)
+    assert [os.path.basename(key[0]) for key in registry.models] == ['a.h5', 'b.h5']
@@ -0,0 +1,144 @@
+# tests/test_numpy_runtime.py
+# Iván Ontiveros - RetroVortex
+
+
+import json
+import math
+import numpy as np
+import pytest
+
+from round_judge import AI_JUDGE
+from judgionLib.numpy_runtime import NUMPY_JUDGE, ACTIVATIONS, from_keras, erf
+
+
+# Weights of a small judge: diagonal layer (46 stats), dense layer with 'selu' (46 -> 3) and output layer with 'softmax' (3 -> 4)
+RNG = np.random.default_rng(0)
+DIAG = RNG.uniform(0.5, 1.5, 46).astype(np.float32)
+DIAG_BIAS = RNG.uniform(-0.1, 0.1, 46).astype(np.float32)
+HIDDEN_KERNEL = RNG.normal(0, 0.2, (46, 3)).astype(np.float32)
+HIDDEN_BIAS = RNG.normal(0, 0.1, 3).astype(np.float32)
+OUTPUT_KERNEL = RNG.normal(0, 1.0, (3, 4)).astype(np.float32)
+OUTPUT_BIAS = RNG.normal(0, 0.1, 4).astype(np.float32)
+NORM_FACTORS = RNG.uniform(1, 100, 46)
+
+
+# This function writes the exported judge by hand, with the layout of 'NUMPY_JUDGE.save'
+def write_export(path, norm_factors=None):
+    spec = [{'kind': 'diagonal', 'activation': 'linear', 'weights': 2}, {'kind': 'dense', 'activation': 'selu', 'weights': 2},
+            {'kind': 'dense', 'activation': 'softmax', 'weights': 2}]
+    arrays = {'layer0_w0': DIAG, 'layer0_w1': DIAG_BIAS, 'layer1_w0': HIDDEN_KERNEL, 'layer1_w1': HIDDEN_BIAS,
+              'layer2_w0': OUTPUT_KERNEL, 'layer2_w1': OUTPUT_BIAS}
+    if norm_factors is not None:
+        arrays['norm_factors'] = norm_factors
+    np.savez(path, layers=np.array(json.dumps(spec)), **arrays)
+
+
+# Forward pass of the same judge, one value at a time
+def hand_forward(row):
+    x = [float(row[i]) * float(DIAG[i]) + float(DIAG_BIAS[i]) for i in range(46)]
+
+    hidden = []
+    for j in range(3):
+        z = sum(x[i] * float(HIDDEN_KERNEL[i, j]) for i in range(46)) + float(HIDDEN_BIAS[j])
+        hidden.append(1.0507009873554805 * (z if z > 0 else 1.6732632423543772 * (math.exp(z) - 1)))
+
+    logits = [sum(hidden[j] * float(OUTPUT_KERNEL[j, k]) for j in range(3)) + float(OUTPUT_BIAS[k]) for k in range(4)]
+    exps = [math.exp(value - max(logits)) for value in logits]
+    return [value / sum(exps) for value in exps]
+
+
+def rounds(num_rounds):
+    return np.random.default_rng(1).integers(0, 60, (num_rounds, 46)).astype(np.float32)
+
+
+def test_exported_judge_matches_the_hand_computed_forward_pass(tmp_path):
+    write_export(str(tmp_path / 'judge.npz'))
+    judge = NUMPY_JUDGE.load(str(tmp_path / 'judge.npz'))
+    input_data = rounds(5) / 20
+
+    predictions = judge.predict(input_data, verbose=0)
+
+    assert predictions.shape == (5, 4) and predictions.dtype == np.float32
+    np.testing.assert_allclose(predictions, [hand_forward(row) for row in input_data], rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(predictions.sum(axis=1), 1, rtol=1e-6)
+    assert judge.norm_factors is None
+
+
+def test_save_and_load_round_trip(tmp_path):
+    write_export(str(tmp_path / 'judge.npz'), NORM_FACTORS)
+    judge = NUMPY_JUDGE.load(str(tmp_path / 'judge.npz'))
+    judge.save(str(tmp_path / 'copy.npz'))
+    copy = NUMPY_JUDGE.load(str(tmp_path / 'copy.npz'))
+
+    assert [(kind, activation) for kind, _, activation in copy.layers] == [('diagonal', 'linear'), ('dense', 'selu'), ('dense', 'softmax')]
+    np.testing.assert_array_equal(copy.norm_factors, NORM_FACTORS)
+    np.testing.assert_array_equal(copy.predict(rounds(3)), judge.predict(rounds(3)))
+
+
+def test_judge_normalizes_with_the_exported_factors(tmp_path):
+    with open(tmp_path / 'judge.h5', 'wb') as file:
+        file.write(b'keras model')
+    write_export(str(tmp_path / 'judge.npz'), NORM_FACTORS)
+
+    judge = AI_JUDGE()
+    judge.load_judge(str(tmp_path / 'judge.h5'))
+    input_data = rounds(4)
+
+    np.testing.assert_allclose(judge.predict_rounds(input_data), [hand_forward(row / NORM_FACTORS) for row in input_data], rtol=1e-5, atol=1e-6)
+
+
+def test_activations_match_their_definitions():
+    x = np.linspace(-4, 4, 81)
+
+    np.testing.assert_allclose(ACTIVATIONS['gelu'](x), [0.5 * v * (1 + math.erf(v / math.sqrt(2))) for v in x], atol=1e-6)
+    np.testing.assert_allclose(erf(x), [math.erf(v) for v in x], atol=2e-7)
+    np.testing.assert_allclose(ACTIVATIONS['elu'](x), [v if v > 0 else math.expm1(v) for v in x])
+    np.testing.assert_allclose(ACTIVATIONS['softplus'](x), [math.log1p(math.exp(v)) for v in x])
+    np.testing.assert_allclose(ACTIVATIONS['softmax'](np.array([[1.0, 2.0, 3.0]])), [np.exp([1.0, 2.0, 3.0]) / np.exp([1.0, 2.0, 3.0]).sum()])
+
+
+# Layers with the interface 'from_keras' reads from the Keras ones (the kind of layer is the name of its class)
+class FAKE_LAYER:
+    def __init__(self, name, weights=(), activation='linear', use_bias=True, units=None):
+        self.name = name
+        self.weights = list(weights)
+        # Only the name of the activation function is read
+        self.activation = lambda x: x
+        self.activation.__name__ = activation
+        self.use_bias = use_bias
+        self.units = units
+
+    def get_weights(self):
+        return self.weights
+
+
+def fake_layer(kind, *args, **kwargs):
+    return type(kind, (FAKE_LAYER,), {})(*args, **kwargs)
+
+
+class FAKE_MODEL:
+    def __init__(self, layers):
+        self.layers = layers
+
+
+def test_keras_models_are_converted_without_tensorflow():
+    model = FAKE_MODEL([
+        fake_layer('InputLayer', 'input'),
+        fake_layer('DiagonalLayer', 'diagonal', [DIAG, DIAG_BIAS]),
+        fake_layer('Dense', 'hidden', [HIDDEN_KERNEL, HIDDEN_BIAS], activation='selu'),
+        fake_layer('AlphaDropout', 'dropout'),
+        fake_layer('Dense', 'output', [OUTPUT_KERNEL], activation='softmax', use_bias=False, units=4),
+    ])
+    judge = from_keras(model, NORM_FACTORS)
+
+    # The input and dropout layers don't do anything when predicting, and a dense layer without bias gets a zero bias
+    assert [(kind, activation) for kind, _, activation in judge.layers] == [('diagonal', 'linear'), ('dense', 'selu'), ('dense', 'softmax')]
+    np.testing.assert_array_equal(judge.layers[2][1][1], np.zeros(4, dtype=np.float32))
+    assert judge.norm_factors is NORM_FACTORS
+
+
+def test_unsupported_layers_are_rejected():
+    with pytest.raises(ValueError, match='BatchNormalization'):
+        from_keras(FAKE_MODEL([fake_layer('BatchNormalization', 'norm')]))
+    with pytest.raises(ValueError, match="Activation 'mish'"):
+        from_keras(FAKE_MODEL([fake_layer('Dense', 'hidden', [HIDDEN_KERNEL, HIDDEN_BIAS], activation='mish')]))
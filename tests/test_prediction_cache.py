@@ -0,0 +1,131 @@
+# tests/test_prediction_cache.py
+# Iván Ontiveros - RetroVortex
+
+
+import os
+import numpy as np
+
+from round_judge import AI_JUDGE
+from judgionLib.numpy_runtime import NUMPY_JUDGE
+from judgionLib.prediction_cache import PREDICTION_CACHE, PREDICTION_CACHE_PATH, model_hash, row_hashes
+
+
+class COUNTING_MODEL:
+
+    def __init__(self):
+        # Rounds received by every call to 'predict'
+        self.calls = []
+
+    def predict(self, input_data):
+        self.calls.append(len(input_data))
+        scores = np.asarray(input_data, dtype=np.float32)[:, :4] + 1
+        return scores / scores.sum(axis=1, keepdims=True)
+
+
+def rounds(num_rounds, seed):
+    return np.random.default_rng(seed).integers(0, 50, (num_rounds, 46)).astype(np.float32)
+
+
+def test_only_missing_rounds_are_predicted(tmp_path):
+    cache = PREDICTION_CACHE(str(tmp_path / 'predictions.sqlite'))
+    model = COUNTING_MODEL()
+    first, second = rounds(3, 0), rounds(2, 1)
+
+    expected = model.predict(np.concatenate((first, second)))
+    model.calls.clear()
+
+    np.testing.assert_allclose(cache.predict('model', first, model.predict), expected[:3])
+    np.testing.assert_allclose(cache.predict('model', np.concatenate((first, second)), model.predict), expected)
+    np.testing.assert_allclose(cache.predict('model', np.concatenate((second, first)), model.predict), np.concatenate((expected[3:], expected[:3])))
+
+    assert model.calls == [3, 2]
+
+
+def test_predictions_are_kept_per_model(tmp_path):
+    cache = PREDICTION_CACHE(str(tmp_path / 'predictions.sqlite'))
+    model = COUNTING_MODEL()
+
+    cache.predict('old model', rounds(2, 0), model.predict)
+    cache.predict('new model', rounds(2, 0), model.predict)
+    assert model.calls == [2, 2]
+
+    # The database is shared between processes: a new connection finds the stored predictions
+    PREDICTION_CACHE(str(tmp_path / 'predictions.sqlite')).predict('new model', rounds(2, 0), model.predict)
+    assert model.calls == [2, 2]
+
+
+def test_least_recently_used_predictions_are_dropped(tmp_path):
+    cache = PREDICTION_CACHE(str(tmp_path / 'predictions.sqlite'), max_size=4)
+    model = COUNTING_MODEL()
+    old, recent = rounds(2, 0), rounds(2, 1)
+
+    cache.predict('model', old, model.predict)
+    cache.predict('model', recent, model.predict)
+    cache.predict('model', recent, model.predict)
+    cache.predict('model', rounds(2, 2), model.predict)
+
+    assert [prediction is None for prediction in cache.lookup('model', row_hashes(np.concatenate((old, recent))))] == [True, True, False, False]
+
+
+def test_cache_is_only_counted_when_full(tmp_path):
+    cache = PREDICTION_CACHE(str(tmp_path / 'predictions.sqlite'), max_size=100)
+    model = COUNTING_MODEL()
+    statements = []
+    cache.connection.set_trace_callback(statements.append)
+
+    for seed in range(20):
+        cache.predict('model', rounds(5, seed), model.predict)
+    assert not any('COUNT' in statement for statement in statements)
+
+    # Past the limit, the excess and a tenth of the cache are dropped at once, so the next stores don't count the table again
+    cache.predict('model', rounds(5, 20), model.predict)
+    assert sum('COUNT' in statement for statement in statements) == 1
+    assert cache.size == 90
+    assert cache.connection.execute('SELECT COUNT(*) FROM predictions').fetchone()[0] == 90
+
+    statements.clear()
+    cache.predict('model', rounds(5, 21), model.predict)
+    assert not any('COUNT' in statement for statement in statements)
+
+
+def test_exported_judges_dont_use_the_cache(tmp_path):
+    model_path = str(tmp_path / 'judge.h5')
+    with open(model_path, 'wb') as file:
+        file.write(b'keras model')
+    layers = [('dense', [np.eye(46, 4, dtype=np.float32), np.zeros(4, dtype=np.float32)], 'softmax')]
+    NUMPY_JUDGE(layers).save(str(tmp_path / 'judge.npz'))
+
+    judge = AI_JUDGE()
+    judge.load_judge(model_path)
+    predictions = judge.predict_rounds(rounds(3, 0))
+
+    assert isinstance(judge.judge_model, NUMPY_JUDGE)
+    assert judge.model_hash is None
+    assert predictions.shape == (3, 4)
+    assert not os.path.exists(PREDICTION_CACHE_PATH)
+
+
+def test_empty_input(tmp_path):
+    cache = PREDICTION_CACHE(str(tmp_path / 'predictions.sqlite'))
+    model = COUNTING_MODEL()
+
+    predictions = cache.predict('model', np.empty((0, 46), dtype=np.float32), model.predict)
+
+    assert predictions.shape == (0, 4)
+    assert predictions.dtype == np.float32
+    assert model.calls == []
+
+
+def test_model_hash_follows_the_content(tmp_path):
+    path = tmp_path / 'judge.h5'
+    path.write_bytes(b'weights v1')
+    first = model_hash(str(path))
+
+    path.write_bytes(b'retrained weights')
+    assert model_hash(str(path)) != first
+
+
+def test_row_hashes_depend_on_the_data_type():
+    data = rounds(2, 0)
+    assert row_hashes(data)[0] != row_hashes(data)[1]
+    assert row_hashes(data) != row_hashes(data.astype(np.float64))
@@ -0,0 +1,110 @@
+# tests/test_shards.py
+# Iván Ontiveros - RetroVortex
+
+
+import os
+import json
+import multiprocessing
+import numpy as np
+import pytest
+
+from conftest import TRAINING_ROUNDS
+from judgionLib import shards, ingestion
+from judgionLib.shards import ROUND_SHARDS, pack_directory, unpack_shards, is_shard_store, list_rounds, read_round, write_round
+from judgionLib.ingestion import parse_directory, parse_rounds
+
+
+# This function returns the content of every round file of a directory: name -> data
+def read_directory(directory):
+    rounds = {}
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), 'r') as file:
+            rounds[name] = json.load(file)
+    return rounds
+
+
+def test_pack_unpack_round_trip(tmp_path, monkeypatch):
+    # Small shards, so the dataset is split in several of them
+    monkeypatch.setattr(shards, 'SHARD_SIZE', 10)
+
+    assert pack_directory(TRAINING_ROUNDS, str(tmp_path / 'packed')) == 32
+    assert is_shard_store(str(tmp_path / 'packed'))
+    assert len(ROUND_SHARDS(str(tmp_path / 'packed')).shards) == 4
+
+    assert unpack_shards(str(tmp_path / 'packed'), str(tmp_path / 'unpacked')) == 32
+    assert read_directory(str(tmp_path / 'unpacked')) == read_directory(TRAINING_ROUNDS)
+
+
+def test_packed_dataset_parses_like_the_files(tmp_path):
+    pack_directory(TRAINING_ROUNDS, str(tmp_path / 'packed'))
+
+    names = ROUND_SHARDS(str(tmp_path / 'packed')).round_names()
+    stats, winners = parse_directory(str(tmp_path / 'packed'))
+
+    file_stats, file_winners = parse_rounds([os.path.join(TRAINING_ROUNDS, name) for name in names])
+    np.testing.assert_array_equal(stats, file_stats)
+    np.testing.assert_array_equal(winners, file_winners)
+
+
+def test_single_rounds_are_read_and_replaced(tmp_path):
+    packed = str(tmp_path / 'packed')
+    pack_directory(TRAINING_ROUNDS, packed)
+
+    data = read_round(packed, 'Theory_7.json')
+    with open(os.path.join(TRAINING_ROUNDS, 'Theory_7.json'), 'r') as file:
+        assert data == json.load(file)
+
+    # Writing a round with an existing name makes the index point to the new version
+    data['winner'] = 3
+    write_round(packed, 'Theory_7.json', data)
+    assert read_round(packed, 'Theory_7.json')['winner'] == 3
+    assert sorted(list_rounds(packed)) == sorted(os.listdir(TRAINING_ROUNDS))
+
+
+def test_write_round_leaves_no_temporary_files(tmp_path):
+    with open(os.path.join(TRAINING_ROUNDS, 'Theory_1.json'), 'r') as file:
+        data = json.load(file)
+
+    path = write_round(str(tmp_path), 'Theory_1.json', data)
+
+    assert os.listdir(tmp_path) == ['Theory_1.json']
+    with open(path, 'r') as file:
+        assert json.load(file) == data
+
+
+def test_index_is_parsed_once_for_all_the_rounds(tmp_path, monkeypatch):
+    packed = str(tmp_path / 'packed')
+    pack_directory(TRAINING_ROUNDS, packed)
+
+    opened = []
+    class COUNTING_SHARDS(ROUND_SHARDS):
+        def __init__(self, directory):
+            opened.append(directory)
+            super().__init__(directory)
+    monkeypatch.setattr(shards, 'ROUND_SHARDS', COUNTING_SHARDS)
+
+    for name in list_rounds(packed):
+        read_round(packed, name)
+    assert len(opened) == 1
+
+    # A new index (a round written by this or another process) is read again
+    write_round(packed, 'Theory_33.json', read_round(packed, 'Theory_1.json'))
+    opened.clear()
+    assert 'Theory_33.json' in list_rounds(packed)
+    assert read_round(packed, 'Theory_33.json') == read_round(packed, 'Theory_1.json')
+    assert len(opened) == 1
+
+
+def test_parallel_parsing_errors_dont_leak_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(shards, 'SHARD_SIZE', 10)
+    monkeypatch.setattr(ingestion, 'PARALLEL_MIN_FILES', 1)
+    packed = str(tmp_path / 'packed')
+    pack_directory(TRAINING_ROUNDS, packed)
+
+    data = read_round(packed, 'Theory_1.json')
+    del data['red_fighter']['reversals']
+    write_round(packed, 'Theory_1.json', data)
+
+    with pytest.raises(ValueError, match='Theory_1.json'):
+        parse_directory(packed)
+    assert multiprocessing.active_children() == []
@@ -16,8 +16,12 @@ import time
 import numpy as np
 import csv
 
-from judgionLib.utils import stats_getter, normalize_stats, model_builder, DiagonalLayer
-from judgionLib.constants import TRAINING_DIRECTORY, MODELS_DIRECTORY, USE_SEED, TRAINING_SEED, LOG_DIRECTORY, STAT_MAP
+from judgionLib.utils import normalize_stats
+from judgionLib.models import model_builder, DiagonalLayer
+from judgionLib.dataset_cache import load_dataset
+from judgionLib.pipeline import streaming_dataset, stream_highest_values
+from judgionLib.tflite_runtime import export_tflite, print_report
+from judgionLib.constants import TRAINING_DIRECTORY, MODELS_DIRECTORY, USE_SEED, TRAINING_SEED, LOG_DIRECTORY, STAT_MAP, STREAM_TRAINING
 
 
 class AI_UFC_TRAINER:
@@ -46,20 +50,30 @@ class AI_UFC_TRAINER:
         # Compiling the model
         judge = model_builder(hidden_layers, opti)
 
-        # As this solution has 4 output neurons and only one will be True (1) for each round,
-        # transform 'y_train' into a one-hot encoded array
-        y_train_nn = to_categorical(self.y_train, num_classes=4)
-        # And the 'x_train' will be a Numpy array, normalized or raw depending on the user's choice
-        if self.norm_flag:
-            normalized_stats, highest_values = normalize_stats(self.x_train)
-            x_train_nn = np.array(normalized_stats)
-        else:
-            x_train_nn = np.array(self.x_train)
+        # When streaming, the rounds are read in chunks during the training (the labels are one-hot encoded by the pipeline)
+        if STREAM_TRAINING:
+            highest_values = stream_highest_values(TRAINING_DIRECTORY) if self.norm_flag else None
+            train_data = streaming_dataset(TRAINING_DIRECTORY, batch_size=16, norm_factors=highest_values)
+
+            # Start the training process, monitorising the time it consumes
+            ini_t = time.time()
+            _ = judge.fit(train_data, epochs=330)
+            end_t = time.time()
 
-        # Start the training process, monitorising the time it consumes
-        ini_t = time.time()
-        _ = judge.fit(x_train_nn, y_train_nn, batch_size=16, epochs=330, validation_split=0.0, shuffle=True)
-        end_t = time.time()
+        else:
+            # As this solution has 4 output neurons and only one will be True (1) for each round,
+            # transform 'y_train' into a one-hot encoded array
+            y_train_nn = to_categorical(self.y_train, num_classes=4)
+            # And the 'x_train' will be a Numpy array, normalized or raw depending on the user's choice
+            if self.norm_flag:
+                x_train_nn, highest_values = normalize_stats(self.x_train)
+            else:
+                x_train_nn = np.asarray(self.x_train, dtype=np.float32)
+
+            # Start the training process, monitorising the time it consumes
+            ini_t = time.time()
+            _ = judge.fit(x_train_nn, y_train_nn, batch_size=16, epochs=330, validation_split=0.0, shuffle=True)
+            end_t = time.time()
         print("Training time = ", end_t-ini_t, " s")
 
         # Ask the user if the judge model should be saved
@@ -70,6 +84,8 @@ class AI_UFC_TRAINER:
             # If we trained the model with normalized data, store the highest_values array in a 'npy' file
             if self.norm_flag:
                 np.save(f'{MODELS_DIRECTORY}/{name}.npy', highest_values)
+            # Optionally, export the judge as a TFLite model too
+            self.tflite_export(name)
 
 
     # This method implements the training process using the Diagonal Layer, just as it was used to train "The Diagonal"
@@ -82,13 +98,6 @@ class AI_UFC_TRAINER:
         # The output layer will have 4 neurons (one for every possible outcome), with the softmax activation function
         judge.add(Dense(4, activation='softmax'))
 
-        # As this solution has 4 output neurons and only one will be True (1) for each round,
-        # transform 'y_train' into a one-hot encoded array
-        y_train_nn = to_categorical(self.y_train, num_classes=4)
-
-        # We will use the raw data for the input Numpy array
-        x_train_nn = np.array(self.x_train)
-
         # Adam optimizer
         opt = Adam(learning_rate=0.00175, beta_1=0.97, beta_2=0.999, weight_decay = 0.0002)
 
@@ -98,10 +107,27 @@ class AI_UFC_TRAINER:
         # 'Accuracy' as the metric
         judge.compile(loss='categorical_crossentropy', optimizer=opt, metrics=['accuracy'])
 
-        # Start the training process, monitorising the time it consumes
-        ini_t = time.time()
-        fitting = judge.fit(x_train_nn, y_train_nn, batch_size=4, epochs=350, validation_split=0.0, shuffle=True)
-        end_t = time.time()
+        # When streaming, the raw rounds are read in chunks during the training
+        if STREAM_TRAINING:
+            train_data = streaming_dataset(TRAINING_DIRECTORY, batch_size=4)
+
+            # Start the training process, monitorising the time it consumes
+            ini_t = time.time()
+            fitting = judge.fit(train_data, epochs=350)
+            end_t = time.time()
+
+        else:
+            # As this solution has 4 output neurons and only one will be True (1) for each round,
+            # transform 'y_train' into a one-hot encoded array
+            y_train_nn = to_categorical(self.y_train, num_classes=4)
+
+            # We will use the raw data for the input Numpy array
+            x_train_nn = np.asarray(self.x_train, dtype=np.float32)
+
+            # Start the training process, monitorising the time it consumes
+            ini_t = time.time()
+            fitting = judge.fit(x_train_nn, y_train_nn, batch_size=4, epochs=350, validation_split=0.0, shuffle=True)
+            end_t = time.time()
         print("Training time = ", end_t - ini_t, " s")
 
         # Saving the weights in the log directory
@@ -122,13 +148,25 @@ class AI_UFC_TRAINER:
         if answer.lower() == 'y':
             name = input("Enter the judge's name: ")
             judge.save(f'{MODELS_DIRECTORY}/{name}.h5')
+            # Optionally, export the judge as a TFLite model too
+            self.tflite_export(name)
+
+
+    # This method asks the user if a saved judge should be exported as a (quantized) TFLite model, and exports it if so
+    # The export reports the accuracy difference and the speedup against the original model, measured on the training rounds
+    def tflite_export(self, name):
+        answer = input("Export the judge as a TFLite model? [N/F16/I8]: ").strip().lower()
+        if answer in ('f16', 'i8'):
+            quantization = 'float16' if answer == 'f16' else 'int8'
+            print_report(*export_tflite(f'{MODELS_DIRECTORY}/{name}.h5', quantization))
 
 
     # This function initializes the class variables and starts the training process
     def init_training(self):
 
-        # Initialize the training matrices
-        (self.x_train, self.y_train) = stats_getter(TRAINING_DIRECTORY)
+        # Initialize the training matrices (when streaming, the rounds will be read during the training process)
+        if not STREAM_TRAINING:
+            (self.x_train, self.y_train) = load_dataset(TRAINING_DIRECTORY)
         #print("Number of rounds: ", len(self.y_train))
 
         # Normalize the stats